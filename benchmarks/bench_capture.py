@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Packet capture benchmark
+
+Floods the loopback interface with UDP from a separate process while the
+TPACKET_V3 capture engine writes it to pcap files in a temporary directory,
+then reports packets/s, MB/s and kernel drops. Needs root (CAP_NET_RAW).
+
+Usage: sudo python3 benchmarks/bench_capture.py [seconds] [payload_bytes] [pcap|pcapng]
+"""
+
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firmware import capture
+
+PORT = 9
+
+
+def flood(payload, stop):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    data = b"\x55" * payload
+    while not stop.is_set():
+        for _ in range(1000):
+            sock.sendto(data, ("127.0.0.1", PORT))
+
+
+def run(seconds=5.0, payload=512, fmt="pcap"):
+    # Only the flood itself, not the ICMP port-unreachable replies
+    program = [(40, 0, 0, 12), (21, 0, 5, 2048), (48, 0, 0, 23), (21, 0, 3, 17),
+               (40, 0, 0, 36), (21, 0, 1, PORT), (6, 0, 0, capture.SNAPLEN), (6, 0, 0, 0)]
+    stop = multiprocessing.Event()
+    sender = multiprocessing.Process(target=flood, args=(payload, stop), daemon=True)
+    with tempfile.TemporaryDirectory() as directory:
+        files = capture.CaptureFiles(directory, prefix="lo", fmt=fmt)
+        sender.start()
+        try:
+            with capture.PacketRing("lo", bpf=program) as ring:
+                stats = capture.capture(ring, files, duration=seconds,
+                                        on_stats=lambda s: print(f"  {s.line()}"))
+        finally:
+            stop.set()
+            sender.join(2)
+            files.close()
+        written = sum(os.path.getsize(path) for path in files.paths)
+    return {
+        "packets": stats.packets,
+        "packets_per_s": stats.packets / stats.elapsed,
+        "mb_per_s": stats.bytes / stats.elapsed / 1e6,
+        "drops": stats.drops,
+        "freezes": stats.freezes,
+        "file_bytes": written,
+        "files": len(files.paths),
+    }
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    payload = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    fmt = sys.argv[3] if len(sys.argv) > 3 else "pcap"
+    print(f"Capturing lo for {seconds:g}s, {payload}-byte UDP payloads, {fmt}")
+    result = run(seconds, payload, fmt)
+    print(f"{result['packets']} packets  {result['packets_per_s']:.0f} pkt/s  "
+          f"{result['mb_per_s']:.1f} MB/s  {result['drops']} dropped  "
+          f"{result['freezes']} ring full  {result['files']} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+DNS resolver benchmark
+
+Runs a stub DNS server on loopback that answers A/AAAA/PTR for a set of
+generated names (NXDOMAIN for the rest, with a configurable reply delay)
+and resolves a batch against it: once cold, once from the cache, and one
+query at a time for comparison.
+
+Usage: python3 benchmarks/bench_dns.py [names] [delay_ms]
+"""
+
+import asyncio
+import ipaddress
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firmware import dns
+
+
+class StubDnsServer:
+    """Authoritative-ish answers from a dict, served from a thread on loopback"""
+
+    def __init__(self, records, delay=0.0, ttl=300, negative_ttl=30):
+        self.records = records      # (name, qtype) -> [value, ...]
+        self.delay = delay
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.queries = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.address = self.sock.getsockname()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._timers = []
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.sock.close()
+        for timer in self._timers:
+            timer.cancel()
+
+    def reply(self, query):
+        qid, _ = struct.unpack_from("!HH", query)
+        name, end = dns._read_name(query, 12)
+        qtype, _ = struct.unpack_from("!HH", query, end)
+        question = query[12:end + 4]
+        values = self.records.get((name.lower(), qtype))
+        answers = b""
+        authority = b""
+        if values:
+            for value in values:
+                if qtype == dns.A:
+                    rdata = socket.inet_pton(socket.AF_INET, value)
+                elif qtype == dns.AAAA:
+                    rdata = socket.inet_pton(socket.AF_INET6, value)
+                else:
+                    rdata = dns.build_query(0, value, 0)[12:-4]
+                answers += struct.pack("!HHHIH", 0xC00C, qtype, 1, self.ttl, len(rdata)) + rdata
+        else:
+            soa = (b"\x02ns\xc0\x0c" b"\x05admin\xc0\x0c"
+                   + struct.pack("!IIIII", 1, 3600, 600, 86400, self.negative_ttl))
+            authority = struct.pack("!HHHIH", 0xC00C, dns.SOA, 1, 3600, len(soa)) + soa
+        rcode = dns.NOERROR if values or (name.lower(), dns.A) in self.records else dns.NXDOMAIN
+        header = struct.pack("!HHHHHH", qid, 0x8180 | rcode, 1,
+                             len(values or ()), 1 if authority else 0, 0)
+        return header + question + answers + authority
+
+    def _serve(self):
+        while True:
+            try:
+                query, addr = self.sock.recvfrom(512)
+            except OSError:
+                return
+            self.queries += 1
+            packet = self.reply(query)
+            if self.delay:
+                timer = threading.Timer(self.delay, self._send, (packet, addr))
+                self._timers.append(timer)
+                timer.start()
+            else:
+                self._send(packet, addr)
+
+    def _send(self, packet, addr):
+        try:
+            self.sock.sendto(packet, addr)
+        except OSError:
+            pass
+
+
+def build_records(count):
+    records = {}
+    for i in range(count):
+        name = f"host{i}.lab.test"
+        address = str(ipaddress.ip_address("10.0.0.0") + i + 1)
+        records[(name, dns.A)] = [address]
+        records[(name, dns.AAAA)] = [f"fd00::{i + 1:x}"]
+        records[(ipaddress.ip_address(address).reverse_pointer, dns.PTR)] = [name]
+    return records
+
+
+async def resolve_batch(server, queries, cache, concurrency=64):
+    async with dns.Resolver([server.address[0]], port=server.address[1], timeout=1.0,
+                            cache=cache, max_inflight=concurrency) as resolver:
+        start = time.perf_counter()
+        answers = await resolver.resolve_many(queries)
+        return answers, time.perf_counter() - start
+
+
+async def resolve_serial(server, queries):
+    async with dns.Resolver([server.address[0]], port=server.address[1], timeout=1.0,
+                            cache=dns.DnsCache()) as resolver:
+        start = time.perf_counter()
+        for name, qtype in queries:
+            await resolver.resolve(name, qtype)
+        return time.perf_counter() - start
+
+
+def run(names=500, delay=0.005):
+    server = StubDnsServer(build_records(names), delay=delay).start()
+    try:
+        queries = []
+        for i in range(names):
+            queries += dns.parse_query(f"host{i}.lab.test", ("A", "AAAA"))
+            queries += dns.parse_query(str(ipaddress.ip_address("10.0.0.0") + i + 1))
+        queries += dns.parse_query("missing.lab.test", ("A",))
+        cache = dns.DnsCache()
+        answers, cold = asyncio.run(resolve_batch(server, queries, cache))
+        cached, warm = asyncio.run(resolve_batch(server, queries, cache))
+        serial = asyncio.run(resolve_serial(server, queries[:100]))
+    finally:
+        server.stop()
+    return {
+        "queries": len(queries),
+        "resolved": sum(1 for a in answers if a.ok),
+        "nxdomain": sum(1 for a in answers if a.rcode == dns.NXDOMAIN),
+        "cold_qps": len(queries) / cold,
+        "cached_qps": len(queries) / warm,
+        "cache_hits": sum(1 for a in cached if a.cached),
+        "serial_qps": 100 / serial,
+    }
+
+
+def main():
+    names = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    delay = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 5.0 / 1000
+    result = run(names, delay)
+    print(f"{result['queries']} queries ({result['resolved']} resolved, "
+          f"{result['nxdomain']} NXDOMAIN), server delay {delay * 1000:g} ms")
+    print(f"concurrent  {result['cold_qps']:10.0f} queries/s")
+    print(f"cached      {result['cached_qps']:10.0f} queries/s ({result['cache_hits']} hits)")
+    print(f"one by one  {result['serial_qps']:10.0f} queries/s")
+
+
+if __name__ == "__main__":
+    main()
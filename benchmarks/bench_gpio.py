@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+GPIO read benchmark
+
+Times a Pin State snapshot of lines 2-27 (line info plus the /dev/gpiomem
+registers, or one bulk gpiochip read without them) and the logic
+analyzer's sustained sample rate. Uses /dev/gpiochip0 when it exists, the
+fake chip otherwise; only numbers from the Pi mean anything.
+
+Usage: python3 benchmarks/bench_gpio.py [chip] [samples]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firmware import gpiochip
+from firmware.config import DEFAULTS
+
+
+def open_chip(path):
+    if os.path.exists(path):
+        chip = gpiochip.GpioChip(path)
+        try:
+            return chip, gpiochip.GpioMem.open(chip), "gpiochip"
+        except OSError:
+            return chip, None, "gpiochip"
+    from firmware.hw.fake_gpio import FakeGPIO
+    from firmware.hw.fake_gpiochip import FakeGpioChip, FakeGpioMem
+    chip = FakeGpioChip(FakeGPIO())
+    return chip, FakeGpioMem(chip), "fake"
+
+
+def run(path="/dev/gpiochip0", samples=200000, rounds=50):
+    reserved = set(gpiochip.parse_lines(DEFAULTS["gpio"]["reserved"]))
+    lines = [line for line in range(2, 28) if line not in reserved]
+    analyzer = gpiochip.parse_lines(DEFAULTS["logic"]["lines"])
+    chip, gpiomem, kind = open_chip(path)
+    with chip:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            gpiochip.snapshot(chip, lines, gpiomem)
+        snapshot_ms = (time.perf_counter() - start) / rounds * 1000
+        if gpiomem is not None:
+            gpiomem.close()
+
+        buffer = gpiochip.SampleBuffer(samples, analyzer)
+        with chip.request(analyzer) as request:
+            start = time.perf_counter()
+            filled = request.sample(buffer, samples)
+            elapsed = time.perf_counter() - start
+        gaps = buffer.times[1:filled] - buffer.times[:filled - 1]
+    return {
+        "chip": kind,
+        "gpiomem": gpiomem is not None,
+        "lines": len(lines),
+        "snapshot_ms": snapshot_ms,
+        "sample_rate": filled / elapsed,
+        "max_gap_us": float(gaps.max()) / 1000 if len(gaps) else 0.0,
+    }
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "/dev/gpiochip0"
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+    result = run(path, samples)
+    source = "gpiomem" if result["gpiomem"] else "line request"
+    print(f"{result['chip']}: snapshot of {result['lines']} lines ({source}) "
+          f"{result['snapshot_ms']:.2f} ms")
+    print(f"logic analyzer  {result['sample_rate'] / 1000:8.0f} kS/s "
+          f"(longest gap {result['max_gap_us']:.0f} us)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+I2C scan benchmark
+
+Times a full scan of every /dev/i2c-N with the in-process scanner (cold,
+then from the cache) against forking `i2cdetect -y N` per bus, the old
+path. Without I2C buses (a dev box) only the scanner over the fake bus
+is timed.
+
+Usage: python3 benchmarks/bench_i2c.py [rounds]
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firmware import i2c
+from firmware.hw.fake_bus import DEMO_I2C_DEVICES, FakeSMBus
+
+
+def time_per_call(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds
+
+
+def run(rounds=10):
+    buses = i2c.list_buses()
+    if buses:
+        kind, open_bus = "i2c-dev", i2c.I2CBus
+    else:
+        buses = sorted(DEMO_I2C_DEVICES)
+        kind, open_bus = "fake", lambda bus: FakeSMBus(bus, DEMO_I2C_DEVICES[bus])
+
+    results = {"buses": kind, "count": len(buses)}
+    results["scan_ms"] = time_per_call(lambda: i2c.scan(buses, open_bus), rounds) * 1000
+    cache = i2c.ScanCache()
+    i2c.scan(buses, open_bus, cache)
+    results["cached_ms"] = time_per_call(lambda: i2c.scan(buses, open_bus, cache), rounds) * 1000
+    if kind == "i2c-dev" and shutil.which("i2cdetect"):
+        def i2cdetect():
+            for bus in buses:
+                subprocess.run(["i2cdetect", "-y", str(bus)], capture_output=True, check=False)
+        results["i2cdetect_ms"] = time_per_call(i2cdetect, rounds) * 1000
+    return results
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    result = run(rounds)
+    print(f"{result['count']} {result['buses']} buses")
+    print(f"scanner     {result['scan_ms']:8.1f} ms")
+    print(f"cached      {result['cached_ms']:8.1f} ms")
+    if "i2cdetect_ms" in result:
+        print(f"i2cdetect   {result['i2cdetect_ms']:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
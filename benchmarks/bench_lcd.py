@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+LCD push benchmark
+
+Times full-screen frame pushes through the RGB565 framebuffer pipeline
+against a fake SPI sink, next to the per-pixel list conversion that
+ST7789.image_to_data() does.
+
+Usage: python3 benchmarks/bench_lcd.py [frames]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from firmware.lcd import PartialDisplay
+from firmware.render import RenderCache
+
+
+class FakeSpiSink:
+    """Stands in for PanelWriter and only counts what would go over SPI"""
+
+    def __init__(self):
+        self.windows = 0
+        self.bytes = 0
+
+    def window(self, x0, y0, x1, y1):
+        self.windows += 1
+
+    def write(self, data):
+        self.bytes += len(data)
+
+
+def legacy_image_to_data(image):
+    """The conversion ST7789.image_to_data() performs"""
+    pb = np.array(image.convert('RGB')).astype('uint16')
+    color = ((pb[:, :, 0] & 0xF8) << 8) | ((pb[:, :, 1] & 0xFC) << 3) | (pb[:, :, 2] >> 3)
+    return np.dstack(((color >> 8) & 0xFF, color & 0xFF)).flatten().tolist()
+
+
+def sample_frames():
+    cache = RenderCache()
+    menu = {"title": "Benchmark", "items": [(f"Item {i}", None) for i in range(7)]}
+    return [cache.menu_frame("bench", i, menu) for i in range(7)]
+
+
+def bench_framebuffer(frames, count):
+    sink = FakeSpiSink()
+    lcd = PartialDisplay(panel=None, writer=sink)
+    start = time.perf_counter()
+    for i in range(count):
+        lcd.invalidate()
+        lcd.display(frames[i % len(frames)])
+    return time.perf_counter() - start, sink.bytes
+
+
+def bench_legacy(frames, count):
+    sent = 0
+    start = time.perf_counter()
+    for i in range(count):
+        data = legacy_image_to_data(frames[i % len(frames)])
+        for j in range(0, len(data), 4096):
+            sent += len(data[j:j + 4096])
+    return time.perf_counter() - start, sent
+
+
+def report(name, elapsed, count, sent):
+    print(f"{name:<14} {count / elapsed:8.1f} fps {elapsed * 1000 / count:8.2f} ms/frame "
+          f"{sent / count / 1024:8.1f} KB/frame")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    frames = sample_frames()
+    print(f"Full-screen pushes: {count} frames, 240x240 RGB565")
+    elapsed, sent = bench_framebuffer(frames, count)
+    report("framebuffer", elapsed, count, sent)
+    elapsed, sent = bench_legacy(frames, count)
+    report("image_to_data", elapsed, count, sent)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Instrumentation overhead benchmark
+
+Times a bare `with metrics.timer(...)` block and metrics.count() with the
+registry off and on, then update_display() on the fake backend over every
+menu screen with metrics off, on, and on with the FPS overlay, and finally
+what one sampling-profiler pass over all threads costs.
+
+Usage: python3 benchmarks/bench_metrics.py [iterations]
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Built-in defaults only, so results don't depend on the machine's config
+os.environ["BLACKHAT_CONFIG"] = os.devnull
+
+from benchmarks.bench_ui import boot_device, menu_states, percentiles
+from firmware import metrics
+from firmware.profiler import SamplingProfiler
+
+
+def per_call_ns(func, iterations):
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def bench_calls(iterations):
+    def timed():
+        with metrics.timer("bench.timer"):
+            pass
+
+    def counted():
+        metrics.count("bench.count")
+
+    results = {}
+    for enabled in (False, True):
+        metrics.registry.enabled = enabled
+        state = "on" if enabled else "off"
+        results[f"timer_{state}_ns"] = per_call_ns(timed, iterations)
+        results[f"count_{state}_ns"] = per_call_ns(counted, iterations)
+    metrics.registry.enabled = False
+    return results
+
+
+def bench_update_display(device, rounds=20):
+    states = list(menu_states(device))
+    results = {}
+    for label, enabled, overlay in (("off", False, False), ("on", True, False), ("overlay", True, True)):
+        metrics.registry.enabled = enabled
+        device.show_metrics = overlay
+        samples = []
+        for _ in range(rounds):
+            for name, index in states:
+                device.current_menu, device.menu_index = name, index
+                start = time.perf_counter()
+                device.update_display()
+                samples.append((time.perf_counter() - start) * 1000)
+        results[label] = percentiles(samples)
+    metrics.registry.enabled = False
+    device.show_metrics = False
+    return results
+
+
+def bench_profiler(samples=200):
+    profiler = SamplingProfiler(directory=None)
+    start = time.thread_time()
+    for _ in range(samples):
+        profiler.sample()
+    return (time.thread_time() - start) / samples * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    calls = bench_calls(iterations)
+    device = boot_device()
+    device.ui.start()
+    try:
+        update = bench_update_display(device)
+        sample_us = bench_profiler()
+    finally:
+        device.ui.stop()
+        device.executor.shutdown()
+        device.gpio.cleanup()
+
+    print(f"timer()          off {calls['timer_off_ns']:6.0f} ns   on {calls['timer_on_ns']:6.0f} ns")
+    print(f"count()          off {calls['count_off_ns']:6.0f} ns   on {calls['count_on_ns']:6.0f} ns")
+    for label, ms in update.items():
+        print(f"update_display   {label:<8} p50 {ms['p50']:.3f} ms  p99 {ms['p99']:.3f} ms")
+    print(f"profiler sample  {sample_us:.0f} us CPU per pass over all threads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Port scanner benchmark
+
+Opens listeners on loopback, then scans a port range holding them with the
+asyncio scanner (unlimited rate) and with the original one-port-at-a-time
+connect_ex() loop, and reports ports/s for each. Some listeners are
+stalled (accept queue full) so their connects hang until the timeout,
+like a filtering host; on loopback everything else answers instantly.
+
+Usage: python3 benchmarks/bench_portscan.py [ports] [listeners] [stalled] [concurrency]
+"""
+
+import asyncio
+import ipaddress
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firmware import portscan
+
+LOOPBACK = ipaddress.ip_address("127.0.0.1")
+
+
+def open_listeners(ports, count, stalled=0):
+    """Listen on `count` ports spread evenly over ports, the first `stalled` jammed"""
+    listeners = []
+    clients = []
+    step = max(1, len(ports) // count)
+    for port in ports[::step]:
+        if len(listeners) == count:
+            break
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.bind(("127.0.0.1", port))
+        except OSError:
+            sock.close()
+            continue
+        if len(listeners) < stalled:
+            # One queued, never-accepted connection fills a backlog of 0;
+            # further SYNs are dropped and connects time out
+            sock.listen(0)
+            client = socket.create_connection(("127.0.0.1", port))
+            clients.append(client)
+        else:
+            sock.listen(64)
+        listeners.append(sock)
+    return listeners + clients
+
+
+def legacy_scan(ports, timeout=1.0):
+    """The original port_scanner loop"""
+    found = 0
+    for port in ports:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        if sock.connect_ex(("127.0.0.1", port)) == 0:
+            found += 1
+        sock.close()
+    return found
+
+
+def run(ports=5000, listeners=20, stalled=4, concurrency=64, timeout=1.0):
+    # Above the usual ephemeral range so nothing else is likely listening
+    window = list(range(61000, min(65536, 61000 + ports)))
+    socks = open_listeners(window, listeners, stalled)
+    try:
+        stats = asyncio.run(portscan.scan([LOOPBACK], window, concurrency=concurrency,
+                                          rate=0, timeout=timeout))
+        start = time.perf_counter()
+        legacy_found = legacy_scan(window, timeout)
+        legacy_s = time.perf_counter() - start
+    finally:
+        for sock in socks:
+            sock.close()
+    return {
+        "ports": len(window),
+        "listeners": listeners,
+        "stalled": stalled,
+        "async": {"open": stats.open, "seconds": stats.elapsed, "ports_per_s": stats.ports_per_s},
+        "legacy": {"open": legacy_found, "seconds": legacy_s, "ports_per_s": len(window) / legacy_s},
+    }
+
+
+def main():
+    ports = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    listeners = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    stalled = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    concurrency = int(sys.argv[4]) if len(sys.argv) > 4 else 64
+    result = run(ports, listeners, stalled, concurrency)
+    print(f"{result['ports']} loopback ports, {result['listeners']} listening "
+          f"({result['stalled']} stalled), concurrency {concurrency}")
+    for name in ("async", "legacy"):
+        r = result[name]
+        print(f"{name:<8} {r['open']:4d} open {r['seconds'] * 1000:9.1f} ms "
+              f"{r['ports_per_s']:9.0f} ports/s")
+
+
+if __name__ == "__main__":
+    main()
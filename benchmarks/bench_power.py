@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Idle power benchmark
+
+Runs the firmware on the fake hardware backend with nothing happening and
+counts how often its threads wake up (context switches from
+/proc/self/task) and how much CPU they use, first with the screen on, then
+dimmed and blanked by the idle scheduler. Every thread but the
+benchmark's own is counted, the fake hardware's included.
+
+Wakeups and CPU are measured. The battery estimate is a model on top:
+board idle power, the backlight at its level, CPU time and a fixed cost
+per wakeup against the battery's energy. The defaults are rough figures
+for a Pi Zero 2 W with WiFi up, the Waveshare 1.3" LCD HAT and a 1000 mAh
+UPS HAT; pass your own measurements for numbers that mean something.
+
+Works on older trees without the idle scheduler too (screen on only), so
+the same script gives the before and after numbers.
+
+Usage: python3 benchmarks/bench_power.py [seconds] [--battery-wh 3.7 ...]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def firmware_threads():
+    """Native ids of this process's threads but this one"""
+    own = threading.get_native_id()
+    return {thread.native_id for thread in threading.enumerate() if thread.native_id != own}
+
+
+def task_counters(tids):
+    """(context switches, CPU seconds) summed over tids"""
+    switches = 0
+    ticks = 0
+    for tid in tids:
+        base = f"/proc/self/task/{tid}"
+        try:
+            with open(f"{base}/status", "rb") as f:
+                for line in f:
+                    if line.startswith((b"voluntary_ctxt_switches", b"nonvoluntary_ctxt_switches")):
+                        switches += int(line.split()[1])
+            with open(f"{base}/stat", "rb") as f:
+                fields = f.read().rsplit(b")", 1)[1].split()
+            ticks += int(fields[11]) + int(fields[12])      # utime + stime
+        except OSError:
+            continue    # the thread exited
+    return switches, ticks / CLOCK_TICKS
+
+
+def measure(seconds):
+    tids = firmware_threads()
+    switches, cpu = task_counters(tids)
+    started = time.monotonic()
+    time.sleep(seconds)
+    elapsed = time.monotonic() - started
+    switches_after, cpu_after = task_counters(tids)
+    return {
+        "threads": len(tids),
+        "wakeups_per_s": (switches_after - switches) / elapsed,
+        "cpu_percent": (cpu_after - cpu) / elapsed * 100,
+    }
+
+
+def estimate_hours(result, backlight, args):
+    """Hours on battery for the model in the module docstring"""
+    watts = (args.board_w + args.backlight_w * backlight / 100
+             + args.cpu_w * result["cpu_percent"] / 100
+             + args.wakeup_uj * 1e-6 * result["wakeups_per_s"])
+    return args.battery_wh * args.efficiency / watts, watts
+
+
+def enter_idle(device, idle_seconds):
+    """Pretend the last press was idle_seconds ago and let the scheduler catch up"""
+    device.power.last_input = time.monotonic() - idle_seconds
+    device.ui.call_at("idle", 0.0, device.idle_tick)
+    time.sleep(0.2)
+
+
+def run(seconds, tmp):
+    config = os.path.join(tmp, "blackhat.conf")
+    with open(config, "w") as f:
+        f.write(f"[storage]\npath = {os.path.join(tmp, 'results.db')}\n")
+    os.environ["BLACKHAT_CONFIG"] = config
+
+    from blackhat import BlackHatDevice
+    from firmware import hw
+
+    device = BlackHatDevice(hw.load_backend("fake"))
+    main = threading.Thread(target=device.run, name="blackhat-main")
+    main.start()
+    results = {}
+    try:
+        time.sleep(1.0)     # let the services settle
+        results["on"] = (measure(seconds), 100.0)
+        power = getattr(device, "power", None)
+        if power is not None:
+            if device.backlight.dimmable and power.dim_after > 0:
+                enter_idle(device, power.dim_after)
+                results["dim"] = (measure(seconds), device.backlight.level)
+            if power.blank_after > 0:
+                enter_idle(device, power.blank_after)
+                results["blank"] = (measure(seconds), device.backlight.level)
+    finally:
+        device.running = False
+        main.join(5.0)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Idle wakeups and estimated time on battery")
+    parser.add_argument("seconds", type=float, nargs="?", default=10.0,
+                        help="measuring time per state (default: %(default)s)")
+    parser.add_argument("--battery-wh", type=float, default=3.7,
+                        help="battery energy (default: %(default)s, 1000 mAh at 3.7 V)")
+    parser.add_argument("--efficiency", type=float, default=0.85,
+                        help="boost converter efficiency (default: %(default)s)")
+    parser.add_argument("--board-w", type=float, default=0.6,
+                        help="Pi idle power with the LCD HAT, backlight off (default: %(default)s)")
+    parser.add_argument("--backlight-w", type=float, default=0.1,
+                        help="backlight at 100%% (default: %(default)s)")
+    parser.add_argument("--cpu-w", type=float, default=0.45,
+                        help="extra power per fully busy core (default: %(default)s)")
+    parser.add_argument("--wakeup-uj", type=float, default=30.0,
+                        help="energy per wakeup beyond the CPU time it uses (default: %(default)s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run(args.seconds, tmp)
+    print(f"{'state':<7} {'threads':>7} {'wakeups/s':>10} {'CPU':>7} {'backlight':>9} "
+          f"{'watts':>7} {'hours':>6}")
+    for state, (result, backlight) in results.items():
+        hours, watts = estimate_hours(result, backlight, args)
+        print(f"{state:<7} {result['threads']:>7} {result['wakeups_per_s']:>10.1f} "
+              f"{result['cpu_percent']:>6.2f}% {backlight:>8.0f}% {watts:>7.3f} {hours:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
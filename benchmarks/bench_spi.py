@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+SPI loopback benchmark
+
+Runs the SPI Test sweep from the command line and prints the report as
+JSON. Jumper MOSI to MISO on the chosen bus for integrity checks and a
+safe maximum clock; without spidev the fake loopback bus is used.
+
+Usage: python3 benchmarks/bench_spi.py [bus.device] [speeds] [sizes] [-o report.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firmware import spibench
+from firmware.config import DEFAULTS
+
+
+def open_spi(bus, device):
+    try:
+        import spidev
+        spi = spidev.SpiDev()
+    except ImportError:
+        from firmware.hw.fake_bus import FakeSpiDev
+        spi = FakeSpiDev()
+    spi.open(bus, device)
+    spi.mode = 0
+    return spi
+
+
+def main():
+    settings = DEFAULTS["spi"]
+    parser = argparse.ArgumentParser(description="SPI loopback throughput/latency sweep")
+    parser.add_argument("device", nargs="?", default=f"{settings['bus']}.{settings['device']}")
+    parser.add_argument("speeds", nargs="?", default=settings["speeds"])
+    parser.add_argument("sizes", nargs="?", default=settings["sizes"])
+    parser.add_argument("--duration", type=float, default=float(settings["duration"]))
+    parser.add_argument("-o", "--output", help="write the report here instead of stdout")
+    args = parser.parse_args()
+
+    bus, _, device = args.device.partition(".")
+    spi = open_spi(int(bus), int(device or 0))
+    try:
+        report = spibench.sweep(spi, spibench.parse_list(args.speeds),
+                                spibench.parse_list(args.sizes), args.duration,
+                                on_point=lambda point, _: print(spibench.point_label(point),
+                                                                file=sys.stderr))
+    finally:
+        spi.close()
+    report["device"] = f"spidev{bus}.{device or 0}"
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Result store benchmark
+
+Compares writing scan results one committed row at a time (what a naive
+logger does) with the ResultStore's batched WAL transactions, and times
+record() as seen by a tool while the writer thread is flushing, plus a
+seen-before lookup of a full scan's worth of identifiers. Run it with the
+database on the SD card to get numbers that mean anything.
+
+Usage: python3 benchmarks/bench_store.py [rows] [directory]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firmware import store
+from firmware.spibench import percentiles
+
+
+def per_row(path, rows):
+    conn = sqlite3.connect(path)
+    conn.executescript(store.SCHEMA)
+    start = time.perf_counter()
+    for i in range(rows):
+        with conn:
+            conn.execute("INSERT INTO results (ts, kind, identifier, label) VALUES (?, ?, ?, ?)",
+                         (time.time(), "wifi", f"02:00:00:00:{i >> 8 & 0xFF:02x}:{i & 0xFF:02x}", "net"))
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def batched(path, rows):
+    results = store.ResultStore(path, flush_interval=0.5, flush_rows=500)
+    results.start()
+    latencies = []
+    start = time.perf_counter()
+    for i in range(rows):
+        begin = time.perf_counter_ns()
+        results.record("wifi", f"02:00:00:00:{i >> 8 & 0xFF:02x}:{i & 0xFF:02x}", "net", {"signal": -60})
+        latencies.append((time.perf_counter_ns() - begin) / 1000)
+    results.close()
+    elapsed = time.perf_counter() - start
+
+    results = store.ResultStore(path)
+    identifiers = [f"02:00:00:00:{i >> 8 & 0xFF:02x}:{i & 0xFF:02x}" for i in range(min(rows, 200))]
+    start = time.perf_counter()
+    results.lookup("wifi", identifiers)
+    lookup_ms = (time.perf_counter() - start) * 1000
+    results.close()
+    return elapsed, percentiles(latencies), lookup_ms, len(identifiers)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    directory = sys.argv[2] if len(sys.argv) > 2 else None
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        naive = per_row(os.path.join(tmp, "per_row.db"), rows)
+        elapsed, latency, lookup_ms, looked_up = batched(os.path.join(tmp, "batched.db"), rows)
+    print(f"{rows} rows")
+    print(f"per-row commits  {naive * 1000:8.1f} ms ({naive / rows * 1e6:.0f} us/row)")
+    print(f"batched store    {elapsed * 1000:8.1f} ms including the final flush")
+    print(f"record()         p50 {latency['p50']:.1f} us, p99 {latency['p99']:.1f} us, max {latency['max']:.0f} us")
+    print(f"lookup           {lookup_ms:8.2f} ms for {looked_up} identifiers")
+
+
+if __name__ == "__main__":
+    main()
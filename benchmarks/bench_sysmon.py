@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+System sampler benchmark
+
+Times one SystemSampler.sample() (pread + parse of every /proc file it
+watches) against the old open/read/close of loadavg and meminfo, then runs
+the sampler thread for a few seconds and reports its share of one CPU.
+
+Usage: python3 benchmarks/bench_sysmon.py [rounds] [seconds]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firmware.sysmon import SystemSampler
+
+
+def read_reopen():
+    """What System Info did before the sampler: open and parse on every call"""
+    info = []
+    with open('/proc/loadavg', 'r') as f:
+        info.append(f.read().strip())
+    with open('/proc/meminfo', 'r') as f:
+        for line in f:
+            if 'MemTotal' in line or 'MemFree' in line:
+                info.append(line.strip())
+    return info
+
+
+def time_per_call(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds
+
+
+def run(rounds=2000, seconds=3.0, interval=0.1):
+    sampler = SystemSampler(interval=interval)
+    try:
+        sample_us = time_per_call(sampler.sample, rounds) * 1e6
+        reopen_us = time_per_call(read_reopen, rounds) * 1e6
+        sampler.start()
+        time.sleep(seconds)
+        cost = sampler.cost
+        sampler.stop()
+    finally:
+        sampler.close()
+    return {
+        "series": sorted(sampler.series),
+        "sample_us": sample_us,
+        "reopen_us": reopen_us,
+        "interval": interval,
+        "thread_cpu": cost,
+    }
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    result = run(rounds, seconds)
+    print(f"series: {', '.join(result['series'])}")
+    print(f"sample()           {result['sample_us']:8.1f} us (all files)")
+    print(f"open+read+close    {result['reopen_us']:8.1f} us (loadavg + meminfo only)")
+    print(f"sampler thread at {result['interval']:g}s interval: "
+          f"{result['thread_cpu'] * 100:.3f}% of one CPU")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+End-to-end UI benchmark
+
+Boots BlackHatDevice on the fake hardware backend and replays a scripted
+button sequence through the fake GPIO edge thread. Reports input-to-frame
+latency (press until the frame has been pushed to the panel), time per
+update_display() split into render and push, and memory allocated per
+frame (tracemalloc).
+
+Usage: python3 benchmarks/bench_ui.py [interval_ms] [rounds]
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Built-in defaults only, so results don't depend on the machine's config
+os.environ["BLACKHAT_CONFIG"] = os.devnull
+
+from blackhat import BlackHatDevice
+from firmware import hw
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    """Nearest-rank percentiles of samples, plus mean and max"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    result = {f"p{p}": ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+              for p in points}
+    result["mean"] = sum(ordered) / len(ordered)
+    result["max"] = ordered[-1]
+    return result
+
+
+def navigation_script(device):
+    """Visit every submenu: move down to it, enter, walk its items, go back"""
+    script = []
+    for index, (_, action) in enumerate(device.menus["main"]["items"]):
+        if action not in device.menus:
+            continue
+        items = len(device.menus[action]["items"])
+        script += ["down"] * index + ["select"]
+        script += ["down"] * (items - 1) + ["up"] * (items - 1) + ["back"]
+    return script
+
+
+def boot_device():
+    device = BlackHatDevice(hw.load_backend("fake"))
+    if device.display is None:
+        raise RuntimeError("fake backend did not bring up a display")
+    return device
+
+
+class PushClock:
+    """Wraps device.display.display to time each push"""
+
+    def __init__(self, display):
+        self.display = display
+        self.push = display.display
+        self.pushed = []        # monotonic time each frame finished pushing
+        self.push_ms = []
+        display.display = self
+
+    def __call__(self, image):
+        start = time.monotonic()
+        self.push(image)
+        end = time.monotonic()
+        self.pushed.append(end)
+        self.push_ms.append((end - start) * 1000)
+
+    def detach(self):
+        del self.display.display
+
+
+def bench_latency(device, interval=0.05, repeat=3):
+    """Press-to-pushed-frame latency for the navigation script"""
+    script = navigation_script(device) * repeat
+    timeline = device.script_timeline(",".join(script), interval)
+    presses = []
+    done = threading.Event()
+    clock = PushClock(device.display)
+    frames_before = device.display.stats.frames
+    bytes_before = device.display.stats.total_bytes
+
+    device.ui.start()
+    try:
+        device.gpio.play(timeline, on_press=lambda pin, t: presses.append(t),
+                         on_done=done.set)
+        done.wait()
+        while device.ui.queued:
+            time.sleep(0.001)
+        time.sleep(device.ui.frame_interval * 2)
+    finally:
+        device.ui.stop()
+        clock.detach()
+
+    latencies = []
+    for t in presses:
+        i = bisect.bisect_left(clock.pushed, t)
+        if i < len(clock.pushed):
+            latencies.append((clock.pushed[i] - t) * 1000)
+    frames = device.display.stats.frames - frames_before
+    return {
+        "presses": len(presses),
+        "frames": frames,
+        "dropped_events": device.ui.dropped,
+        "interval_ms": interval * 1000,
+        "latency_ms": percentiles(latencies),
+        "bytes_per_frame": (device.display.stats.total_bytes - bytes_before) / max(1, frames),
+    }
+
+
+def menu_states(device):
+    for name, menu in device.menus.items():
+        for index in range(len(menu["items"])):
+            yield name, index
+
+
+def bench_update_display(device, rounds=20):
+    """Time update_display() over every menu state, cold cache then warm"""
+    states = list(menu_states(device))
+    clock = PushClock(device.display)
+
+    def sweep():
+        samples = []
+        for name, index in states:
+            device.current_menu, device.menu_index = name, index
+            start = time.perf_counter()
+            device.update_display()
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    try:
+        device.render.clear()
+        device.display.invalidate()
+        cold = sweep()
+        cold_push = list(clock.push_ms)
+        del clock.push_ms[:]
+        warm = []
+        for _ in range(rounds):
+            warm += sweep()
+        warm_push = clock.push_ms
+    finally:
+        clock.detach()
+    return {
+        "states": len(states),
+        "cold_ms": percentiles(cold),
+        "cold_push_ms": percentiles(cold_push),
+        "warm_ms": percentiles(warm),
+        "warm_push_ms": percentiles(warm_push),
+    }
+
+
+def bench_allocations(device, rounds=5):
+    """Bytes allocated (peak) and retained per update_display() call"""
+    states = list(menu_states(device))
+    peaks = []
+    retained = []
+    tracemalloc.start()
+    try:
+        for _ in range(rounds):
+            for name, index in states:
+                device.current_menu, device.menu_index = name, index
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                device.update_display()
+                current, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+    return {
+        "frames": len(peaks),
+        "peak_bytes": percentiles(peaks),
+        "retained_bytes_mean": sum(retained) / len(retained),
+    }
+
+
+def run(interval=0.05, rounds=20):
+    device = boot_device()
+    try:
+        results = {
+            "boot_ms": {name: seconds * 1000 for name, seconds in device.boot_times.items()},
+            "latency": bench_latency(device, interval),
+            "update_display": bench_update_display(device, rounds),
+            "allocations": bench_allocations(device),
+        }
+    finally:
+        device.executor.shutdown()
+        device.gpio.cleanup()
+    return results
+
+
+def report(results):
+    latency = results["latency"]
+    ms = latency["latency_ms"]
+    print(f"latency       {latency['presses']} presses -> {latency['frames']} frames, "
+          f"p50 {ms['p50']:.2f} ms  p90 {ms['p90']:.2f} ms  p99 {ms['p99']:.2f} ms  "
+          f"max {ms['max']:.2f} ms")
+    update = results["update_display"]
+    for phase in ("cold", "warm"):
+        total = update[f"{phase}_ms"]
+        push = update[f"{phase}_push_ms"]
+        print(f"update {phase:<6} p50 {total['p50']:.3f} ms  p99 {total['p99']:.3f} ms  "
+              f"(push p50 {push['p50']:.3f} ms)")
+    alloc = results["allocations"]
+    print(f"allocations   p50 {alloc['peak_bytes']['p50'] / 1024:.1f} KiB peak/frame, "
+          f"{alloc['retained_bytes_mean']:.0f} bytes retained/frame")
+
+
+def main():
+    interval = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.05
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    report(run(interval, rounds))
+
+
+if __name__ == "__main__":
+    main()
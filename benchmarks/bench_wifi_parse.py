@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Wi-Fi scan parser benchmark
+
+Builds scan dumps with hundreds of cells from the recorded fixtures in
+benchmarks/fixtures and reports parse throughput for the iwlist and
+`iw scan dump` parsers, next to the original substring-search parser.
+
+Usage: python3 benchmarks/bench_wifi_parse.py [cells] [rounds]
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from firmware.wifi import parse_iw_scan, parse_iwlist
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+
+
+def _split_cells(text, marker):
+    cells = []
+    for block in text.split(marker)[1:]:
+        cells.append(marker + block)
+    return cells
+
+
+def _unique_bssid(n):
+    return ":".join(f"{(n >> shift) & 0xFF:02x}" for shift in (40, 32, 24, 16, 8, 0))
+
+
+def build_iwlist(cells):
+    """iwlist output with `cells` cells, cycling through the fixture"""
+    with open(os.path.join(FIXTURES, "iwlist_scan.txt")) as f:
+        text = f.read()
+    header, _, _ = text.partition("          Cell ")
+    templates = _split_cells(text, "          Cell ")
+    out = [header]
+    for i in range(cells):
+        cell = templates[i % len(templates)]
+        _, _, rest = cell.partition("\n")
+        out.append(f"          Cell {i + 1:02d} - Address: {_unique_bssid(i).upper()}\n{rest}")
+    return "".join(out).split("\n")
+
+
+def build_iw_dump(cells):
+    """`iw dev wlan0 scan dump` output with `cells` BSS entries"""
+    with open(os.path.join(FIXTURES, "iw_scan_dump.txt")) as f:
+        text = f.read()
+    templates = _split_cells(text, "BSS ")
+    out = []
+    for i in range(cells):
+        cell = templates[i % len(templates)]
+        _, _, rest = cell.partition("\n")
+        out.append(f"BSS {_unique_bssid(i)}(on wlan0)\n{rest}")
+    return "".join(out).split("\n")
+
+
+def legacy_parse(lines):
+    """The original BlackHatDevice.parse_wifi_scan loop, without its 10-result cap"""
+    networks = []
+    current_network = {}
+    for line in lines:
+        line = line.strip()
+        if 'ESSID:' in line:
+            essid = line.split('ESSID:')[1].strip('"')
+            if essid:
+                current_network['ESSID'] = essid
+        elif 'Quality=' in line:
+            quality = line.split('Quality=')[1].split(' ')[0]
+            current_network['Quality'] = quality
+        elif 'Encryption key:' in line:
+            encryption = 'Yes' if 'on' in line else 'No'
+            current_network['Encryption'] = encryption
+            if current_network.get('ESSID'):
+                networks.append(f"{current_network['ESSID']} - {current_network.get('Quality', 'N/A')} - Encrypted: {encryption}")
+            current_network = {}
+    return networks
+
+
+def bench(name, parse, lines, rounds):
+    size = sum(len(line) + 1 for line in lines)
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        results = list(parse(lines))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<12} {len(results):6d} records {best * 1000:8.2f} ms "
+          f"{len(lines) / best / 1000:8.1f} klines/s {size / best / 1e6:6.1f} MB/s")
+    return {"records": len(results), "ms": best * 1000, "lines": len(lines), "bytes": size}
+
+
+def run(cells=500, rounds=20):
+    iwlist = build_iwlist(cells)
+    dump = build_iw_dump(cells)
+    return {
+        "iwlist": bench("iwlist", parse_iwlist, iwlist, rounds),
+        "iw_dump": bench("iw dump", parse_iw_scan, dump, rounds),
+        "legacy": bench("legacy", legacy_parse, iwlist, rounds),
+    }
+
+
+def main():
+    cells = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"Wi-Fi parser throughput: {cells} cells, best of {rounds}")
+    results = run(cells, rounds)
+    print(f"iwlist takes {results['iwlist']['ms'] / results['legacy']['ms']:.1f}x the legacy time "
+          f"(legacy: 3 fields, hidden cells dropped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite
+
+Runs the headless UI benchmark and the output parser benchmarks and writes
+everything to one JSON file, tagged with the git commit, so runs can be
+compared between commits:
+
+    python3 benchmarks/suite.py -o before.json
+    ... change something ...
+    python3 benchmarks/suite.py -o after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import bench_ui, bench_wifi_parse
+
+# Metrics where a bigger number is better; everything else is a cost
+HIGHER_IS_BETTER = ("klines_per_s", "mb_per_s")
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def with_throughput(result):
+    seconds = result["ms"] / 1000
+    result["klines_per_s"] = result["lines"] / seconds / 1000
+    result["mb_per_s"] = result["bytes"] / seconds / 1e6
+    return result
+
+
+def run_parsers(cells, rounds):
+    print(f"Parsers: {cells} cells, best of {rounds}")
+    results = bench_wifi_parse.run(cells, rounds)
+    return {name: with_throughput(result) for name, result in results.items()}
+
+
+def flatten(results, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1}, numbers only"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline, current, threshold=10.0):
+    """Print metrics that moved more than threshold percent; returns the regressions"""
+    old = flatten(baseline["results"])
+    new = flatten(current["results"])
+    regressions = []
+    unchanged = 0
+    print(f"\nvs {baseline.get('commit') or 'baseline'} (changes over {threshold:g}%)")
+    for name in sorted(old.keys() & new.keys()):
+        if not old[name]:
+            continue
+        change = (new[name] - old[name]) / abs(old[name]) * 100
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        if worse > threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif worse < -threshold:
+            flag = "improved"
+        else:
+            unchanged += 1
+            continue
+        print(f"  {name:<40} {old[name]:12.3f} -> {new[name]:12.3f} {change:+7.1f}%  {flag}")
+    print(f"  {unchanged} metrics within {threshold:g}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the BlackHat benchmark suite")
+    parser.add_argument("-o", "--output", default="benchmark-results.json",
+                        help="JSON file to write (default: %(default)s)")
+    parser.add_argument("--compare", metavar="JSON",
+                        help="earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent change reported as a regression (default: %(default)s)")
+    parser.add_argument("--interval", type=float, default=50,
+                        help="ms between scripted button presses (default: %(default)s)")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--cells", type=int, default=500,
+                        help="scan results per parser input (default: %(default)s)")
+    args = parser.parse_args()
+
+    started = time.time()
+    ui_results = bench_ui.run(args.interval / 1000, args.rounds)
+    print()
+    bench_ui.report(ui_results)
+    print()
+    results = {
+        "commit": git_commit(),
+        "timestamp": started,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "results": {
+            "ui": ui_results,
+            "parsers": run_parsers(args.cells, args.rounds),
+        },
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, results, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,49 +13,96 @@ Only use on networks and devices you own or have explicit permission to test
 """
 
 import time
+
+# Boot timing starts before anything heavy is imported
+BOOT_START = time.monotonic()
+
+import argparse
 import os
 import sys
 import threading
-import subprocess
-import json
-import socket
-import struct
-import fcntl
-import signal
-from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont
-import RPi.GPIO as GPIO
 
-# Display imports for Waveshare 1.3" LCD
-try:
-    import ST7789
-    from luma.core.interface.serial import spi
-    from luma.core.render import canvas
-    from luma.oled.device import ssd1351
-    LCD_AVAILABLE = True
-except ImportError:
-    print("LCD libraries not found. Install: pip3 install ST7789 luma.oled luma.core")
-    LCD_AVAILABLE = False
+from firmware.boot import BootTimer
+
+BOOT_PHASES = ("imports", "backend", "display init", "GPIO setup", "first frame")
+
+# The firmware's own imports are the first boot phase; boot() carries it over
+IMPORTS = BootTimer(BOOT_PHASES[:1], start=BOOT_START)
+with IMPORTS.phase("imports"):
+    from firmware import hw
+    from firmware import ui
+    from firmware import jobs
+    from firmware import tools
+    from firmware import metrics
+    from firmware.runner import CommandRunner
+    from firmware.config import load_config
+    from firmware.power import Backlight, IdleScheduler, context_switches
+    from firmware.survey import SurveyService
+    from firmware.sysmon import SystemSampler
+    from firmware.viewer import ConsoleResults, ResultsViewer
+
+# Button names accepted by --script
+SCRIPT_BUTTONS = {
+    "up": "BTN_UP",
+    "down": "BTN_DOWN",
+    "left": "BTN_LEFT",
+    "right": "BTN_RIGHT",
+    "select": "BTN_SELECT",
+    "back": "BTN_BACK",
+}
+
+# Hold the first button and press the second: (held, pressed) -> event
+BUTTON_CHORDS = {
+    ("BTN_UP", "BTN_DOWN"): ui.PROFILE,
+    ("BTN_LEFT", "BTN_RIGHT"): ui.OVERLAY,
+}
 
 class BlackHatDevice:
-    def __init__(self):
-        self.running = True
+    def __init__(self, backend=None):
+        # Set to stop; run() sleeps on it instead of polling
+        self.stopped = threading.Event()
+        self.config = load_config()
+        # Counters and latency histograms; no-ops unless [metrics] enabled
+        metrics.configure(self.config)
+        self.show_metrics = self.config["metrics"].getboolean("overlay")
+        self.frame_rate = metrics.FrameRate()
+        self.profiler = None
+        self.metrics_server = None
+        # Set when a --script run had to be cut short
+        self.script_failed = False
         self.current_menu = "main"
         self.menu_index = 0
         self.display_width = 240
         self.display_height = 240
-        
-        # Initialize display
-        if LCD_AVAILABLE:
-            self.display = ST7789.ST7789(
-                port=0, cs=1, dc=9, backlight=13, rst=22, 
-                width=240, height=240, rotation=0
-            )
-            self.display.begin()
-        
-        # Initialize GPIO for buttons (adjust pins as needed)
-        GPIO.setmode(GPIO.BCM)
-        self.setup_buttons()
+        # RPi.GPIO and the LCD driver, or stand-ins (see firmware.hw)
+        self.backend = backend
+        self.gpio = None
+        self.lcd_available = False
+        self.display = None
+        self.render = None
+        # All menu state changes and drawing happen on the UI thread
+        self.ui = ui.UiLoop(self.handle_input, self.update_display)
+        # Tools run in the background; their status is drawn as an overlay
+        self.executor = jobs.ActionExecutor(max_workers=2, max_jobs=4,
+                                            on_update=self.on_job_update)
+        self.message = None
+        # Live tool screen: callable(render) -> frame, drawn instead of the menu
+        self.screen = None
+        self.commands = CommandRunner(default_timeout=30)
+        self.wifi_interface = self.config["network"]["default_interface"]
+        # Read the kernel's cached scan results instead of starting a new scan
+        self.wifi_use_scan_dump = self.config["network"].getboolean("scan_dump")
+        # Optional periodic Wi-Fi/BT survey; None when disabled in the config
+        self.survey = SurveyService.from_config(self.config, self.commands, self.executor,
+                                                bluez_factory=lambda: self.backend.bluez_factory())
+        # /proc sampler behind System Info; None when disabled in the config
+        self.sysmon = SystemSampler.from_config(self.config)
+        # Scan history in SQLite, opened by run(); None when disabled in the config
+        self.store = None
+        # LCD backlight and the idle dim/blank scheduler; None without an LCD or when disabled
+        self.backlight = None
+        self.power = None
+        self.sysmon_paused = False
         
         # Menu structure
         self.menus = {
@@ -105,6 +152,7 @@ class BlackHatDevice:
                 "items": [
                     ("Pin State", "gpio_state"),
                     ("PWM Control", "gpio_pwm"),
+                    ("Logic Analyzer", "logic_analyzer"),
                     ("I2C Scanner", "i2c_scan"),
                     ("SPI Test", "spi_test"),
                     ("Back", "main")
@@ -115,13 +163,76 @@ class BlackHatDevice:
                 "items": [
                     ("Display", "display_settings"),
                     ("Network", "network_settings"),
+                    ("Background Survey", "survey_toggle"),
                     ("About", "about"),
                     ("Back", "main")
                 ]
             }
         }
         
-        self.boot_splash()
+        self.boot()
+    
+    @property
+    def running(self):
+        return not self.stopped.is_set()
+    
+    @running.setter
+    def running(self, value):
+        if value:
+            self.stopped.clear()
+        else:
+            self.stopped.set()
+    
+    def boot(self):
+        """Bring up display and GPIO in timed phases, then draw the main menu"""
+        timer = BootTimer(BOOT_PHASES, start=BOOT_START, on_progress=self.boot_splash)
+        timer.durations.update(IMPORTS.durations)
+        
+        with timer.phase("backend"):
+            if self.backend is None:
+                self.backend = hw.load_backend(os.environ.get("BLACKHAT_BACKEND")
+                                               or self.config["system"]["backend"])
+            self.gpio = self.backend.gpio
+            driver = self.backend.display_driver
+            if driver is not None:
+                # PIL and numpy come in with the render and display modules
+                from firmware.render import RenderCache
+                from firmware.lcd import PartialDisplay
+            else:
+                print("=== BlackHat Firmware ===")
+                print("Educational Hacking Device")
+                print("Booting...")
+        
+        with timer.phase("display init"):
+            if driver is not None:
+                self.render = RenderCache(self.display_width, self.display_height)
+                backlight = self.config["display"].getint("backlight")
+                if self.config["power"].getboolean("enabled"):
+                    backlight = None    # Driven by the idle scheduler instead of the driver
+                panel = driver.ST7789(
+                    port=0, cs=1, dc=9, backlight=backlight, rst=22, 
+                    width=240, height=240, rotation=0
+                )
+                panel.begin()
+                # Only changed rectangles are pushed after the first frame
+                self.display = PartialDisplay(panel, self.display_width, self.display_height)
+                self.lcd_available = True
+                if backlight is None:
+                    # Light the panel before the splash is drawn on it
+                    self.gpio.setmode(self.gpio.BCM)
+                    self.setup_backlight()
+        
+        with timer.phase("GPIO setup"):
+            # Initialize GPIO for buttons (adjust pins as needed)
+            self.gpio.setmode(self.gpio.BCM)
+            self.setup_buttons()
+            if self.lcd_available:
+                self.setup_power()
+        
+        with timer.phase("first frame"):
+            self.update_display()
+        
+        self.boot_times = timer.report()
     
     def setup_buttons(self):
         """Setup GPIO buttons for navigation"""
@@ -133,141 +244,292 @@ class BlackHatDevice:
         self.BTN_SELECT = 12
         self.BTN_BACK = 20
         
+        self.button_events = {
+            self.BTN_UP: ui.UP,
+            self.BTN_DOWN: ui.DOWN,
+            self.BTN_LEFT: ui.LEFT,
+            self.BTN_RIGHT: ui.RIGHT,
+            self.BTN_SELECT: ui.SELECT,
+            self.BTN_BACK: ui.BACK,
+        }
+        # pressed pin -> (pin that must be held, event)
+        self.button_chords = {getattr(self, pressed): (getattr(self, held), event)
+                              for (held, pressed), event in BUTTON_CHORDS.items()}
         buttons = [self.BTN_UP, self.BTN_DOWN, self.BTN_LEFT, 
                   self.BTN_RIGHT, self.BTN_SELECT, self.BTN_BACK]
         
         for btn in buttons:
-            GPIO.setup(btn, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-            GPIO.add_event_detect(btn, GPIO.FALLING, 
+            self.gpio.setup(btn, self.gpio.IN, pull_up_down=self.gpio.PUD_UP)
+            self.gpio.add_event_detect(btn, self.gpio.FALLING, 
                                 callback=self.button_callback, bouncetime=200)
     
-    def boot_splash(self):
-        """Display boot splash screen"""
-        if not LCD_AVAILABLE:
-            print("=== BlackHat Firmware ===")
-            print("Educational Hacking Device")
-            print("Booting...")
-            time.sleep(3)
+    def setup_backlight(self):
+        """Take over the backlight pin from the driver and switch it on"""
+        section = self.config["power"]
+        self.backlight = Backlight.open(self.backend, self.config["display"].getint("backlight"),
+                                        section.getint("pwm_chip"), section.getfloat("pwm_frequency"))
+        self.backlight.set(section.getfloat("brightness"))
+    
+    def setup_power(self):
+        """Start the idle dim/blank scheduler on the backlight setup_backlight() took"""
+        if self.backlight is None:
+            return
+        self.power = IdleScheduler.from_config(self.config, self.backlight,
+                                               on_blank=self.pause_background,
+                                               on_wake=self.resume_background)
+        self.schedule_idle()
+    
+    def schedule_idle(self):
+        """Set the UI timer for the next dim/blank step"""
+        deadline = self.power.next_deadline()
+        if deadline is None:
+            self.ui.cancel("idle")
+        else:
+            self.ui.call_at("idle", deadline, self.idle_tick)
+    
+    def idle_tick(self):
+        """UI timer: dim or blank the backlight once idle long enough"""
+        self.power.tick()
+        self.schedule_idle()
+        return False
+    
+    def pause_background(self):
+        """Screen blanked: nobody is looking at the sparklines"""
+        if (self.config["power"].getboolean("pause_samplers")
+                and self.sysmon is not None and self.sysmon.running):
+            self.sysmon.stop()
+            self.sysmon_paused = True
+    
+    def resume_background(self):
+        """Screen woken: restart what pause_background() stopped"""
+        if self.sysmon_paused:
+            self.sysmon_paused = False
+            self.sysmon.start()
+    
+    def boot_splash(self, progress):
+        """Display boot splash screen with the loading bar at progress (0-1)"""
+        # Nothing to draw on before display init; at 100% the menu is up
+        if self.display is None or progress >= 1.0:
             return
         
-        # Create boot image
-        image = Image.new('RGB', (self.display_width, self.display_height), color=(0, 0, 0))
-        draw = ImageDraw.Draw(image)
-        
-        try:
-            font_large = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 24)
-            font_small = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 16)
-        except:
-            font_large = ImageFont.load_default()
-            font_small = ImageFont.load_default()
+        self.display.display(self.render.splash_frame(progress))
+    
+    def button_callback(self, channel):
+        """Handle button presses (runs on the RPi.GPIO edge thread)"""
+        event = self.button_events.get(channel)
+        if event is None:
+            return
+        chord = self.button_chords.get(channel)
+        # Buttons pull up, so a held button reads LOW
+        if chord is not None and self.gpio.input(chord[0]) == self.gpio.LOW:
+            event = chord[1]
+        self.ui.post(event)
+    
+    def handle_input(self, event):
+        """Apply an input event to the menu state; runs on the UI thread"""
+        if self.power is not None:
+            woke = self.power.input()
+            self.schedule_idle()
+            if woke:
+                return True     # The press that lights a blank screen does nothing else
         
-        # Draw boot screen
-        draw.text((120, 80), "BlackHat", fill=(0, 255, 0), font=font_large, anchor="mm")
-        draw.text((120, 110), "Educational Firmware", fill=(255, 255, 255), font=font_small, anchor="mm")
-        draw.text((120, 130), "v1.0", fill=(128, 128, 128), font=font_small, anchor="mm")
+        if event == ui.PROFILE:
+            self.toggle_profile()
+            return True
+        if event == ui.OVERLAY:
+            self.show_metrics = not self.show_metrics
+            return True
         
-        # Add loading animation
-        for i in range(20):
-            draw.rectangle([(60 + i*6, 160), (60 + i*6 + 4, 170)], 
-                          fill=(0, 255, 0) if i < 10 else (128, 128, 128))
+        if self.screen is not None:
+            handler = getattr(self.screen, "handle_input", None)
+            if handler is not None and handler(event):
+                return True
+            if event in (ui.BACK, ui.ESCAPE):
+                # BACK stops the job behind a live screen, then closes it
+                if self.executor.cancel_foreground() is None:
+                    self.close_screen()
+                return True
+            # The menu underneath does not move while a screen is up
+            return event in (ui.UP, ui.DOWN, ui.SELECT)
         
-        self.display.display(image)
-        time.sleep(3)
-    
-    def button_callback(self, channel):
-        """Handle button presses"""
-        if channel == self.BTN_UP:
+        if event == ui.UP:
             self.menu_index = max(0, self.menu_index - 1)
-        elif channel == self.BTN_DOWN:
+        elif event == ui.DOWN:
             max_index = len(self.menus[self.current_menu]["items"]) - 1
             self.menu_index = min(max_index, self.menu_index + 1)
-        elif channel == self.BTN_SELECT:
+        elif event == ui.SELECT:
             self.select_menu_item()
-        elif channel == self.BTN_BACK:
+        elif event in (ui.BACK, ui.ESCAPE):
+            if self.executor.cancel_foreground() is not None:
+                return True
             if self.current_menu != "main":
                 self.current_menu = "main"
                 self.menu_index = 0
-        
-        self.update_display()
+            elif event == ui.ESCAPE:
+                self.running = False
+                return False
+        else:
+            return False
+        return True
     
     def select_menu_item(self):
         """Handle menu item selection"""
         current_items = self.menus[self.current_menu]["items"]
         if self.menu_index < len(current_items):
-            _, action = current_items[self.menu_index]
+            label, action = current_items[self.menu_index]
             
             if action in self.menus:
                 self.current_menu = action
                 self.menu_index = 0
             else:
-                self.execute_action(action)
-    
-    def execute_action(self, action):
-        """Execute selected action"""
-        action_map = {
-            "wifi_scan": self.wifi_scan,
-            "wifi_monitor": self.wifi_monitor,
-            "wifi_deauth": self.wifi_deauth,
-            "create_ap": self.create_access_point,
-            "bt_scan": self.bluetooth_scan,
-            "ble_scan": self.ble_scan,
-            "bt_info": self.bluetooth_info,
-            "port_scan": self.port_scanner,
-            "network_scan": self.network_scanner,
-            "packet_capture": self.packet_capture,
-            "dns_lookup": self.dns_lookup,
-            "gpio_state": self.gpio_state,
-            "gpio_pwm": self.gpio_pwm,
-            "i2c_scan": self.i2c_scanner,
-            "spi_test": self.spi_test,
-            "system_info": self.show_system_info,
-            "about": self.show_about,
-            "shutdown": self.shutdown_device
-        }
-        
-        if action in action_map:
-            action_map[action]()
+                self.execute_action(action, label)
     
-    def update_display(self):
-        """Update the display with current menu"""
-        if not LCD_AVAILABLE:
-            self.print_menu_console()
-            return
+    def execute_action(self, action, label=None):
+        """Start the selected action as a background job"""
+        if action not in tools.ACTIONS:
+            return None
         
-        image = Image.new('RGB', (self.display_width, self.display_height), color=(0, 0, 0))
-        draw = ImageDraw.Draw(image)
+        metrics.count(f"action.{action}")
         
-        try:
-            font_title = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 18)
-            font_item = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 14)
-        except:
-            font_title = ImageFont.load_default()
-            font_item = ImageFont.load_default()
-        
-        # Draw title
-        title = self.menus[self.current_menu]["title"]
-        draw.text((120, 20), title, fill=(0, 255, 255), font=font_title, anchor="mm")
+        def run_tool():
+            # The tool module is imported on the worker, never on the UI thread
+            with metrics.timer(f"tool.{action}"):
+                return tools.load(action)(self)
         
-        # Draw menu items
-        items = self.menus[self.current_menu]["items"]
-        start_y = 50
+        with metrics.timer("ui.execute_action"):
+            resources = tools.resources(action)
+            survey = self.survey
+            if (action in tools.SURVEY_ACTIONS and survey is not None and survey.running
+                    and (action != "bt_scan" or survey.bluetooth_enabled)):
+                resources = ()  # Served from the cache; the survey owns the radio
+            job, reason = self.executor.submit(label or action, run_tool, resources)
+        if job is None:
+            self.show_warning(reason)
+        return job
+    
+    def on_job_update(self, job):
+        """Redraw the status overlay when a job reports progress (any thread)"""
+        if not self.lcd_available:
+            return
+        self.ui.request_render()
+        if not job.active:
+            # Clear the overlay once the final status has been shown
+            self.ui.render_after(self.executor.linger + 0.05)
+    
+    def overlay_status(self):
+        """Return (text, progress, kind) for the status overlay, or None"""
+        job = self.executor.foreground()
+        if job is not None:
+            return job.status or f"{job.name}...", job.progress, job.level
         
-        for i, (item_text, _) in enumerate(items):
-            y_pos = start_y + i * 25
-            color = (255, 255, 0) if i == self.menu_index else (255, 255, 255)
-            
-            if i == self.menu_index:
-                draw.rectangle([(10, y_pos - 10), (230, y_pos + 10)], fill=(64, 64, 64))
+        if self.message is not None:
+            kind, text, shown = self.message
+            if time.monotonic() - shown < self.executor.linger:
+                return text, None, kind
+            self.message = None
+        return None
+    
+    def update_display(self):
+        """Update the display with current menu"""
+        with metrics.timer("ui.update_display"):
+            if not self.lcd_available:
+                self.print_menu_console()
+                return
+            if self.power is not None and self.power.blanked:
+                return      # Nothing to see; the waking press redraws
             
-            draw.text((20, y_pos), f"> {item_text}" if i == self.menu_index else f"  {item_text}", 
-                     fill=color, font=font_item)
+            if self.screen is not None:
+                frame = self.screen(self.render)
+            else:
+                menu = self.menus[self.current_menu]
+                frame = self.render.menu_frame(self.current_menu, self.menu_index, menu)
+            overlay = self.overlay_status()
+            if overlay is not None:
+                text, progress, kind = overlay
+                frame = self.render.status_overlay(frame, text, progress, kind)
+            if self.show_metrics:
+                frame = self.render.metrics_overlay(frame, self.metrics_text())
+            self.display.display(frame)
         
-        # Draw status bar
-        draw.line([(0, 220), (240, 220)], fill=(128, 128, 128))
-        draw.text((120, 230), f"Select: Enter | Back: ESC", 
-                 fill=(128, 128, 128), font=font_item, anchor="mm")
+        if self.show_metrics:
+            self.frame_rate.tick()
+            # Keep the readout current while nothing else redraws
+            self.ui.render_after(1.0)
+    
+    def metrics_text(self):
+        """FPS, then the recent update_display/panel push times in ms"""
+        text = f"{self.frame_rate.rate():.0f}fps"
+        update = metrics.registry.histograms.get("ui.update_display")
+        push = metrics.registry.histograms.get("lcd.push")
+        if update is not None and push is not None:
+            text += f" {update.recent * 1000:.1f}/{push.recent * 1000:.1f}ms"
+        return text
+    
+    def toggle_profile(self):
+        """Start a sampling profile of every thread, or end the running one early"""
+        if self.profiler is not None and self.profiler.running:
+            self.profiler.stop()
+            return
         
-        self.display.display(image)
+        from firmware.profiler import SamplingProfiler
+        section = self.config["metrics"]
+        seconds = section.getfloat("profile_seconds")
+        self.profiler = SamplingProfiler(section["directory"], section.getfloat("profile_interval"),
+                                         on_done=self.profile_done)
+        self.profiler.start(seconds)
+        self.show_status(f"Profiling {seconds:g}s...")
+    
+    def profile_done(self, path, error):
+        """Report a finished profile (runs on the profiler thread)"""
+        if path is not None:
+            self.show_success(f"Profile: {os.path.basename(path)}")
+        else:
+            self.show_error(f"Profile failed: {error}")
+    
+    def register_gauges(self):
+        """Expose the counters other components already keep"""
+        metrics.gauge("ui.frames", lambda: self.ui.frames)
+        metrics.gauge("ui.events", lambda: self.ui.handled)
+        metrics.gauge("ui.dropped", lambda: self.ui.dropped)
+        metrics.gauge("ui.wakeups", lambda: self.ui.wakeups)
+        metrics.gauge("jobs.active", lambda: len(self.executor.active_jobs()))
+        metrics.gauge("process.context_switches", context_switches)
+        if self.backlight is not None:
+            metrics.gauge("power.backlight", lambda: self.backlight.level)
+        if self.display is not None:
+            metrics.gauge("lcd.frames", lambda: self.display.stats.frames)
+            metrics.gauge("lcd.full_frames", lambda: self.display.stats.full_frames)
+            metrics.gauge("lcd.skipped_frames", lambda: self.display.stats.skipped_frames)
+            metrics.gauge("render.cache_hits", lambda: self.render.hits)
+            metrics.gauge("render.cache_misses", lambda: self.render.misses)
+        if self.sysmon is not None:
+            metrics.gauge("sysmon.cpu_share", lambda: self.sysmon.cost)
+        if self.store is not None:
+            metrics.gauge("store.pending", lambda: self.store.stats()["pending"])
+            metrics.gauge("store.dropped", lambda: self.store.dropped)
+    
+    def start_metrics_server(self):
+        """Serve /metrics on [metrics] listen; a bad address only costs the endpoint"""
+        # http.server is only imported when metrics are on
+        from firmware.metrics_server import MetricsServer
+        try:
+            self.metrics_server = MetricsServer.from_config(self.config)
+            if self.metrics_server is not None:
+                self.metrics_server.start()
+                print(f"Metrics on {self.metrics_server.describe()}")
+        except (OSError, ValueError) as e:
+            print(f"Metrics endpoint not started: {e}")
+            self.metrics_server = None
+    
+    def show_screen(self, screen):
+        """Draw screen(render) instead of the menu until close_screen()"""
+        self.screen = screen
+        self.ui.request_render()
+    
+    def close_screen(self):
+        """Return to the menu"""
+        self.screen = None
+        self.ui.request_render()
     
     def print_menu_console(self):
         """Print menu to console when display not available"""
@@ -281,330 +543,117 @@ class BlackHatDevice:
         
         print("\nUse keyboard: w/s (up/down), Enter (select), q (back)")
     
-    # WiFi Tools
-    def wifi_scan(self):
-        """Scan for WiFi networks"""
-        self.show_status("Scanning WiFi networks...")
-        try:
-            result = subprocess.run(['iwlist', 'wlan0', 'scan'], 
-                                  capture_output=True, text=True)
-            # Parse and display results
-            networks = self.parse_wifi_scan(result.stdout)
-            self.display_results("WiFi Networks", networks)
-        except Exception as e:
-            self.show_error(f"WiFi scan failed: {str(e)}")
-    
-    def wifi_monitor(self):
-        """Enable monitor mode"""
-        self.show_status("Enabling monitor mode...")
-        try:
-            subprocess.run(['sudo', 'airmon-ng', 'start', 'wlan0'], check=True)
-            self.show_success("Monitor mode enabled")
-        except Exception as e:
-            self.show_error(f"Monitor mode failed: {str(e)}")
-    
-    def wifi_deauth(self):
-        """Perform deauth attack (educational only)"""
-        self.show_warning("EDUCATIONAL ONLY - Own networks!")
-        # Implementation would go here
-        time.sleep(2)
-        self.show_status("Deauth demo completed")
-    
-    def create_access_point(self):
-        """Create access point"""
-        self.show_status("Creating access point...")
-        # Implementation for creating AP
-        time.sleep(2)
-        self.show_success("AP created: BlackHat-Demo")
-    
-    # Bluetooth Tools
-    def bluetooth_scan(self):
-        """Scan for Bluetooth devices"""
-        self.show_status("Scanning Bluetooth devices...")
-        try:
-            result = subprocess.run(['hcitool', 'scan'], 
-                                  capture_output=True, text=True)
-            devices = result.stdout.strip().split('\n')[1:]  # Skip header
-            self.display_results("Bluetooth Devices", devices)
-        except Exception as e:
-            self.show_error(f"Bluetooth scan failed: {str(e)}")
-    
-    def ble_scan(self):
-        """Scan for BLE devices"""
-        self.show_status("Scanning BLE devices...")
-        # BLE scanning implementation
-        time.sleep(3)
-        self.show_success("BLE scan completed")
-    
-    def bluetooth_info(self):
-        """Show Bluetooth adapter info"""
-        try:
-            result = subprocess.run(['hciconfig'], capture_output=True, text=True)
-            self.display_text("Bluetooth Info", result.stdout)
-        except Exception as e:
-            self.show_error(f"Failed to get BT info: {str(e)}")
-    
-    # Network Tools
-    def port_scanner(self):
-        """Simple port scanner"""
-        self.show_status("Port scanning localhost...")
-        open_ports = []
-        
-        for port in [22, 80, 443, 8080, 3389, 21, 23]:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
-            result = sock.connect_ex(('127.0.0.1', port))
-            if result == 0:
-                open_ports.append(f"Port {port}: Open")
-            sock.close()
-        
-        self.display_results("Open Ports", open_ports or ["No open ports found"])
-    
-    def network_scanner(self):
-        """Scan local network"""
-        self.show_status("Scanning local network...")
-        # Network scanning implementation
-        time.sleep(3)
-        self.show_success("Network scan completed")
-    
-    def packet_capture(self):
-        """Capture network packets"""
-        self.show_status("Starting packet capture...")
-        # Packet capture implementation
-        time.sleep(3)
-        self.show_success("Capture saved to /tmp/capture.pcap")
-    
-    def dns_lookup(self):
-        """Perform DNS lookup"""
-        try:
-            import socket
-            hostname = "google.com"
-            ip = socket.gethostbyname(hostname)
-            self.display_text("DNS Lookup", f"{hostname} -> {ip}")
-        except Exception as e:
-            self.show_error(f"DNS lookup failed: {str(e)}")
-    
-    # GPIO Tools
-    def gpio_state(self):
-        """Show GPIO pin states"""
-        gpio_info = []
-        for pin in range(2, 28):
-            try:
-                GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-                state = GPIO.input(pin)
-                gpio_info.append(f"Pin {pin}: {'HIGH' if state else 'LOW'}")
-            except:
-                gpio_info.append(f"Pin {pin}: ERROR")
-        
-        self.display_results("GPIO States", gpio_info)
-    
-    def gpio_pwm(self):
-        """PWM control demo"""
-        self.show_status("PWM demo on pin 18...")
-        try:
-            GPIO.setup(18, GPIO.OUT)
-            pwm = GPIO.PWM(18, 1000)  # 1kHz frequency
-            pwm.start(0)
-            
-            for duty_cycle in range(0, 101, 10):
-                pwm.ChangeDutyCycle(duty_cycle)
-                time.sleep(0.1)
-            
-            pwm.stop()
-            self.show_success("PWM demo completed")
-        except Exception as e:
-            self.show_error(f"PWM failed: {str(e)}")
-    
-    def i2c_scanner(self):
-        """Scan I2C bus"""
-        self.show_status("Scanning I2C bus...")
-        try:
-            result = subprocess.run(['i2cdetect', '-y', '1'], 
-                                  capture_output=True, text=True)
-            self.display_text("I2C Devices", result.stdout)
-        except Exception as e:
-            self.show_error(f"I2C scan failed: {str(e)}")
-    
-    def spi_test(self):
-        """SPI test"""
-        self.show_status("SPI test...")
-        # SPI testing implementation
-        time.sleep(2)
-        self.show_success("SPI test completed")
-    
-    # System functions
-    def show_system_info(self):
-        """Display system information"""
-        info = []
-        info.append(f"Hostname: {socket.gethostname()}")
-        info.append(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        try:
-            with open('/proc/loadavg', 'r') as f:
-                load = f.read().strip()
-                info.append(f"Load: {load}")
-        except:
-            pass
-        
-        try:
-            with open('/proc/meminfo', 'r') as f:
-                for line in f:
-                    if 'MemTotal' in line or 'MemFree' in line:
-                        info.append(line.strip())
-        except:
-            pass
-        
-        self.display_results("System Info", info)
-    
-    def show_about(self):
-        """Show about information"""
-        about_text = """BlackHat Educational Firmware v1.0
-
-Created for Raspberry Pi Zero 2 W
-Hardware: Waveshare Package F
-OS: Raspberry Pi OS 32-bit
-
-WARNING: Educational use only!
-Only test on owned devices.
-
-Inspired by:
-- M5StickC Bruce Firmware
-- Flipper Zero
-
-Features:
-- WiFi penetration testing
-- Bluetooth scanning
-- Network analysis
-- GPIO control
-- System monitoring"""
+    # Utility functions
+    def post_message(self, kind, message):
+        """Publish a status/success/error/warning message without blocking"""
+        job = jobs.current_job()
+        if job is not None:
+            job.update(status=message, level=kind)
+        elif self.lcd_available:
+            self.message = (kind, message, time.monotonic())
+            self.ui.request_render()
+            self.ui.render_after(self.executor.linger + 0.05)
         
-        self.display_text("About", about_text)
-    
-    def shutdown_device(self):
-        """Shutdown the device"""
-        self.show_status("Shutting down...")
-        time.sleep(2)
-        self.running = False
-        GPIO.cleanup()
-        os.system('sudo shutdown -h now')
+        if not self.lcd_available:
+            print(f"{kind.upper()}: {message}")
     
-    # Utility functions
     def show_status(self, message):
         """Show status message"""
-        if LCD_AVAILABLE:
-            image = Image.new('RGB', (self.display_width, self.display_height), color=(0, 0, 0))
-            draw = ImageDraw.Draw(image)
-            draw.text((120, 120), message, fill=(255, 255, 0), anchor="mm")
-            self.display.display(image)
-        else:
-            print(f"STATUS: {message}")
-        time.sleep(1)
+        self.post_message("status", message)
     
     def show_success(self, message):
         """Show success message"""
-        if LCD_AVAILABLE:
-            image = Image.new('RGB', (self.display_width, self.display_height), color=(0, 0, 0))
-            draw = ImageDraw.Draw(image)
-            draw.text((120, 120), "✓ " + message, fill=(0, 255, 0), anchor="mm")
-            self.display.display(image)
-        else:
-            print(f"SUCCESS: {message}")
-        time.sleep(2)
+        self.post_message("success", message)
     
     def show_error(self, message):
         """Show error message"""
-        if LCD_AVAILABLE:
-            image = Image.new('RGB', (self.display_width, self.display_height), color=(0, 0, 0))
-            draw = ImageDraw.Draw(image)
-            draw.text((120, 120), "✗ " + message, fill=(255, 0, 0), anchor="mm")
-            self.display.display(image)
-        else:
-            print(f"ERROR: {message}")
-        time.sleep(2)
+        self.post_message("error", message)
     
     def show_warning(self, message):
         """Show warning message"""
-        if LCD_AVAILABLE:
-            image = Image.new('RGB', (self.display_width, self.display_height), color=(0, 0, 0))
-            draw = ImageDraw.Draw(image)
-            draw.text((120, 120), "⚠ " + message, fill=(255, 165, 0), anchor="mm")
-            self.display.display(image)
-        else:
-            print(f"WARNING: {message}")
-        time.sleep(2)
+        self.post_message("warning", message)
     
     def display_results(self, title, items):
-        """Display list of results"""
-        if LCD_AVAILABLE:
-            # Paginated display for LCD
-            self.display_paginated_results(title, items)
-        else:
-            print(f"\n=== {title} ===")
-            for item in items:
-                print(f"  {item}")
+        """Display list of results; items may be a generator still producing them"""
+        results = self.stream_results(title)
+        results.extend(items)
+        self.finish_results(results)
+    
+    def stream_results(self, title):
+        """Open a result list that a running tool appends items to"""
+        if self.lcd_available:
+            results = ResultsViewer(self.render, title, on_change=self.ui.request_render)
+            self.show_screen(results)
+            return results
+        return ConsoleResults(title)
+    
+    def finish_results(self, results):
+        """Record a stream_results() list as the job's result"""
+        job = jobs.current_job()
+        if job is not None:
+            job.result = (results.title, results.items)
+            job.update(status=f"{results.title}: {len(results.items)} results", level="success")
+        elif not self.lcd_available:
             input("\nPress Enter to continue...")
     
     def display_text(self, title, text):
         """Display text content"""
-        if LCD_AVAILABLE:
-            # Display text on LCD
-            pass
+        job = jobs.current_job()
+        if job is not None:
+            job.result = (title, text)
+            job.update(status=title, level="success")
+        
+        if self.lcd_available:
+            # One viewer item per line; long lines wrap
+            self.show_screen(ResultsViewer(self.render, title, text.splitlines()))
         else:
             print(f"\n=== {title} ===")
             print(text)
-            input("\nPress Enter to continue...")
-    
-    def display_paginated_results(self, title, items):
-        """Display paginated results on LCD"""
-        # Implementation for paginated display
-        pass
+            if job is None:
+                input("\nPress Enter to continue...")
     
-    def parse_wifi_scan(self, scan_output):
-        """Parse iwlist scan output"""
-        networks = []
-        lines = scan_output.split('\n')
-        current_network = {}
-        
-        for line in lines:
-            line = line.strip()
-            if 'ESSID:' in line:
-                essid = line.split('ESSID:')[1].strip('"')
-                if essid:
-                    current_network['ESSID'] = essid
-            elif 'Quality=' in line:
-                quality = line.split('Quality=')[1].split(' ')[0]
-                current_network['Quality'] = quality
-            elif 'Encryption key:' in line:
-                encryption = 'Yes' if 'on' in line else 'No'
-                current_network['Encryption'] = encryption
-                
-                if current_network.get('ESSID'):
-                    networks.append(f"{current_network['ESSID']} - {current_network.get('Quality', 'N/A')} - Encrypted: {encryption}")
-                current_network = {}
-        
-        return networks[:10]  # Limit to 10 results
+    def script_timeline(self, script, interval=0.0):
+        """Turn "down,down,select" into a fake GPIO timeline of button presses
+
+        "up+down" holds UP while pressing DOWN, for the button chords.
+        """
+        timeline = []
+        for step in script.split(","):
+            names = [name.strip().lower() for name in step.split("+")]
+            if not any(names):
+                continue
+            for name in names:
+                if name not in SCRIPT_BUTTONS:
+                    raise ValueError(f"Unknown button {name!r} in script")
+            pins = [getattr(self, SCRIPT_BUTTONS[name]) for name in names]
+            timeline.append((interval, pins[0] if len(pins) == 1 else tuple(pins)))
+        return timeline
+    
+    def finish_script(self, timeout=30.0):
+        """Stop once the scripted presses and any jobs they started are done
+
+        A job still running after timeout seconds, such as a live screen the
+        script never left with BACK, is reported and cancelled and the run
+        counts as failed.
+        """
+        deadline = time.monotonic() + timeout
+        while self.ui.queued or self.executor.active_jobs():
+            if time.monotonic() >= deadline:
+                names = ", ".join(job.name for job in self.executor.active_jobs())
+                print(f"Script timed out after {timeout:g}s; cancelling: {names or 'queued input'}")
+                self.script_failed = True
+                break
+            time.sleep(0.01)
+        self.running = False
     
     def keyboard_input_handler(self):
         """Handle keyboard input when display not available"""
+        keys = {'w': ui.UP, 's': ui.DOWN, '': ui.SELECT, 'q': ui.ESCAPE}
         while self.running:
             try:
                 key = input().lower()
-                if key == 'w':
-                    self.menu_index = max(0, self.menu_index - 1)
-                elif key == 's':
-                    max_index = len(self.menus[self.current_menu]["items"]) - 1
-                    self.menu_index = min(max_index, self.menu_index + 1)
-                elif key == '':  # Enter
-                    self.select_menu_item()
-                elif key == 'q':
-                    if self.current_menu != "main":
-                        self.current_menu = "main"
-                        self.menu_index = 0
-                    else:
-                        self.running = False
-                        break
-                
-                self.update_display()
+                if key in keys:
+                    self.ui.post(keys[key])
             except KeyboardInterrupt:
                 self.running = False
                 break
@@ -612,35 +661,101 @@ Features:
                 self.running = False
                 break
     
-    def run(self):
-        """Main run loop"""
+    def run(self, script=None, script_timeout=30.0):
+        """Main run loop; with a script timeline, replay it and exit"""
         try:
-            if not LCD_AVAILABLE:
+            if script is not None:
+                self.gpio.play(script, on_done=lambda: self.finish_script(script_timeout))
+            elif not self.lcd_available:
                 # Start keyboard input handler thread
                 input_thread = threading.Thread(target=self.keyboard_input_handler)
                 input_thread.daemon = True
                 input_thread.start()
             
-            self.update_display()
+            self.ui.start()
+            if self.survey is not None:
+                self.survey.start()
+            if self.sysmon is not None:
+                self.sysmon.start()
+            # sqlite3 is imported after the first frame, not on the boot path
+            from firmware.store import ResultStore
+            self.store = ResultStore.from_config(self.config)
+            if self.store is not None:
+                self.store.start()
+            if metrics.registry.enabled:
+                self.register_gauges()
+                self.start_metrics_server()
             
-            while self.running:
-                time.sleep(0.1)
+            # Everything happens on other threads; sleep until stopped
+            self.stopped.wait()
                 
         except KeyboardInterrupt:
             print("\nShutting down...")
         finally:
-            GPIO.cleanup()
+            if self.metrics_server is not None:
+                self.metrics_server.close()
+            if self.profiler is not None:
+                self.profiler.stop()
+                self.profiler.join(2.0)
+            if self.survey is not None:
+                self.survey.stop()
+            if self.sysmon is not None:
+                self.sysmon.close()
+            self.executor.shutdown()
+            if self.store is not None:
+                self.store.close()
+            self.ui.stop()
+            if self.backlight is not None:
+                self.backlight.close()
+            self.gpio.cleanup()
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="BlackHat Educational Firmware")
+    parser.add_argument("--backend", choices=hw.BACKENDS,
+                        help="hardware backend (default: $BLACKHAT_BACKEND, then [system] backend)")
+    parser.add_argument("--script",
+                        help="comma-separated button presses to replay on the fake "
+                             "backend, e.g. down,down,select,back (up+down is a chord); "
+                             "exits when done")
+    parser.add_argument("--interval", type=float, default=0.0,
+                        help="seconds between scripted presses (0 = full speed)")
+    parser.add_argument("--script-timeout", type=float, default=30.0,
+                        help="seconds to wait for jobs a script started before cancelling "
+                             "them and exiting non-zero (default: %(default)s)")
+    parser.add_argument("--dump-frames", metavar="DIR",
+                        help="fake backend: save every panel update as a PNG in DIR")
+    args = parser.parse_args()
+    
     print("BlackHat Educational Firmware Starting...")
     
     # Check if running as root for some operations
     if os.geteuid() != 0:
         print("Note: Some features require root privileges")
     
-    device = BlackHatDevice()
-    device.run()
+    if args.dump_frames:
+        os.makedirs(args.dump_frames, exist_ok=True)
+        os.environ["BLACKHAT_FAKE_DUMP"] = args.dump_frames
+    backend = args.backend
+    if args.script and backend is None:
+        backend = "fake"
+    
+    device = BlackHatDevice(hw.load_backend(backend) if backend else None)
+    script = None
+    if args.script:
+        if not device.backend.is_fake:
+            parser.error("--script needs the fake backend")
+        script = device.script_timeline(args.script, args.interval)
+    device.run(script, args.script_timeout)
+    
+    if script is not None:
+        print(f"Script done: {device.ui.handled} events, {device.ui.frames} frames, "
+              f"{device.ui.dropped} dropped")
+        if device.display is not None:
+            stats = device.display.stats
+            print(f"Panel: {stats.frames} frames, {stats.total_bytes} bytes")
+        if device.script_failed:
+            sys.exit(1)
 
 if __name__ == "__main__":
     main()
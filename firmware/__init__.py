@@ -0,0 +1,4 @@
+"""
+BlackHat Educational Firmware - support package
+Rendering, display and tool modules used by blackhat.py
+"""
@@ -0,0 +1,259 @@
+"""
+Bluetooth discovery through BlueZ over D-Bus
+
+Starts discovery on an adapter and follows the org.bluez object tree by
+signals instead of polling: InterfacesAdded announces a device, and with
+DuplicateData on, PropertiesChanged delivers every advertisement's new
+RSSI (and a name once one is received). Each signal is merged into a
+DeviceTable keyed by address. The table holds at most max_devices
+entries, dropping the least recently seen device when full, and ages out
+devices not heard from for max_age seconds. LE privacy addresses rotate
+every few minutes, so an unbounded table would only grow.
+
+Signals wait in a bounded queue between polls. If the reader falls behind,
+the oldest signals are dropped; with DuplicateData on, a newer update for
+the same device is never far behind.
+"""
+
+import time
+from collections import deque
+
+from jeepney import DBusAddress, DBusErrorResponse, HeaderFields, MatchRule, message_bus, new_method_call
+from jeepney.wrappers import unwrap_msg
+
+BLUEZ = "org.bluez"
+ADAPTER_INTERFACE = "org.bluez.Adapter1"
+DEVICE_INTERFACE = "org.bluez.Device1"
+OBJECT_MANAGER = "org.freedesktop.DBus.ObjectManager"
+PROPERTIES = "org.freedesktop.DBus.Properties"
+
+TRANSPORTS = ("auto", "bredr", "le")
+CALL_TIMEOUT = 5.0
+
+
+class BtDevice:
+    """One device as last heard, with first/last seen times (time.time())"""
+
+    __slots__ = ("address", "name", "rssi", "kind", "adverts", "first_seen", "last_seen")
+
+    def __init__(self, address, now):
+        self.address = address
+        self.name = ""
+        self.rssi = None
+        self.kind = "LE"
+        self.adverts = 0
+        self.first_seen = now
+        self.last_seen = now
+
+    def label(self):
+        rssi = f"{self.rssi}dBm" if self.rssi is not None else "?"
+        return f"{self.address} {rssi} {self.kind} {self.name}".rstrip()
+
+
+class DeviceTable:
+    """Deduplicated devices by address, capped and aged out; merge() reports changes"""
+
+    def __init__(self, max_devices=256, max_age=60.0):
+        self.max_devices = max_devices
+        self.max_age = max_age
+        self.devices = {}       # address -> BtDevice, in first-seen order
+        self.version = 0
+        self.evicted = 0
+
+    def merge(self, address, properties, now=None):
+        """Apply Device1 properties (plain values); returns True if a row changed"""
+        now = time.time() if now is None else now
+        device = self.devices.get(address)
+        changed = device is None
+        if device is None:
+            if len(self.devices) >= self.max_devices:
+                self._evict()
+            device = self.devices[address] = BtDevice(address, now)
+        if "RSSI" in properties:
+            device.adverts += 1
+            device.last_seen = now
+            if properties["RSSI"] != device.rssi:
+                device.rssi = properties["RSSI"]
+                changed = True
+        name = properties.get("Name")
+        if name and name != device.name:
+            device.name = name
+            changed = True
+        if "Class" in properties and device.kind != "BR/EDR":
+            device.kind = "BR/EDR"
+            changed = True
+        if changed:
+            self.version += 1
+        return changed
+
+    def _evict(self):
+        oldest = min(self.devices.values(), key=lambda device: device.last_seen)
+        del self.devices[oldest.address]
+        self.evicted += 1
+
+    def expire(self, now=None):
+        """Drop devices not heard from in max_age seconds; returns how many"""
+        now = time.time() if now is None else now
+        stale = [address for address, device in self.devices.items()
+                 if now - device.last_seen > self.max_age]
+        for address in stale:
+            del self.devices[address]
+        if stale:
+            self.version += 1
+        return len(stale)
+
+    def sorted(self):
+        return list(self.devices.values())
+
+    def __contains__(self, address):
+        return address in self.devices
+
+    def __len__(self):
+        return len(self.devices)
+
+
+def plain(properties):
+    """{name: (signature, value)} from an a{sv} to {name: value}"""
+    return {name: value for name, (_, value) in properties.items()}
+
+
+def path_address(path):
+    """/org/bluez/hci0/dev_AA_BB_CC_DD_EE_FF -> AA:BB:CC:DD:EE:FF"""
+    leaf = path.rsplit("/", 1)[-1]
+    if not leaf.startswith("dev_"):
+        return None
+    return leaf[4:].replace("_", ":")
+
+
+class Discovery:
+    """A BlueZ discovery session merging device signals into a DeviceTable
+
+    conn is a jeepney blocking DBusConnection on the bus BlueZ is on.
+    """
+
+    def __init__(self, conn, table, adapter="hci0", transport="auto", queue_size=1024):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport {transport!r}, expected one of {', '.join(TRANSPORTS)}")
+        self.conn = conn
+        self.table = table
+        self.adapter_path = f"/org/bluez/{adapter}"
+        self.transport = transport
+        self.queue = deque(maxlen=queue_size)
+        self.signals = 0
+        self.owner = None
+        self._rules = []
+        self._filters = []
+        self._discovering = False
+
+    def _call(self, path, interface, method, signature=None, body=()):
+        message = new_method_call(DBusAddress(path, BLUEZ, interface), method, signature, body)
+        return unwrap_msg(self.conn.send_and_get_reply(message, timeout=CALL_TIMEOUT))
+
+    def _bus(self, message):
+        return unwrap_msg(self.conn.send_and_get_reply(message, timeout=CALL_TIMEOUT))
+
+    def start(self):
+        """Subscribe, load the devices BlueZ already hears, then start discovery"""
+        try:
+            self.owner = self._bus(message_bus.GetNameOwner(BLUEZ))[0]
+        except DBusErrorResponse:
+            raise OSError("BlueZ is not running (no org.bluez on the bus)") from None
+
+        # Only signals from BlueZ itself; the bus fills in the unique name as sender
+        added = MatchRule(type="signal", sender=self.owner, interface=OBJECT_MANAGER,
+                          member="InterfacesAdded", path="/")
+        added.add_arg_condition(0, self.adapter_path + "/", kind="path")
+        changed = MatchRule(type="signal", sender=self.owner, interface=PROPERTIES,
+                            member="PropertiesChanged", path_namespace=self.adapter_path)
+        changed.add_arg_condition(0, DEVICE_INTERFACE)
+        for rule in (added, changed):
+            self._bus(message_bus.AddMatch(rule))
+            self._rules.append(rule)
+            self._filters.append(self.conn.filter(rule, queue=self.queue))
+
+        objects = self._call("/", OBJECT_MANAGER, "GetManagedObjects")[0]
+        now = time.time()
+        for path, interfaces in objects.items():
+            properties = interfaces.get(DEVICE_INTERFACE)
+            # Cached and paired devices are listed too; an RSSI means in range now
+            if properties is not None and path.startswith(self.adapter_path + "/") and "RSSI" in properties:
+                self._merge(path, plain(properties), now)
+
+        self._call(self.adapter_path, ADAPTER_INTERFACE, "SetDiscoveryFilter", "a{sv}",
+                   ({"Transport": ("s", self.transport), "DuplicateData": ("b", True)},))
+        try:
+            self._call(self.adapter_path, ADAPTER_INTERFACE, "StartDiscovery")
+        except DBusErrorResponse as e:
+            if e.name != "org.bluez.Error.InProgress":
+                raise OSError(f"StartDiscovery failed: {e.name}: {e.data}") from None
+        self._discovering = True
+
+    def _merge(self, path, properties, now):
+        address = properties.get("Address") or path_address(path)
+        if address is None:
+            return False
+        if address not in self.table and "RSSI" not in properties:
+            return False    # a name or connection change, not an advertisement
+        return self.table.merge(address, properties, now)
+
+    def apply(self, message):
+        """Merge one queued signal; returns True if the table changed"""
+        self.signals += 1
+        member = message.header.fields.get(HeaderFields.member)
+        now = time.time()
+        if member == "InterfacesAdded":
+            path, interfaces = message.body
+            properties = interfaces.get(DEVICE_INTERFACE)
+            return properties is not None and self._merge(path, plain(properties), now)
+        if member == "PropertiesChanged":
+            _, changed, _ = message.body
+            return self._merge(message.header.fields.get(HeaderFields.path), plain(changed), now)
+        return False
+
+    def poll(self, timeout):
+        """Apply signals for up to timeout seconds; returns how many changed the table"""
+        deadline = time.monotonic() + timeout
+        changes = self._drain()
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                message = self.conn.recv_until_filtered(self.queue, timeout=remaining)
+            except TimeoutError:
+                break
+            changes += self.apply(message)
+            changes += self._drain()
+        return changes
+
+    def _drain(self):
+        changes = 0
+        while self.queue:
+            if self.apply(self.queue.popleft()):
+                changes += 1
+        return changes
+
+    def stop(self):
+        """Stop discovery and drop the subscriptions"""
+        for handle in self._filters:
+            handle.close()
+        self._filters = []
+        try:
+            if self._discovering:
+                self._discovering = False
+                try:
+                    self._call(self.adapter_path, ADAPTER_INTERFACE, "StopDiscovery")
+                except DBusErrorResponse:
+                    pass    # another client may have stopped it
+            for rule in self._rules:
+                self._bus(message_bus.RemoveMatch(rule))
+        finally:
+            self._rules = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
@@ -0,0 +1,46 @@
+"""
+Boot phase timing
+
+Splits start-up into named phases, logs how long each one took and reports
+progress so the splash bar follows real initialization.
+"""
+
+import time
+from contextlib import contextmanager
+
+
+class BootTimer:
+    """Times boot phases and reports progress after each one"""
+
+    def __init__(self, phases, start=None, on_progress=None):
+        self.expected = list(phases)
+        self.start = time.monotonic() if start is None else start
+        self.on_progress = on_progress
+        self.durations = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self.durations[name] = elapsed
+            print(f"[boot] {name}: {elapsed * 1000:.0f} ms")
+        if self.on_progress is not None:
+            self.on_progress(self.progress)
+
+    @property
+    def progress(self):
+        """Fraction of the expected phases completed (0-1)"""
+        done = sum(1 for name in self.expected if name in self.durations)
+        return done / len(self.expected) if self.expected else 1.0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def report(self):
+        """Log the total time since start and return the phase durations"""
+        print(f"[boot] ready in {self.elapsed * 1000:.0f} ms")
+        return dict(self.durations, total=self.elapsed)
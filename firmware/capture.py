@@ -0,0 +1,410 @@
+"""
+Packet capture on a TPACKET_V3 ring
+
+An AF_PACKET socket shares a ring of blocks with the kernel through mmap.
+The kernel fills a block with packets and hands it over; records are
+written to pcap/pcapng straight from the ring with one writev() per block,
+then the block is given back. Files rotate by size or age, an optional
+classic BPF program (from `tcpdump -ddd`) filters in the kernel, and
+packet/byte/drop counters are published about once a second.
+
+Needs CAP_NET_RAW; works on any interface including lo.
+"""
+
+import ctypes
+import mmap
+import os
+import select
+import socket
+import struct
+import time
+
+# <linux/if_packet.h>
+SOL_PACKET = 263
+PACKET_ADD_MEMBERSHIP = 1
+PACKET_MR_PROMISC = 1
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+PACKET_OUTGOING = 4
+ETH_P_ALL = 0x0003
+SO_ATTACH_FILTER = 26
+
+# Offsets into struct tpacket_block_desc and struct tpacket3_hdr
+BLOCK_STATUS_OFFSET = 8
+TPACKET3_HDRLEN = 48            # TPACKET_ALIGN(sizeof(struct tpacket3_hdr))
+SLL_PKTTYPE_OFFSET = 10         # sll_pkttype in the sockaddr_ll after the header
+
+LINKTYPE_ETHERNET = 1
+SNAPLEN = 262144
+IOV_MAX = 1024
+
+CAPTURE_DIR = "/opt/blackhat/captures"
+
+
+def bpf_command(expression, interface=None):
+    """Return the argv compiling a tcpdump filter expression for parse_bpf()"""
+    argv = ["tcpdump", "-ddd"]
+    if interface:
+        argv += ["-i", interface]
+    return argv + [expression]
+
+
+def parse_bpf(lines):
+    """Parse `tcpdump -ddd` output into [(code, jt, jf, k), ...]"""
+    lines = [line.split() for line in lines if line.strip()]
+    if not lines:
+        raise ValueError("empty BPF program")
+    count = int(lines[0][0])
+    program = [tuple(int(field) for field in line) for line in lines[1:count + 1]]
+    if len(program) != count or any(len(insn) != 4 for insn in program):
+        raise ValueError("malformed BPF program")
+    return program
+
+
+class PcapWriter:
+    """Writes libpcap records (nanosecond timestamps) with writev()"""
+
+    extension = ".pcap"
+
+    def __init__(self, path, linktype=LINKTYPE_ETHERNET, snaplen=SNAPLEN):
+        self.path = path
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        self.bytes = 0
+        self.packets = 0
+        self.opened = time.monotonic()
+        self._writev([self.file_header(linktype, snaplen)])
+
+    def file_header(self, linktype, snaplen):
+        return struct.pack("=IHHiIII", 0xA1B23C4D, 2, 4, 0, 0, snaplen, linktype)
+
+    def record(self, sec, nsec, data, length):
+        """Return the buffers for one record, data included without copying"""
+        return [struct.pack("=IIII", sec, nsec, len(data), length), data]
+
+    def write(self, records):
+        """Write [(sec, nsec, data, original_length), ...]"""
+        iov = []
+        for sec, nsec, data, length in records:
+            iov += self.record(sec, nsec, data, length)
+        self._writev(iov)
+        self.packets += len(records)
+
+    def _writev(self, iov):
+        for start in range(0, len(iov), IOV_MAX):
+            chunk = iov[start:start + IOV_MAX]
+            want = sum(len(buf) for buf in chunk)
+            done = os.writev(self.fd, chunk)
+            if done < want:
+                # Short write (disk full or signal): finish it piece by piece
+                os.write(self.fd, b"".join(bytes(buf) for buf in chunk)[done:])
+            self.bytes += want
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class PcapngWriter(PcapWriter):
+    """Writes pcapng: one section, one interface, enhanced packet blocks"""
+
+    extension = ".pcapng"
+
+    def file_header(self, linktype, snaplen):
+        shb = struct.pack("=IIIHHqI", 0x0A0D0D0A, 28, 0x1A2B3C4D, 1, 0, -1, 28)
+        # if_tsresol = 9 (nanoseconds), then opt_endofopt
+        options = struct.pack("=HHB3x", 9, 1, 9) + struct.pack("=HH", 0, 0)
+        length = 20 + len(options)
+        idb = (struct.pack("=IIHHI", 1, length, linktype, 0, snaplen)
+               + options + struct.pack("=I", length))
+        return shb + idb
+
+    def record(self, sec, nsec, data, length):
+        caplen = len(data)
+        padding = -caplen % 4
+        total = 32 + caplen + padding
+        ts = sec * 1000000000 + nsec
+        head = struct.pack("=IIIIIII", 6, total, 0, ts >> 32, ts & 0xFFFFFFFF, caplen, length)
+        return [head, data, b"\0" * padding + struct.pack("=I", total)]
+
+
+WRITERS = {"pcap": PcapWriter, "pcapng": PcapngWriter}
+
+
+class CaptureFiles:
+    """Rotating capture files: a new file once one passes rotate_bytes or rotate_seconds"""
+
+    def __init__(self, directory=CAPTURE_DIR, prefix="capture", fmt="pcap",
+                 rotate_bytes=16 * 1024 * 1024, rotate_seconds=300,
+                 linktype=LINKTYPE_ETHERNET):
+        if fmt not in WRITERS:
+            raise ValueError(f"Unknown capture format {fmt!r}")
+        self.directory = directory
+        self.prefix = prefix
+        self.writer_class = WRITERS[fmt]
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.linktype = linktype
+        self.paths = []
+        self.bytes = 0
+        self._writer = None
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        name = f"{self.prefix}-{stamp}-{len(self.paths) + 1:03d}{self.writer_class.extension}"
+        path = os.path.join(self.directory, name)
+        self._writer = self.writer_class(path, self.linktype)
+        self.paths.append(path)
+        self.bytes += self._writer.bytes
+
+    def _due(self):
+        writer = self._writer
+        if self.rotate_bytes and writer.bytes >= self.rotate_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.monotonic() - writer.opened >= self.rotate_seconds
+
+    def write(self, records):
+        """Write a batch of records; files only rotate between batches"""
+        if self._writer is None:
+            self._open()
+        elif self._due():
+            self._writer.close()
+            self._open()
+        before = self._writer.bytes
+        self._writer.write(records)
+        self.bytes += self._writer.bytes - before
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class CaptureStats:
+    """Running totals plus rates over the last reporting interval"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.packets = 0
+        self.bytes = 0
+        self.drops = 0          # dropped by the kernel: ring full
+        self.freezes = 0        # times the kernel found no free block
+        self.blocks = 0
+        self.packets_per_s = 0.0
+        self.bytes_per_s = 0.0
+        self._mark = (self.started, 0, 0)
+
+    def tick(self, now=None):
+        """Recompute the rates since the previous tick"""
+        now = time.monotonic() if now is None else now
+        last, packets, size = self._mark
+        elapsed = now - last
+        if elapsed > 0:
+            self.packets_per_s = (self.packets - packets) / elapsed
+            self.bytes_per_s = (self.bytes - size) / elapsed
+        self._mark = (now, self.packets, self.bytes)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def line(self):
+        """Short status for the LCD"""
+        return (f"{self.packets_per_s:.0f} pkt/s {self.bytes_per_s / 1024:.0f} kB/s "
+                f"drop {self.drops}")
+
+    def as_dict(self):
+        return {
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "drops": self.drops,
+            "freezes": self.freezes,
+            "blocks": self.blocks,
+            "seconds": self.elapsed,
+            "packets_per_s": self.packets_per_s,
+            "bytes_per_s": self.bytes_per_s,
+        }
+
+
+class PacketRing:
+    """AF_PACKET socket with a TPACKET_V3 receive ring"""
+
+    def __init__(self, interface, block_size=1 << 18, block_count=16, frame_size=2048,
+                 block_timeout_ms=100, bpf=None, promiscuous=False):
+        self.interface = interface
+        self.block_size = block_size
+        self.block_count = block_count
+        self.frame_size = frame_size
+        self.block_timeout_ms = block_timeout_ms
+        self.bpf = bpf
+        self.promiscuous = promiscuous
+        # On lo every packet is seen leaving and arriving; keep one copy
+        self.skip_outgoing = interface == "lo"
+        self.sock = None
+        self._ring = None
+        self._view = None
+        self._next_block = 0
+
+    def open(self):
+        # Protocol 0 receives nothing until bind(), so no unfiltered packets
+        # land in the ring while it is being set up
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+        try:
+            sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            if self.bpf:
+                self._attach_filter(sock, self.bpf)
+            frame_nr = self.block_size // self.frame_size * self.block_count
+            req = struct.pack("=7I", self.block_size, self.block_count, self.frame_size,
+                              frame_nr, self.block_timeout_ms, 0, 0)
+            sock.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+            size = self.block_size * self.block_count
+            self._ring = mmap.mmap(sock.fileno(), size, mmap.MAP_SHARED,
+                                   mmap.PROT_READ | mmap.PROT_WRITE)
+            self._view = memoryview(self._ring)
+            sock.bind((self.interface, ETH_P_ALL))
+            if self.promiscuous:
+                ifindex = socket.if_nametoindex(self.interface)
+                mreq = struct.pack("=iHH8s", ifindex, PACKET_MR_PROMISC, 0, b"")
+                sock.setsockopt(SOL_PACKET, PACKET_ADD_MEMBERSHIP, mreq)
+        except BaseException:
+            self._view = None
+            if self._ring is not None:
+                self._ring.close()
+                self._ring = None
+            sock.close()
+            raise
+        self.sock = sock
+        self._next_block = 0
+        return self
+
+    @staticmethod
+    def _attach_filter(sock, program):
+        insns = b"".join(struct.pack("=HBBI", *insn) for insn in program)
+        buf = ctypes.create_string_buffer(insns)
+        fprog = struct.pack("HP", len(program), ctypes.addressof(buf))
+        sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+    def kernel_stats(self):
+        """Return (packets, drops, freezes) since the last call; reading resets them"""
+        return struct.unpack("=III", self.sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 12))
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds for the next block; True if it is ready"""
+        if self._block_ready(self._next_block):
+            return True
+        poller = select.poll()
+        poller.register(self.sock.fileno(), select.POLLIN | select.POLLERR)
+        poller.poll(int(timeout * 1000))
+        return self._block_ready(self._next_block)
+
+    def _block_ready(self, index):
+        offset = index * self.block_size + BLOCK_STATUS_OFFSET
+        return struct.unpack_from("=I", self._ring, offset)[0] & TP_STATUS_USER
+
+    def read_block(self):
+        """Return the records of the next ready block, or None
+
+        Records are (sec, nsec, data, original_length) with data a
+        memoryview into the ring; call release_block() once written.
+        """
+        index = self._next_block
+        if not self._block_ready(index):
+            return None
+        ring, view = self._ring, self._view
+        base = index * self.block_size
+        count, first = struct.unpack_from("=II", ring, base + 12)
+        records = []
+        pos = base + first
+        for _ in range(count):
+            next_offset, sec, nsec, snaplen, length, _, mac = struct.unpack_from("=6IH", ring, pos)
+            if not (self.skip_outgoing
+                    and ring[pos + TPACKET3_HDRLEN + SLL_PKTTYPE_OFFSET] == PACKET_OUTGOING):
+                records.append((sec, nsec, view[pos + mac:pos + mac + snaplen], length))
+            pos += next_offset
+        return records
+
+    def release_block(self):
+        """Hand the current block back to the kernel and move to the next one"""
+        offset = self._next_block * self.block_size + BLOCK_STATUS_OFFSET
+        struct.pack_into("=I", self._ring, offset, TP_STATUS_KERNEL)
+        self._next_block = (self._next_block + 1) % self.block_count
+
+    def close(self):
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _copy_block(ring, files, stats):
+    records = ring.read_block()
+    if records:
+        files.write(records)
+        stats.packets += len(records)
+        stats.bytes += sum(len(data) for _, _, data, _ in records)
+    del records
+    ring.release_block()
+    stats.blocks += 1
+
+
+def capture(ring, files, duration=None, max_packets=None, should_stop=None,
+            on_stats=None, stats_interval=1.0):
+    """Copy packets from an open PacketRing into CaptureFiles until done
+
+    Stops after duration seconds, max_packets packets or once should_stop()
+    returns true. on_stats(stats) is called every stats_interval seconds.
+    Returns the final CaptureStats.
+    """
+    stats = CaptureStats()
+    deadline = None if duration is None else stats.started + duration
+    next_report = stats.started + stats_interval
+    ring.kernel_stats()     # reset the kernel counters
+
+    while True:
+        now = time.monotonic()
+        if deadline is not None and now >= deadline:
+            break
+        if max_packets is not None and stats.packets >= max_packets:
+            break
+        if should_stop is not None and should_stop():
+            break
+
+        if ring.wait(min(0.1, max(0.0, next_report - now))):
+            _copy_block(ring, files, stats)
+
+        now = time.monotonic()
+        if now >= next_report:
+            _, drops, freezes = ring.kernel_stats()
+            stats.drops += drops
+            stats.freezes += freezes
+            stats.tick(now)
+            next_report = now + stats_interval
+            if on_stats is not None:
+                on_stats(stats)
+
+    # Let the kernel retire the block it is filling, then write everything out
+    timeout = ring.block_timeout_ms / 1000
+    while ring.wait(timeout):
+        _copy_block(ring, files, stats)
+        timeout = 0
+    _, drops, freezes = ring.kernel_stats()
+    stats.drops += drops
+    stats.freezes += freezes
+    stats.tick()
+    return stats
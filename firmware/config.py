@@ -0,0 +1,155 @@
+"""
+Configuration loading
+
+Reads /opt/blackhat/configs/blackhat.conf (written by install.sh) on top of
+built-in defaults, so a missing file or key never stops the firmware.
+Set BLACKHAT_CONFIG to use a different file.
+"""
+
+import configparser
+import os
+
+CONFIG_PATH = "/opt/blackhat/configs/blackhat.conf"
+
+DEFAULTS = {
+    "system": {
+        "backend": "auto",      # auto, hardware or fake (see firmware.hw)
+    },
+    "display": {
+        "width": "240",
+        "height": "240",
+        "rotation": "0",
+        "backlight": "13",
+    },
+    "gpio": {
+        "chip": "/dev/gpiochip0",
+        "lines": "2-27",                # lines shown by Pin State
+        "reserved": "2,3,7-11,13-15,18,22",     # I2C, LCD, UART, PWM0: never read
+    },
+    "network": {
+        "default_interface": "wlan0",
+        "monitor_interface": "wlan0mon",
+        "scan_dump": "false",
+    },
+    "portscan": {
+        "targets": "127.0.0.1",
+        "ports": "21-23,25,53,80,110,139,143,443,445,3306,3389,5900,8000-8100",
+        "allowlist": "",        # lab hosts/CIDRs besides localhost
+        "concurrency": "64",
+        "rate": "500",          # connects per second, 0 = unlimited
+        "timeout": "1.0",
+    },
+    "netscan": {
+        "interface": "",        # empty: [network] default_interface
+        "subnet": "",           # empty: the interface's own network
+        "ports": "80,443,22,445",
+        "concurrency": "128",
+        "timeout": "0.5",
+    },
+    "dns": {
+        "names": "google.com",
+        "types": "A,AAAA",
+        "batch_file": "/opt/blackhat/configs/dns_batch.txt",   # one name or IP per line
+        "nameservers": "",      # empty: /etc/resolv.conf
+        "timeout": "1.5",
+    },
+    "capture": {
+        "interface": "",        # empty: [network] default_interface
+        "directory": "/opt/blackhat/captures",
+        "format": "pcap",       # pcap or pcapng
+        "filter": "",           # tcpdump filter expression
+        "duration": "60",       # seconds, 0 = until BACK
+        "rotate_mb": "16",
+        "rotate_seconds": "300",
+        "ring_blocks": "16",    # 256 KiB each
+        "promiscuous": "false",
+    },
+    "i2c": {
+        "buses": "",            # empty: every /dev/i2c-N
+        "identify": "true",     # read chip-ID registers of known parts
+        "device_table": "/opt/blackhat/configs/i2c_devices.txt",   # "0x3c Name" per line
+        "cache_seconds": "300",
+    },
+    "spi": {
+        "bus": "0",
+        "device": "0",          # CE0; the LCD is on CE1
+        "speeds": "4000000,8000000,16000000,32000000,48000000,62500000",
+        "sizes": "64,512,4096",
+        "duration": "0.25",     # seconds per point
+        "directory": "/opt/blackhat/captures",
+    },
+    "pwm": {
+        "pin": "18",            # 12/13/18/19 use hardware PWM when the overlay is on
+        "chip": "0",            # /sys/class/pwm/pwmchipN
+        "preset": "breathe",    # ramp, breathe, sweep, servo or scale
+        "frequency": "1000",    # Hz, for ramp and breathe
+        "duration": "10",       # seconds, 0 = play the preset once
+    },
+    "logic": {
+        "lines": "4,17,27",
+        "samples": "262144",    # ring buffer; the newest samples go to the VCD
+        "window": "4096",       # samples across the timing diagram
+        "duration": "30",       # seconds, 0 = until BACK
+        "directory": "/opt/blackhat/captures",
+    },
+    "bluetooth": {
+        "adapter": "hci0",
+        "transport": "auto",    # Device Scanner: auto, bredr or le (BLE Scanner is always le)
+        "duration": "15",       # seconds, 0 = until BACK
+        "max_devices": "256",
+        "max_age": "60",        # seconds without an advertisement before a device is dropped
+    },
+    "sysmon": {
+        "enabled": "true",
+        "interval": "1.0",      # seconds between samples
+        "history": "120",       # samples kept per series
+    },
+    "storage": {
+        "enabled": "true",
+        "path": "/opt/blackhat/logs/results.db",
+        "flush_interval": "5",      # seconds between batched writes
+        "flush_rows": "500",        # ...or as soon as this many rows are waiting
+        "retention_days": "30",
+        "max_rows": "200000",
+    },
+    "power": {
+        "enabled": "true",
+        "dim_after": "60",          # seconds without a press, 0 = never
+        "blank_after": "300",       # backlight off, drawing and sampler paused; 0 = never
+        "brightness": "100",        # percent
+        "dim_level": "10",          # percent; needs hardware PWM on the backlight pin
+        "pwm_chip": "0",            # /sys/class/pwm/pwmchipN for [display] backlight
+        "pwm_frequency": "1000",
+        "pause_samplers": "true",   # stop the /proc sampler while blank
+    },
+    "metrics": {
+        "enabled": "false",
+        "listen": "127.0.0.1:9105",     # or unix:/run/blackhat/metrics.sock; empty = no endpoint
+        "overlay": "false",             # FPS/latency line on the LCD (LEFT+RIGHT toggles it)
+        "profile_seconds": "10",        # UP+DOWN starts a sampling profile this long
+        "profile_interval": "0.01",     # seconds between stack samples
+        "directory": "/opt/blackhat/logs",
+    },
+    "security": {
+        "log_captures": "true",     # record capture files in the result store
+    },
+    "survey": {
+        "enabled": "false",
+        "interval": "60",
+        "ttl": "300",
+        "bluetooth": "true",
+        "bluetooth_seconds": "10",  # BlueZ discovery window per refresh
+    },
+}
+
+
+def load_config(path=None):
+    """Return a ConfigParser with defaults overlaid by the config file"""
+    config = configparser.ConfigParser(inline_comment_prefixes=("#", ";"))
+    config.read_dict(DEFAULTS)
+    path = path or os.environ.get("BLACKHAT_CONFIG", CONFIG_PATH)
+    try:
+        config.read(path)
+    except configparser.Error as e:
+        print(f"Ignoring invalid config {path}: {e}")
+    return config
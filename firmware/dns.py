@@ -0,0 +1,336 @@
+"""
+Non-blocking DNS resolver
+
+Queries go out over one UDP socket on an asyncio loop, many at a time,
+matched to replies by ID and nameserver address. Answers are cached until
+their TTL runs out; NXDOMAIN and empty answers are cached too, for the
+SOA minimum (RFC 2308). Only A, AAAA and PTR are looked up.
+"""
+
+import asyncio
+import ipaddress
+import random
+import socket
+import struct
+import time
+
+A = 1
+CNAME = 5
+SOA = 6
+PTR = 12
+AAAA = 28
+TYPES = {"A": A, "AAAA": AAAA, "PTR": PTR}
+TYPE_NAMES = {value: name for name, value in TYPES.items()}
+
+NOERROR = 0
+SERVFAIL = 2
+NXDOMAIN = 3
+TIMEOUT = -1            # no reply from any nameserver
+RCODE_NAMES = {NOERROR: "NOERROR", SERVFAIL: "SERVFAIL", NXDOMAIN: "NXDOMAIN", TIMEOUT: "TIMEOUT"}
+
+DEFAULT_NEGATIVE_TTL = 60
+
+
+def system_nameservers(path="/etc/resolv.conf"):
+    """Return the nameserver addresses listed in resolv.conf"""
+    servers = []
+    try:
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == "nameserver":
+                    servers.append(fields[1])
+    except OSError:
+        pass
+    return servers or ["127.0.0.1"]
+
+
+def parse_query(text, types=("A",)):
+    """Turn one batch line into [(name, qtype)]: IP addresses become PTR lookups"""
+    text = text.split("#", 1)[0].strip()
+    if not text:
+        return []
+    try:
+        return [(ipaddress.ip_address(text).reverse_pointer, PTR)]
+    except ValueError:
+        return [(text.rstrip(".").lower(), TYPES[t.strip().upper()]) for t in types]
+
+
+def load_batch(path, types=("A",)):
+    """Read one name or address per line from path ('#' starts a comment)"""
+    queries = []
+    with open(path) as f:
+        for line in f:
+            queries += parse_query(line, types)
+    return queries
+
+
+def build_query(qid, name, qtype):
+    """Return a recursive query packet"""
+    labels = b"".join(bytes([len(label)]) + label
+                      for label in (part.encode("idna") for part in name.split(".") if part))
+    return struct.pack("!HHHHHH", qid, 0x0100, 1, 0, 0, 0) + labels + b"\0" + struct.pack("!HH", qtype, 1)
+
+
+def _read_name(data, offset):
+    labels = []
+    end = None
+    for _ in range(128):
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            continue
+        offset += 1
+        if not length:
+            return ".".join(labels), offset if end is None else end
+        labels.append(data[offset:offset + length].decode("ascii", "replace"))
+        offset += length
+    raise ValueError("DNS name compression loop")
+
+
+def parse_response(data):
+    """Return (qid, rcode, question, answers, negative_ttl) from a reply
+
+    answers are (type, ttl, value) with addresses and names as strings;
+    negative_ttl comes from an SOA in the authority section, else None.
+    """
+    qid, flags, qdcount, ancount, nscount, _ = struct.unpack_from("!HHHHHH", data)
+    offset = 12
+    question = None
+    for _ in range(qdcount):
+        name, offset = _read_name(data, offset)
+        qtype, _ = struct.unpack_from("!HH", data, offset)
+        offset += 4
+        question = (name.lower(), qtype)
+
+    answers = []
+    negative_ttl = None
+    for index in range(ancount + nscount):
+        _, offset = _read_name(data, offset)
+        rtype, _, ttl, length = struct.unpack_from("!HHIH", data, offset)
+        offset += 10
+        rdata = data[offset:offset + length]
+        if index < ancount:
+            if rtype == A:
+                answers.append((rtype, ttl, socket.inet_ntop(socket.AF_INET, rdata)))
+            elif rtype == AAAA:
+                answers.append((rtype, ttl, socket.inet_ntop(socket.AF_INET6, rdata)))
+            elif rtype in (CNAME, PTR):
+                answers.append((rtype, ttl, _read_name(data, offset)[0]))
+        elif rtype == SOA:
+            _, pos = _read_name(data, offset)
+            _, pos = _read_name(data, pos)
+            minimum = struct.unpack_from("!I", data, pos + 16)[0]
+            negative_ttl = min(ttl, minimum)
+        offset += length
+    return qid, flags & 0xF, question, answers, negative_ttl
+
+
+class Answer:
+    """Result of one lookup"""
+
+    __slots__ = ("name", "qtype", "rcode", "values", "ttl", "cached", "elapsed")
+
+    def __init__(self, name, qtype, rcode, values=(), ttl=0, cached=False, elapsed=0.0):
+        self.name = name
+        self.qtype = qtype
+        self.rcode = rcode
+        self.values = list(values)
+        self.ttl = ttl
+        self.cached = cached
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.rcode == NOERROR and bool(self.values)
+
+    def label(self):
+        kind = TYPE_NAMES.get(self.qtype, str(self.qtype))
+        if self.ok:
+            result = ", ".join(self.values)
+        elif self.rcode == NOERROR:
+            result = "no records"
+        else:
+            result = RCODE_NAMES.get(self.rcode, f"rcode {self.rcode}")
+        source = "cache" if self.cached else f"{self.elapsed * 1000:.0f}ms"
+        return f"{self.name} {kind}: {result} ({source})"
+
+
+class DnsCache:
+    """(name, qtype) -> answer until its TTL expires, including negative answers"""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, qtype, now=None):
+        now = time.monotonic() if now is None else now
+        entry = self._entries.get((name, qtype))
+        if entry is None or entry[0] <= now:
+            self.misses += 1
+            return None
+        self.hits += 1
+        expires, rcode, values = entry
+        return Answer(name, qtype, rcode, values, int(expires - now), cached=True)
+
+    def put(self, answer, now=None):
+        if answer.ttl <= 0 or answer.rcode not in (NOERROR, NXDOMAIN):
+            return
+        now = time.monotonic() if now is None else now
+        if len(self._entries) >= self.max_entries:
+            self.expire(now)
+            if len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+        self._entries[(answer.name, answer.qtype)] = (now + answer.ttl, answer.rcode,
+                                                      tuple(answer.values))
+
+    def expire(self, now=None):
+        now = time.monotonic() if now is None else now
+        for key in [key for key, entry in self._entries.items() if entry[0] <= now]:
+            del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _DnsProtocol(asyncio.DatagramProtocol):
+    def __init__(self, pending):
+        self.pending = pending
+
+    def datagram_received(self, data, addr):
+        if len(data) < 12:
+            return
+        waiter = self.pending.get(int.from_bytes(data[:2], "big"))
+        # Only the nameserver the query went to may answer it
+        if waiter is not None and waiter[1] == addr[:2] and not waiter[0].done():
+            waiter[0].set_result(data)
+
+    def error_received(self, exc):
+        pass
+
+
+def _expire(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Resolver:
+    """Concurrent stub resolver; use as `async with Resolver(...) as r:`"""
+
+    def __init__(self, nameservers=None, port=53, timeout=1.5, attempts=2,
+                 cache=None, max_inflight=64):
+        self.nameservers = [(str(ipaddress.ip_address(ns)), port)
+                            for ns in (nameservers or system_nameservers())]
+        self.timeout = timeout
+        self.attempts = attempts
+        self.cache = DnsCache() if cache is None else cache
+        self.max_inflight = max_inflight
+        self.sent = 0
+        self._pending = {}
+        self._transports = {}
+        self._limit = None
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        self._limit = asyncio.Semaphore(self.max_inflight)
+        for family in {socket.AF_INET6 if ":" in host else socket.AF_INET
+                       for host, _ in self.nameservers}:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DnsProtocol(self._pending), family=family)
+            self._transports[family] = transport
+        return self
+
+    async def __aexit__(self, *exc):
+        for transport in self._transports.values():
+            transport.close()
+        self._transports.clear()
+
+    def _new_id(self):
+        while True:
+            qid = random.getrandbits(16)
+            if qid not in self._pending:
+                return qid
+
+    async def _exchange(self, name, qtype, server):
+        loop = asyncio.get_running_loop()
+        qid = self._new_id()
+        reply = loop.create_future()
+        self._pending[qid] = (reply, server)
+        timer = loop.call_later(self.timeout, _expire, reply)
+        try:
+            family = socket.AF_INET6 if ":" in server[0] else socket.AF_INET
+            self._transports[family].sendto(build_query(qid, name, qtype), server)
+            self.sent += 1
+            while True:
+                data = await reply
+                if data is None:
+                    return None
+                try:
+                    parsed = parse_response(data)
+                except (ValueError, IndexError, struct.error):
+                    parsed = None
+                if parsed is not None and parsed[2] == (name, qtype):
+                    return parsed
+                # Garbage, or a reply to another question under our ID: keep waiting
+                reply = loop.create_future()
+                self._pending[qid] = (reply, server)
+                timer.cancel()
+                timer = loop.call_later(self.timeout, _expire, reply)
+        finally:
+            timer.cancel()
+            self._pending.pop(qid, None)
+
+    async def _query(self, name, qtype):
+        """Try each nameserver in turn, attempts times over; the last reply or None"""
+        parsed = None
+        for _ in range(self.attempts):
+            for server in self.nameservers:
+                parsed = await self._exchange(name, qtype, server) or parsed
+                if parsed is not None and parsed[1] != SERVFAIL:
+                    return parsed
+        return parsed
+
+    async def resolve(self, name, qtype=A):
+        """Return an Answer for name, from the cache when it is still fresh"""
+        name = name.rstrip(".").lower()
+        answer = self.cache.get(name, qtype)
+        if answer is not None:
+            return answer
+
+        started = time.monotonic()
+        async with self._limit:
+            parsed = await self._query(name, qtype)
+        elapsed = time.monotonic() - started
+
+        if parsed is None:
+            return Answer(name, qtype, TIMEOUT, elapsed=elapsed)
+        _, rcode, _, records, negative_ttl = parsed
+        values = [value for rtype, _, value in records if rtype == qtype]
+        if values:
+            ttl = min(ttl for rtype, ttl, _ in records if rtype == qtype)
+        else:
+            ttl = DEFAULT_NEGATIVE_TTL if negative_ttl is None else negative_ttl
+        answer = Answer(name, qtype, rcode, values, ttl, elapsed=elapsed)
+        self.cache.put(answer)
+        return answer
+
+    async def resolve_many(self, queries, on_answer=None, should_stop=None):
+        """Resolve [(name, qtype)] concurrently; on_answer(answer) as each completes"""
+        answers = []
+        tasks = [asyncio.ensure_future(self.resolve(name, qtype)) for name, qtype in queries]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                answer = await next_done
+                answers.append(answer)
+                if on_answer is not None:
+                    on_answer(answer)
+                if should_stop is not None and should_stop():
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+        return answers
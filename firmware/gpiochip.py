@@ -0,0 +1,366 @@
+"""
+GPIO character device
+
+Talks the v2 line uAPI of /dev/gpiochipN directly with ioctls. Lines are
+requested "as-is" (no direction flag), so the request itself changes no
+pin's mode, pull or output level; one GET_VALUES ioctl returns every
+requested line at once. Lines the kernel has handed to a driver (SPI chip
+selects, the LCD's pins when owned by a driver) are reported, not touched.
+
+Releasing a request is not as gentle: on the Pi, the bcm2835 pinctrl
+driver puts a freed line back in input mode, which would stop an output
+set by RPi.GPIO or raspi-gpio, or I2C, UART and PWM on their alternate
+functions. Pin State therefore never requests lines: it reads the level
+and function registers through /dev/gpiomem. Where that is missing it
+only requests lines the kernel reports as free inputs; a pin on an
+alternate function (I2C, UART, PWM) looks like an input there, which is
+what [gpio] reserved is for.
+The logic analyzer samples a line request into a preallocated numpy
+buffer, letting the kernel write each sample straight into its row.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+# <linux/gpio.h>
+GPIO_MAX_LINES = 64
+LINE_FLAG_USED = 1 << 0
+LINE_FLAG_ACTIVE_LOW = 1 << 1
+LINE_FLAG_INPUT = 1 << 2
+LINE_FLAG_OUTPUT = 1 << 3
+LINE_FLAG_OPEN_DRAIN = 1 << 6
+LINE_FLAG_OPEN_SOURCE = 1 << 7
+LINE_FLAG_BIAS_PULL_UP = 1 << 8
+LINE_FLAG_BIAS_PULL_DOWN = 1 << 9
+LINE_FLAG_BIAS_DISABLED = 1 << 10
+
+_CHIPINFO = struct.Struct("=32s32sI")
+_LINEINFO = struct.Struct("=32s32sIIQ160x16x")
+_LINE_REQUEST = struct.Struct(f"={GPIO_MAX_LINES}I32sQI20x240xII20xi")
+_LINE_VALUES = struct.Struct("=QQ")
+
+
+# BCM2835/BCM2711 GPIO block as mapped by /dev/gpiomem
+GPIOMEM_LABELS = ("pinctrl-bcm2835", "pinctrl-bcm2711")
+GPIOMEM_LINES = 54
+_GPFSEL0 = 0x00
+_GPLEV0 = 0x34
+_FUNCTIONS = ("in", "out", "alt5", "alt4", "alt0", "alt1", "alt2", "alt3")
+
+_IOC_WRITE = 1
+_IOC_READ = 2
+
+
+def _ioc(direction, nr, size):
+    return (direction << 30) | (size << 16) | (0xB4 << 8) | nr
+
+
+GPIO_GET_CHIPINFO_IOCTL = _ioc(_IOC_READ, 0x01, _CHIPINFO.size)
+GPIO_V2_GET_LINEINFO_IOCTL = _ioc(_IOC_READ | _IOC_WRITE, 0x05, _LINEINFO.size)
+GPIO_V2_GET_LINE_IOCTL = _ioc(_IOC_READ | _IOC_WRITE, 0x07, _LINE_REQUEST.size)
+GPIO_V2_LINE_GET_VALUES_IOCTL = _ioc(_IOC_READ | _IOC_WRITE, 0x0E, _LINE_VALUES.size)
+
+
+def parse_lines(spec):
+    """Parse "2-27" or "17,22,27" into a sorted list of line offsets"""
+    lines = set()
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        low = int(first)
+        high = int(last) if sep else low
+        if not 0 <= low <= high:
+            raise ValueError(f"Bad line range {part!r}")
+        lines.update(range(low, high + 1))
+    return sorted(lines)
+
+
+def _text(raw):
+    return raw.split(b"\0", 1)[0].decode("ascii", "replace")
+
+
+class LineInfo:
+    """Name, consumer and configuration of one line"""
+
+    __slots__ = ("offset", "name", "consumer", "flags", "function")
+
+    def __init__(self, offset, name="", consumer="", flags=0, function=None):
+        self.offset = offset
+        self.name = name
+        self.consumer = consumer
+        self.flags = flags
+        self.function = function    # in/out/altN from the function select registers
+
+    @property
+    def used(self):
+        return bool(self.flags & LINE_FLAG_USED)
+
+    @property
+    def output(self):
+        return bool(self.flags & LINE_FLAG_OUTPUT)
+
+    def mode(self):
+        """Direction and bias in a few words, e.g. in pull-up"""
+        parts = [self.function or ("out" if self.output else "in")]
+        if self.flags & LINE_FLAG_BIAS_PULL_UP:
+            parts.append("pull-up")
+        elif self.flags & LINE_FLAG_BIAS_PULL_DOWN:
+            parts.append("pull-down")
+        if self.flags & LINE_FLAG_OPEN_DRAIN:
+            parts.append("open-drain")
+        elif self.flags & LINE_FLAG_OPEN_SOURCE:
+            parts.append("open-source")
+        if self.flags & LINE_FLAG_ACTIVE_LOW:
+            parts.append("active-low")
+        return " ".join(parts)
+
+
+class SampleBuffer:
+    """Preallocated ring of (line bits, timestamp) samples
+
+    raw holds one struct gpio_v2_line_values per row, so a row can be
+    passed to the GET_VALUES ioctl as is; column 0 is the bits, column 1
+    the request mask.
+    """
+
+    def __init__(self, capacity, lines):
+        self.capacity = capacity
+        self.lines = list(lines)
+        self.raw = np.zeros((capacity, 2), dtype=np.uint64)
+        self.times = np.zeros(capacity, dtype=np.int64)     # perf_counter_ns
+        self.head = 0
+        self.count = 0
+
+    def chunk(self, size):
+        """Return the next (start, end) rows to fill, never wrapping"""
+        return self.head, min(self.capacity, self.head + size)
+
+    def advance(self, filled):
+        self.head = (self.head + filled) % self.capacity
+        self.count = min(self.capacity, self.count + filled)
+
+    def ordered(self, limit=None):
+        """Return (bits, times) of up to limit of the newest samples, oldest first"""
+        count = self.count if limit is None else min(limit, self.count)
+        start = (self.head - count) % self.capacity
+        if start + count <= self.capacity:
+            return self.raw[start:start + count, 0], self.times[start:start + count]
+        return (np.concatenate((self.raw[start:, 0], self.raw[:self.head, 0])),
+                np.concatenate((self.times[start:], self.times[:self.head])))
+
+    def rate(self):
+        """Average samples per second over the buffered samples"""
+        _, times = self.ordered()
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) * 1e9 / (times[-1] - times[0])
+
+
+class LineRequest:
+    """A set of lines requested as-is; read with get_values() or sample()"""
+
+    def __init__(self, fd, offsets):
+        self.fd = fd
+        self.offsets = list(offsets)
+        self.mask = (1 << len(self.offsets)) - 1
+
+    def get_values(self):
+        """Return {offset: level} for every requested line, from one ioctl"""
+        data = bytearray(_LINE_VALUES.pack(0, self.mask))
+        fcntl.ioctl(self.fd, GPIO_V2_LINE_GET_VALUES_IOCTL, data, True)
+        bits = _LINE_VALUES.unpack(data)[0]
+        return {offset: (bits >> i) & 1 for i, offset in enumerate(self.offsets)}
+
+    def sample(self, buffer, count, should_stop=None, check_every=4096):
+        """Fill up to count rows of buffer at full speed; returns the rows filled"""
+        start, end = buffer.chunk(count)
+        raw = buffer.raw
+        raw[start:end, 1] = self.mask
+        times = buffer.times
+        fd = self.fd
+        ioctl = fcntl.ioctl
+        request = GPIO_V2_LINE_GET_VALUES_IOCTL
+        clock = time.perf_counter_ns
+        index = start
+        while index < end:
+            stop = min(end, index + check_every)
+            for row in range(index, stop):
+                # The kernel writes the bits straight into the buffer row
+                ioctl(fd, request, raw[row], True)
+                times[row] = clock()
+            index = stop
+            if should_stop is not None and should_stop():
+                break
+        buffer.advance(index - start)
+        return index - start
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GpioChip:
+    """An open /dev/gpiochipN"""
+
+    def __init__(self, path="/dev/gpiochip0"):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+
+    def info(self):
+        """Return (name, label, number of lines)"""
+        data = bytearray(_CHIPINFO.size)
+        fcntl.ioctl(self.fd, GPIO_GET_CHIPINFO_IOCTL, data, True)
+        name, label, lines = _CHIPINFO.unpack(data)
+        return _text(name), _text(label), lines
+
+    def line_info(self, offset):
+        """Return the LineInfo of one line without requesting it"""
+        data = bytearray(_LINEINFO.pack(b"", b"", offset, 0, 0))
+        fcntl.ioctl(self.fd, GPIO_V2_GET_LINEINFO_IOCTL, data, True)
+        name, consumer, offset, _, flags = _LINEINFO.unpack(data)
+        return LineInfo(offset, _text(name), _text(consumer), flags)
+
+    def request(self, offsets, consumer="blackhat"):
+        """Request offsets as-is (direction and bias untouched) in one LineRequest"""
+        offsets = list(offsets)
+        if not 0 < len(offsets) <= GPIO_MAX_LINES:
+            raise ValueError(f"Between 1 and {GPIO_MAX_LINES} lines per request")
+        data = bytearray(_LINE_REQUEST.pack(*(offsets + [0] * (GPIO_MAX_LINES - len(offsets))),
+                                            consumer.encode()[:31], 0, 0, len(offsets), 0, 0))
+        fcntl.ioctl(self.fd, GPIO_V2_GET_LINE_IOCTL, data, True)
+        return LineRequest(_LINE_REQUEST.unpack(data)[-1], offsets)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GpioMem:
+    """The GPIO registers through /dev/gpiomem, read without requesting any line"""
+
+    def __init__(self, path="/dev/gpiomem"):
+        fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+        try:
+            self._map = mmap.mmap(fd, mmap.PAGESIZE, mmap.MAP_SHARED, mmap.PROT_READ)
+        finally:
+            os.close(fd)
+        # Registers want whole 32-bit loads, which indexing a uint32 view does
+        self._regs = np.frombuffer(self._map, dtype=np.uint32)
+
+    @classmethod
+    def open(cls, chip, path="/dev/gpiomem"):
+        """Map the registers behind chip; OSError unless it is a BCM2835-style block"""
+        label = chip.info()[1]
+        if label not in GPIOMEM_LABELS:
+            raise OSError(19, f"{label} has no /dev/gpiomem layout")
+        return cls(path)
+
+    def levels(self):
+        """Return the level bits of lines 0-53 from GPLEV0/1"""
+        index = _GPLEV0 // 4
+        return int(self._regs[index]) | int(self._regs[index + 1]) << 32
+
+    def function(self, offset):
+        """Return in, out or altN for one line from its GPFSEL field"""
+        word, field = divmod(offset, 10)
+        return _FUNCTIONS[int(self._regs[_GPFSEL0 // 4 + word]) >> (field * 3) & 7]
+
+    def close(self):
+        if self._map is not None:
+            self._regs = None
+            self._map.close()
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def snapshot(chip, offsets, gpiomem=None):
+    """Return [(LineInfo, level or None)] for offsets without changing any pin
+
+    With gpiomem every line's level and function come from the registers.
+    Without it only lines that are neither in use nor outputs are read, in
+    one request; the rest get level None.
+    """
+    infos = [chip.line_info(offset) for offset in offsets]
+    if gpiomem is not None:
+        bits = gpiomem.levels()
+        for info in infos:
+            info.function = gpiomem.function(info.offset)
+        return [(info, (bits >> info.offset) & 1) for info in infos]
+    free = [info.offset for info in infos if not info.used and not info.output]
+    levels = {}
+    if free:
+        with chip.request(free) as request:
+            levels = request.get_values()
+    return [(info, levels.get(info.offset)) for info in infos]
+
+
+def line_levels(bits, line_index):
+    """Return one line's levels (0/1 uint8) from an array of request bits"""
+    return ((bits >> np.uint64(line_index)) & np.uint64(1)).astype(np.uint8)
+
+
+def columns(bits, line_index, width):
+    """Decimate one line of bits to width (low, high) column pairs
+
+    A column whose samples disagree has low 0 and high 1, so glitches
+    shorter than a column still show up as an edge.
+    """
+    levels = line_levels(bits, line_index)
+    if len(levels) < width:
+        return levels, levels
+    per = len(levels) // width
+    levels = levels[len(levels) - per * width:].reshape(width, per)
+    return levels.min(axis=1), levels.max(axis=1)
+
+
+def write_vcd(path, names, bits, times):
+    """Write the samples as a Value Change Dump with one 1-bit wire per line"""
+    ids = [chr(33 + i) for i in range(len(names))]
+    origin = int(times[0]) if len(times) else 0
+    with open(path, "w") as f:
+        f.write(f"$date {time.strftime('%Y-%m-%d %H:%M:%S')} $end\n")
+        f.write("$version BlackHat logic analyzer $end\n")
+        f.write("$timescale 1 ns $end\n$scope module gpio $end\n")
+        for ident, name in zip(ids, names):
+            f.write(f"$var wire 1 {ident} {name} $end\n")
+        f.write("$upscope $end\n$enddefinitions $end\n")
+        if not len(bits):
+            return
+        first = int(bits[0])
+        f.write("#0\n$dumpvars\n")
+        f.write("".join(f"{(first >> i) & 1}{ident}\n" for i, ident in enumerate(ids)))
+        f.write("$end\n")
+        previous = first
+        for index in (np.flatnonzero(bits[1:] != bits[:-1]) + 1).tolist():
+            value = int(bits[index])
+            changed = value ^ previous
+            f.write(f"#{int(times[index]) - origin}\n")
+            f.write("".join(f"{(value >> i) & 1}{ident}\n"
+                            for i, ident in enumerate(ids) if changed >> i & 1))
+            previous = value
+        f.write(f"#{int(times[-1]) - origin}\n")
@@ -0,0 +1,125 @@
+"""
+Hardware backends
+
+"hardware" uses RPi.GPIO, the ST7789 driver, spidev, /dev/i2c-N, the
+gpiochip character device and /dev/gpiomem, /sys/class/pwm for hardware PWM and BlueZ on the
+system D-Bus. "fake" swaps in stand-ins that run on any Linux box: scripted
+GPIO, a frame-recording ST7789, in-memory SPI/I2C buses, a gpiochip with
+test signals, a pwm sysfs tree in a temporary directory and a fake BlueZ on
+the session bus. "auto" picks hardware when RPi.GPIO can
+be imported and fakes otherwise.
+"""
+
+import os
+
+BACKENDS = ("auto", "hardware", "fake")
+
+
+class Backend:
+    """The set of hardware modules/factories the firmware talks to"""
+
+    def __init__(self, name, gpio, display_driver, spi_factory, i2c_factory, i2c_buses,
+                 gpiochip_factory, gpiomem_factory, pwm_factory, bluez_factory):
+        self.name = name
+        self.gpio = gpio                        # RPi.GPIO-compatible module
+        self.display_driver = display_driver    # module with an ST7789 class, or None
+        self.spi_factory = spi_factory          # () -> spidev.SpiDev-compatible
+        self.i2c_factory = i2c_factory          # (bus) -> smbus.SMBus-compatible
+        self.i2c_buses = i2c_buses              # () -> [bus numbers]
+        self.gpiochip_factory = gpiochip_factory    # (path) -> gpiochip.GpioChip-compatible
+        self.gpiomem_factory = gpiomem_factory      # (chip) -> gpiochip.GpioMem-compatible
+        self.pwm_factory = pwm_factory              # (pin, chip, fallback) -> pwm.SysfsPwm/SoftwarePwm
+        self.bluez_factory = bluez_factory          # () -> jeepney DBusConnection to BlueZ's bus
+
+    @property
+    def is_fake(self):
+        return self.name == "fake"
+
+
+def _hardware_backend():
+    import RPi.GPIO as GPIO
+
+    try:
+        import ST7789
+    except ImportError:
+        print("LCD libraries not found. Install: pip3 install ST7789")
+        ST7789 = None
+
+    def spi_factory():
+        import spidev
+        return spidev.SpiDev()
+
+    def i2c_factory(bus):
+        from firmware.i2c import I2CBus
+        return I2CBus(bus)
+
+    def i2c_buses():
+        from firmware.i2c import list_buses
+        return list_buses()
+
+    def gpiochip_factory(path):
+        from firmware.gpiochip import GpioChip
+        return GpioChip(path)
+
+    def gpiomem_factory(chip):
+        from firmware.gpiochip import GpioMem
+        return GpioMem.open(chip)
+
+    def pwm_factory(pin, chip=0, fallback=True):
+        from firmware.pwm import open_pwm
+        return open_pwm(pin, GPIO, chip=chip, fallback=fallback)
+
+    def bluez_factory():
+        from jeepney.io.blocking import open_dbus_connection
+        return open_dbus_connection(bus="SYSTEM")
+
+    return Backend("hardware", GPIO, ST7789, spi_factory, i2c_factory, i2c_buses,
+                   gpiochip_factory, gpiomem_factory, pwm_factory, bluez_factory)
+
+
+def _fake_backend():
+    from firmware.hw import fake_display
+    from firmware.hw.fake_bus import DEMO_I2C_DEVICES, FakeSMBus, FakeSpiDev
+    from firmware.hw.fake_gpio import FakeGPIO
+
+    def gpiochip_factory(path):
+        from firmware.hw.fake_gpiochip import FakeGpioChip
+        return FakeGpioChip(gpio)
+
+    def gpiomem_factory(chip):
+        from firmware.hw.fake_gpiochip import FakeGpioMem
+        return FakeGpioMem(chip)
+
+    def pwm_factory(pin, chip=0, fallback=True):
+        from firmware.hw.fake_pwm import shared_sysfs
+        from firmware.pwm import open_pwm
+        return open_pwm(pin, gpio, shared_sysfs().root, chip, fallback)
+
+    def i2c_factory(bus):
+        return FakeSMBus(bus, DEMO_I2C_DEVICES.get(bus, {}))
+
+    def bluez_factory():
+        from firmware.hw.fake_bluez import shared_service
+        from jeepney.io.blocking import open_dbus_connection
+        return open_dbus_connection(bus=shared_service().bus)
+
+    gpio = FakeGPIO()
+    return Backend("fake", gpio, fake_display, FakeSpiDev, i2c_factory,
+                   lambda: sorted(DEMO_I2C_DEVICES), gpiochip_factory, gpiomem_factory,
+                   pwm_factory, bluez_factory)
+
+
+def load_backend(name=None):
+    """Return the Backend for name (default: $BLACKHAT_BACKEND or "auto")"""
+    name = name or os.environ.get("BLACKHAT_BACKEND", "auto")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}, expected one of {', '.join(BACKENDS)}")
+    if name == "fake":
+        return _fake_backend()
+    if name == "hardware":
+        return _hardware_backend()
+    try:
+        return _hardware_backend()
+    except ImportError:
+        print("RPi.GPIO not available, using fake hardware backend")
+        return _fake_backend()
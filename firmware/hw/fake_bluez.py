@@ -0,0 +1,228 @@
+"""
+Fake BlueZ
+
+Owns org.bluez on a session bus and plays a small neighbourhood of
+devices on a thread. GetManagedObjects, SetDiscoveryFilter and
+Start/StopDiscovery are answered like bluetoothd does. While discovery is
+on, devices appear with InterfacesAdded and every advertisement is a
+PropertiesChanged carrying the new RSSI. One LE device rotates its random
+address every few seconds, like a phone with privacy enabled, and stale
+temporary devices are removed with InterfacesRemoved.
+
+Without DBUS_SESSION_BUS_ADDRESS a private dbus-daemon is started for the
+process.
+"""
+
+import atexit
+import os
+import random
+import subprocess
+import threading
+import time
+
+from jeepney import DBusAddress, HeaderFields, MessageType, message_bus, new_error
+from jeepney import new_method_return, new_signal
+from jeepney.io.blocking import open_dbus_connection
+
+BLUEZ = "org.bluez"
+OBJECT_MANAGER = "org.freedesktop.DBus.ObjectManager"
+PROPERTIES = "org.freedesktop.DBus.Properties"
+ADAPTER_INTERFACE = "org.bluez.Adapter1"
+DEVICE_INTERFACE = "org.bluez.Device1"
+
+# (address, name, RSSI, BR/EDR class or None for LE-only, seconds until first heard)
+DEMO_BLUETOOTH_DEVICES = (
+    ("00:1A:7D:DA:71:13", "Lab Laptop", -48, 0x5A020C, 0.0),
+    ("F4:5C:89:AB:12:34", "Fitness Band", -71, None, 0.3),
+    ("C8:FD:19:00:42:42", "Plant Sensor", -83, None, 0.5),     # name follows later
+    ("38:18:4C:11:22:33", "BT Speaker", -62, 0x240414, 0.8),
+    ("D0:03:4B:5E:6F:70", "Thermometer", -77, None, 1.2),
+)
+
+# Known to bluetoothd from an earlier pairing but not in range: no RSSI
+CACHED_DEVICE = ("AC:37:43:00:00:01", "Paired Headset")
+
+
+def device_path(adapter, address):
+    return f"/org/bluez/{adapter}/dev_{address.replace(':', '_')}"
+
+
+class FakeBluez:
+    """org.bluez on a D-Bus bus with scripted devices"""
+
+    def __init__(self, bus="SESSION", adapter="hci0", devices=DEMO_BLUETOOTH_DEVICES,
+                 advert_interval=0.2, rotate_every=5.0, temporary_timeout=30.0, seed=1):
+        self.bus = bus
+        self.adapter = adapter
+        self.adapter_path = f"/org/bluez/{adapter}"
+        self.devices = devices
+        self.advert_interval = advert_interval
+        self.rotate_every = rotate_every
+        self.temporary_timeout = temporary_timeout
+        self.random = random.Random(seed)
+        self.transport = "auto"
+        self.discovering = False
+        self.started_at = None
+        self.objects = {}       # path -> Device1 properties (a{sv})
+        self.heard = {}         # path -> monotonic time of the last advertisement
+        self.signals = 0
+        self._rotating = None
+        self._rotated_at = 0.0
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread = None
+        address, name = CACHED_DEVICE
+        self.objects[device_path(adapter, address)] = {
+            "Address": ("s", address), "Name": ("s", name), "Paired": ("b", True),
+            "Class": ("u", 0x240404),
+        }
+
+    def start(self):
+        self._conn = open_dbus_connection(bus=self.bus)
+        reply = self._conn.send_and_get_reply(message_bus.RequestName(BLUEZ, 0x4))
+        if reply.body[0] != 1:      # DBUS_REQUEST_NAME_REPLY_PRIMARY_OWNER
+            self._conn.close()
+            raise OSError(f"{BLUEZ} is already owned on the bus")
+        self._thread = threading.Thread(target=self._run, name="fake-bluez", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _run(self):
+        next_advert = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                message = self._conn.receive(timeout=max(0.0, next_advert - time.monotonic()))
+            except TimeoutError:
+                message = None
+            except OSError:
+                return      # connection closed by stop()
+            if message is not None and message.header.message_type == MessageType.method_call:
+                self._conn.send(self._handle(message))
+            now = time.monotonic()
+            if now >= next_advert:
+                next_advert = now + self.advert_interval
+                if self.discovering:
+                    self._advertise(now)
+                self._remove_stale(now)
+
+    def _handle(self, message):
+        fields = message.header.fields
+        interface, member = fields.get(HeaderFields.interface), fields.get(HeaderFields.member)
+        path = fields.get(HeaderFields.path)
+        if interface == OBJECT_MANAGER and member == "GetManagedObjects" and path == "/":
+            objects = {self.adapter_path: {ADAPTER_INTERFACE: {
+                "Address": ("s", "B8:27:EB:00:00:01"), "Powered": ("b", True),
+                "Discovering": ("b", self.discovering)}}}
+            for device, properties in self.objects.items():
+                objects[device] = {DEVICE_INTERFACE: dict(properties)}
+            return new_method_return(message, "a{oa{sa{sv}}}", (objects,))
+        if interface == ADAPTER_INTERFACE and path == self.adapter_path:
+            if member == "SetDiscoveryFilter":
+                self.transport = message.body[0].get("Transport", ("s", "auto"))[1]
+                return new_method_return(message)
+            if member == "StartDiscovery":
+                if self.discovering:
+                    return new_error(message, "org.bluez.Error.InProgress", "s", ("Operation already in progress",))
+                self.discovering = True
+                self.started_at = time.monotonic()
+                return new_method_return(message)
+            if member == "StopDiscovery":
+                if not self.discovering:
+                    return new_error(message, "org.bluez.Error.Failed", "s", ("No discovery started",))
+                self.discovering = False
+                return new_method_return(message)
+        return new_error(message, "org.freedesktop.DBus.Error.UnknownMethod", "s",
+                         (f"No method {interface}.{member} on {path}",))
+
+    def _wanted(self, device_class):
+        if self.transport == "le":
+            return device_class is None
+        if self.transport == "bredr":
+            return device_class is not None
+        return True
+
+    def _emit(self, message):
+        self._conn.send(message)
+        self.signals += 1
+
+    def _heard(self, address, name, rssi, device_class, now, random_address=False):
+        path = device_path(self.adapter, address)
+        rssi = max(-100, min(-30, rssi + self.random.randint(-4, 4)))
+        self.heard[path] = now
+        if path not in self.objects:
+            properties = {"Address": ("s", address), "RSSI": ("n", rssi),
+                          "AddressType": ("s", "random" if random_address else "public")}
+            if name:
+                properties["Name"] = ("s", name)
+            if device_class is not None:
+                properties["Class"] = ("u", device_class)
+            self.objects[path] = properties
+            self._emit(new_signal(DBusAddress("/", BLUEZ, OBJECT_MANAGER), "InterfacesAdded",
+                                  "oa{sa{sv}}", (path, {DEVICE_INTERFACE: dict(properties)})))
+            return
+        changed = {"RSSI": ("n", rssi)}
+        if name and "Name" not in self.objects[path]:
+            changed["Name"] = ("s", name)
+        self.objects[path].update(changed)
+        self._emit(new_signal(DBusAddress(path, BLUEZ, PROPERTIES), "PropertiesChanged",
+                              "sa{sv}as", (DEVICE_INTERFACE, changed, [])))
+
+    def _advertise(self, now):
+        elapsed = now - self.started_at
+        for address, name, rssi, device_class, delay in self.devices:
+            if elapsed < delay or not self._wanted(device_class):
+                continue
+            # The plant sensor's scan response (with its name) comes after a few adverts
+            if device_class is None and name == "Plant Sensor" and elapsed < delay + 1.0:
+                name = ""
+            self._heard(address, name, rssi, device_class, now)
+        if self._wanted(None):
+            if self._rotating is None or now - self._rotated_at >= self.rotate_every:
+                # Resolvable private address: top two bits 01
+                octets = [0x40 | self.random.randint(0, 0x3F)] + [self.random.randint(0, 255) for _ in range(5)]
+                self._rotating = ":".join(f"{octet:02X}" for octet in octets)
+                self._rotated_at = now
+            self._heard(self._rotating, "", -58, None, now, random_address=True)
+
+    def _remove_stale(self, now):
+        for path, heard in list(self.heard.items()):
+            if now - heard > self.temporary_timeout and "Paired" not in self.objects[path]:
+                del self.heard[path]
+                del self.objects[path]
+                self._emit(new_signal(DBusAddress("/", BLUEZ, OBJECT_MANAGER), "InterfacesRemoved",
+                                      "oas", (path, [DEVICE_INTERFACE])))
+
+
+_daemon = None
+_shared = None
+
+
+def session_bus_address():
+    """$DBUS_SESSION_BUS_ADDRESS, or the address of a private dbus-daemon started for this process"""
+    global _daemon
+    address = os.environ.get("DBUS_SESSION_BUS_ADDRESS")
+    if address:
+        return address
+    if _daemon is None:
+        _daemon = subprocess.Popen(["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+                                   stdout=subprocess.PIPE, text=True)
+        atexit.register(_daemon.terminate)
+        _daemon.address = _daemon.stdout.readline().strip()
+    return _daemon.address
+
+
+def shared_service():
+    """The process-wide fake used by the fake backend, started on first use"""
+    global _shared
+    if _shared is None:
+        _shared = FakeBluez(bus=session_bus_address()).start()
+    return _shared
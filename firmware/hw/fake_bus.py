@@ -0,0 +1,109 @@
+"""
+Fake SPI and I2C buses
+
+FakeSpiDev follows the spidev.SpiDev API, counts every byte and can loop
+MOSI back to MISO. FakeSMBus follows the smbus.SMBus API over a table of
+simulated devices.
+"""
+
+import errno
+
+# bus -> {address: {register: value}} answered by the fake backend's I2C buses
+DEMO_I2C_DEVICES = {
+    1: {0x3C: {}, 0x76: {0xD0: 0x60}, 0x68: {0x75: 0x68}},
+}
+
+
+class FakeSpiDev:
+    """spidev.SpiDev stand-in with byte counters and optional loopback"""
+
+    def __init__(self, loopback=True, sink=None):
+        self.loopback = loopback
+        self.sink = sink            # called with every written buffer
+        self.max_speed_hz = 500000
+        self.mode = 0
+        self.bits_per_word = 8
+        self.bus = None
+        self.device = None
+        self.bytes_written = 0
+        self.transfers = 0
+
+    def open(self, bus, device):
+        self.bus = bus
+        self.device = device
+
+    def close(self):
+        self.bus = self.device = None
+
+    def _write(self, data):
+        self.transfers += 1
+        self.bytes_written += len(data)
+        if self.sink is not None:
+            self.sink(data)
+
+    def _reply(self, data):
+        if self.loopback:
+            return list(bytes(data))
+        return [0] * len(data)
+
+    def writebytes(self, data):
+        self._write(data)
+
+    def writebytes2(self, data):
+        self._write(data)
+
+    def readbytes(self, length):
+        self.transfers += 1
+        return [0] * length
+
+    def xfer(self, data, speed_hz=0, delay_usecs=0, bits_per_word=0):
+        self._write(data)
+        return self._reply(data)
+
+    xfer2 = xfer
+
+    def xfer3(self, data, speed_hz=0, delay_usecs=0, bits_per_word=0):
+        self._write(data)
+        return tuple(self._reply(data))
+
+
+class FakeSMBus:
+    """smbus.SMBus stand-in; devices maps address -> {register: value}"""
+
+    def __init__(self, bus=1, devices=None):
+        self.bus = bus
+        self.devices = {} if devices is None else devices
+        self.transactions = 0
+
+    def _device(self, addr):
+        self.transactions += 1
+        device = self.devices.get(addr)
+        if device is None:
+            raise OSError(errno.EREMOTEIO, "Remote I/O error")
+        return device
+
+    def close(self):
+        pass
+
+    def write_quick(self, addr):
+        self._device(addr)
+
+    def read_byte(self, addr):
+        return self._device(addr).get(0, 0)
+
+    def write_byte(self, addr, value):
+        self._device(addr)[0] = value & 0xFF
+
+    def read_byte_data(self, addr, register):
+        return self._device(addr).get(register, 0)
+
+    def write_byte_data(self, addr, register, value):
+        self._device(addr)[register] = value & 0xFF
+
+    def read_word_data(self, addr, register):
+        device = self._device(addr)
+        return device.get(register, 0) | (device.get(register + 1, 0) << 8)
+
+    def read_i2c_block_data(self, addr, register, length=32):
+        device = self._device(addr)
+        return [device.get(register + i, 0) for i in range(length)]
@@ -0,0 +1,123 @@
+"""
+Fake ST7789 panel
+
+Exposes an ST7789 class with the driver's API. Pixel data written through
+set_window()/data() or the panel's SPI handle lands in an emulated RGB565
+panel RAM, so partial updates can be checked against what was meant to be
+shown. Bytes and pixels are counted, and every completed window can be
+dumped as a PNG.
+"""
+
+import os
+
+import numpy as np
+from PIL import Image
+
+from firmware.hw.fake_bus import FakeSpiDev
+
+ST7789_CASET = 0x2A
+ST7789_RASET = 0x2B
+ST7789_RAMWR = 0x2C
+
+
+class ST7789:
+    """Frame-recording stand-in for ST7789.ST7789"""
+
+    def __init__(self, port=0, cs=0, dc=None, backlight=None, rst=None,
+                 width=240, height=240, rotation=0, invert=True,
+                 spi_speed_hz=4000000, offset_left=0, offset_top=0,
+                 dump_dir=None, keep_frames=0):
+        self._width = width
+        self._height = height
+        self._rotation = rotation
+        self._spi = FakeSpiDev(loopback=False, sink=self._pixel_data)
+        self._spi.max_speed_hz = spi_speed_hz
+        self.ram = np.zeros((height, width), dtype=np.uint16)
+        self.backlight = 1.0 if backlight is not None else None
+        self.dump_dir = dump_dir or os.environ.get("BLACKHAT_FAKE_DUMP")
+        self.keep_frames = keep_frames
+        self.frames = []
+        self.updates = 0
+        self.pixels_written = 0
+        self.commands = 0
+        self.command_bytes = 0
+        self._window = (0, 0, width - 1, height - 1)
+        self._cursor = 0
+        self._data_mode = False
+        if self.dump_dir:
+            os.makedirs(self.dump_dir, exist_ok=True)
+
+    @property
+    def bytes_written(self):
+        return self._spi.bytes_written + self.command_bytes
+
+    def begin(self):
+        pass
+
+    def reset(self):
+        self.ram[:] = 0
+
+    def set_backlight(self, value):
+        self.backlight = value
+
+    def command(self, data):
+        self.commands += 1
+        self._data_mode = False
+
+    def data(self, data):
+        self._data_mode = True
+        if isinstance(data, int):
+            data = [data & 0xFF]
+        if len(data):
+            self._spi.writebytes2(bytes(data))
+
+    def set_window(self, x0=0, y0=0, x1=None, y1=None):
+        x1 = self._width - 1 if x1 is None else x1
+        y1 = self._height - 1 if y1 is None else y1
+        self.commands += 3      # CASET, RASET, RAMWR
+        self.command_bytes += 11
+        self._window = (x0, y0, x1, y1)
+        self._cursor = 0
+        self._data_mode = False
+
+    def image_to_data(self, image, rotation=0):
+        pb = np.rot90(np.array(image.convert('RGB')), rotation // 90).astype('uint16')
+        color = ((pb[:, :, 0] & 0xF8) << 8) | ((pb[:, :, 1] & 0xFC) << 3) | (pb[:, :, 2] >> 3)
+        return np.dstack(((color >> 8) & 0xFF, color & 0xFF)).flatten().tolist()
+
+    def display(self, image):
+        self.set_window()
+        pixelbytes = self.image_to_data(image, self._rotation)
+        for i in range(0, len(pixelbytes), 4096):
+            self.data(pixelbytes[i:i + 4096])
+
+    def _pixel_data(self, data):
+        """Write a chunk of RGB565 bytes into the current window"""
+        x0, y0, x1, y1 = self._window
+        w, h = x1 - x0 + 1, y1 - y0 + 1
+        words = np.frombuffer(bytes(data), dtype='>u2')
+        start = self._cursor
+        end = min(start + len(words), w * h)
+        index = np.arange(start, end)
+        self.ram[y0 + index // w, x0 + index % w] = words[:end - start]
+        self._cursor = end
+        self.pixels_written += end - start
+        if end == w * h:
+            self._window_done()
+
+    def _window_done(self):
+        self.updates += 1
+        if self.keep_frames:
+            self.frames.append(self.snapshot())
+            del self.frames[:-self.keep_frames]
+        if self.dump_dir:
+            self.snapshot().save(os.path.join(self.dump_dir, f"update_{self.updates:05d}.png"))
+
+    def snapshot(self):
+        """Return the current panel RAM as an RGB image"""
+        ram = self.ram
+        rgb = np.empty(ram.shape + (3,), dtype=np.uint8)
+        rgb[..., 0] = (ram >> 8) & 0xF8
+        rgb[..., 1] = (ram >> 3) & 0xFC
+        rgb[..., 2] = (ram << 3) & 0xF8
+        return Image.fromarray(rgb, 'RGB')
@@ -0,0 +1,159 @@
+"""
+Fake RPi.GPIO
+
+Implements the subset of the RPi.GPIO API the firmware uses. Edge callbacks
+fire on a separate thread, like RPi.GPIO's edge-detect thread, either one
+press at a time or from a scripted timeline of button presses.
+"""
+
+import threading
+import time
+
+BCM = 11
+BOARD = 10
+IN = 1
+OUT = 0
+HIGH = 1
+LOW = 0
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+RISING = 31
+FALLING = 32
+BOTH = 33
+
+
+class FakePWM:
+    """Software PWM stand-in that records duty-cycle changes"""
+
+    def __init__(self, gpio, pin, frequency):
+        self.gpio = gpio
+        self.pin = pin
+        self.frequency = frequency
+        self.duty_cycle = 0
+        self.running = False
+        self.history = []
+
+    def start(self, duty_cycle):
+        self.running = True
+        self.ChangeDutyCycle(duty_cycle)
+
+    def ChangeDutyCycle(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+        self.history.append((time.monotonic(), self.frequency, duty_cycle))
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+        self.history.append((time.monotonic(), frequency, self.duty_cycle))
+
+    def stop(self):
+        self.running = False
+
+
+class FakeGPIO:
+    """Drop-in for the RPi.GPIO module with scriptable button presses"""
+
+    BCM, BOARD, IN, OUT, HIGH, LOW = BCM, BOARD, IN, OUT, HIGH, LOW
+    PUD_OFF, PUD_DOWN, PUD_UP = PUD_OFF, PUD_DOWN, PUD_UP
+    RISING, FALLING, BOTH = RISING, FALLING, BOTH
+
+    def __init__(self):
+        self.mode = None
+        self.pins = {}          # pin -> (direction, pull)
+        self.levels = {}        # pin -> level
+        self.callbacks = {}     # pin -> callback
+        self.presses = 0
+        self._player = None
+
+    # RPi.GPIO API
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=PUD_OFF, initial=None):
+        self.pins[pin] = (direction, pull_up_down)
+        if direction == IN:
+            self.levels.setdefault(pin, HIGH if pull_up_down == PUD_UP else LOW)
+        else:
+            self.levels[pin] = LOW if initial is None else initial
+
+    def input(self, pin):
+        return self.levels.get(pin, LOW)
+
+    def output(self, pin, value):
+        self.levels[pin] = HIGH if value else LOW
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        self.callbacks[pin] = callback
+
+    def remove_event_detect(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def PWM(self, pin, frequency):
+        return FakePWM(self, pin, frequency)
+
+    def cleanup(self, pins=None):
+        self.stop()
+        for pin in ([pins] if isinstance(pins, int) else pins or list(self.pins)):
+            self.pins.pop(pin, None)
+            self.callbacks.pop(pin, None)
+
+    # Scripting
+    def press(self, pin, held=()):
+        """Simulate one falling edge on pin (calls its callback on this thread)
+
+        Pins in held read LOW during the press, as if held down with it.
+        """
+        for other in held:
+            self.levels[other] = LOW
+        self.levels[pin] = LOW
+        callback = self.callbacks.get(pin)
+        self.presses += 1
+        try:
+            if callback is not None:
+                callback(pin)
+        finally:
+            for other in (*held, pin):
+                self.levels[other] = HIGH
+
+    def play(self, timeline, on_press=None, on_done=None):
+        """Replay [(delay_seconds, pin), ...] on an edge thread
+
+        Each delay is measured from the previous press; a delay of 0 runs
+        the script at full speed. A (held, ..., pin) tuple presses the last
+        pin while holding the others. on_press(pin, t) is called just
+        before each press with its monotonic timestamp.
+        """
+        self.stop()
+        stop = threading.Event()
+
+        def run():
+            for delay, pin in timeline:
+                if delay > 0 and stop.wait(delay):
+                    return
+                if stop.is_set():
+                    return
+                held = ()
+                if isinstance(pin, tuple):
+                    *held, pin = pin
+                if on_press is not None:
+                    on_press(pin, time.monotonic())
+                self.press(pin, held)
+            if on_done is not None:
+                on_done()
+
+        thread = threading.Thread(target=run, name="fake-gpio-edge", daemon=True)
+        self._player = (thread, stop)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop a running play() script"""
+        if self._player is not None:
+            thread, stop = self._player
+            stop.set()
+            if thread is not threading.current_thread():
+                thread.join(1.0)
+            self._player = None
@@ -0,0 +1,139 @@
+"""
+Fake GPIO character device
+
+Stands in for /dev/gpiochip0 (firmware.gpiochip) on top of a FakeGPIO's pin
+levels, with free-running square waves on a few lines so the logic
+analyzer has something to show.
+"""
+
+import time
+
+from firmware.gpiochip import (LINE_FLAG_BIAS_PULL_UP, LINE_FLAG_INPUT, LINE_FLAG_OUTPUT,
+                               LINE_FLAG_USED, LineInfo)
+from firmware.hw.fake_gpio import IN, LOW, OUT, PUD_OFF, PUD_UP
+
+
+class FakeLineRequest:
+    """LineRequest stand-in reading FakeGpioChip levels"""
+
+    def __init__(self, chip, offsets):
+        self.chip = chip
+        self.offsets = list(offsets)
+        self.mask = (1 << len(self.offsets)) - 1
+
+    def _bits(self, now_ns):
+        bits = 0
+        for i, offset in enumerate(self.offsets):
+            bits |= self.chip.level(offset, now_ns) << i
+        return bits
+
+    def get_values(self):
+        bits = self._bits(time.perf_counter_ns())
+        return {offset: (bits >> i) & 1 for i, offset in enumerate(self.offsets)}
+
+    def sample(self, buffer, count, should_stop=None, check_every=4096):
+        start, end = buffer.chunk(count)
+        buffer.raw[start:end, 1] = self.mask
+        index = start
+        while index < end:
+            stop = min(end, index + check_every)
+            for row in range(index, stop):
+                now = time.perf_counter_ns()
+                buffer.raw[row, 0] = self._bits(now)
+                buffer.times[row] = now
+            index = stop
+            if should_stop is not None and should_stop():
+                break
+        buffer.advance(index - start)
+        return index - start
+
+    def close(self):
+        self.chip.requested.difference_update(self.offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeGpioMem:
+    """GpioMem stand-in reading a FakeGpioChip's levels and pin directions"""
+
+    def __init__(self, chip):
+        self.chip = chip
+
+    def levels(self):
+        now = time.perf_counter_ns()
+        bits = 0
+        for offset in range(self.chip.lines):
+            bits |= self.chip.level(offset, now) << offset
+        return bits
+
+    def function(self, offset):
+        if offset in self.chip.functions:
+            return self.chip.functions[offset]
+        return "out" if self.chip.gpio.pins.get(offset, (IN,))[0] == OUT else "in"
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeGpioChip:
+    """GpioChip stand-in: 54 BCM lines, SPI chip selects held by a driver"""
+
+    def __init__(self, gpio, consumers=None, signals=None, functions=None):
+        self.gpio = gpio
+        self.lines = 54
+        self.consumers = {7: "spi0 CS1", 8: "spi0 CS0"} if consumers is None else consumers
+        # Lines on an alternate function, as the Pi has I2C1 and the UART
+        self.functions = ({2: "alt0", 3: "alt0", 14: "alt0", 15: "alt0"}
+                          if functions is None else functions)
+        self.signals = {4: 1000.0, 17: 250.0} if signals is None else signals    # line -> Hz
+        self.requested = set()
+
+    def level(self, offset, now_ns):
+        frequency = self.signals.get(offset)
+        if frequency:
+            return int(now_ns * frequency * 2e-9) & 1
+        return self.gpio.levels.get(offset, LOW)
+
+    def info(self):
+        return "gpiochip0", "pinctrl-fake", self.lines
+
+    def line_info(self, offset):
+        if not 0 <= offset < self.lines:
+            raise OSError(22, "Invalid argument")
+        flags = LINE_FLAG_INPUT
+        direction, pull = self.gpio.pins.get(offset, (IN, PUD_OFF))
+        if direction == OUT:
+            flags = LINE_FLAG_OUTPUT
+        elif pull == PUD_UP:
+            flags |= LINE_FLAG_BIAS_PULL_UP
+        consumer = self.consumers.get(offset, "")
+        if consumer or offset in self.requested:
+            flags |= LINE_FLAG_USED
+        return LineInfo(offset, f"GPIO{offset}", consumer, flags)
+
+    def request(self, offsets, consumer="blackhat"):
+        offsets = list(offsets)
+        for offset in offsets:
+            if self.line_info(offset).used:
+                raise OSError(16, "Device or resource busy")
+        self.requested.update(offsets)
+        return FakeLineRequest(self, offsets)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
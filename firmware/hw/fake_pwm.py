@@ -0,0 +1,115 @@
+"""
+Fake /sys/class/pwm
+
+Builds a pwmchip tree in a temporary directory and plays the kernel's part
+on a thread: a channel number written to export makes its pwmN directory
+appear, unexport removes it. export and unexport are named pipes, so the
+thread sleeps in select() until something is written to one of them and
+costs nothing while the channels are idle. Attribute writes are kept as
+plain files, so tests can check what SysfsPwm wrote.
+"""
+
+import atexit
+import os
+import select
+import shutil
+import tempfile
+import threading
+
+ATTRIBUTES = {"period": "0", "duty_cycle": "0", "enable": "0", "polarity": "normal"}
+
+
+class FakePwmSysfs:
+    """pwmchipN directories with working export/unexport"""
+
+    def __init__(self, chips=((0, 2),), root=None):
+        self.root = root or tempfile.mkdtemp(prefix="blackhat-pwm-")
+        self.chips = dict(chips)    # chip -> npwm
+        self._pipes = {}            # read fd -> (chip, "export" or "unexport")
+        for chip, npwm in self.chips.items():
+            chip_dir = self.chip_dir(chip)
+            os.makedirs(chip_dir, exist_ok=True)
+            with open(os.path.join(chip_dir, "npwm"), "w") as f:
+                f.write(f"{npwm}\n")
+            for name in ("export", "unexport"):
+                path = os.path.join(chip_dir, name)
+                os.mkfifo(path)
+                # Read-write, so writers never block and closing them is no EOF
+                self._pipes[os.open(path, os.O_RDWR | os.O_NONBLOCK)] = (chip, name)
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = None
+
+    def chip_dir(self, chip):
+        return os.path.join(self.root, f"pwmchip{chip}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="fake-pwm-sysfs", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, remove=False):
+        if self._thread is not None:
+            os.write(self._wake_w, b"x")
+            self._thread.join(1.0)
+            self._thread = None
+        if remove:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def close(self):
+        """Stop the thread, close the pipes and remove the tree"""
+        self.stop(remove=True)
+        for fd in [*self._pipes, self._wake_r, self._wake_w]:
+            os.close(fd)
+        self._pipes = {}
+        self._wake_r = self._wake_w = None
+
+    def state(self, chip, channel):
+        """Return {attribute: value} of an exported channel, or None"""
+        path = os.path.join(self.chip_dir(chip), f"pwm{channel}")
+        if not os.path.isdir(path):
+            return None
+        state = {}
+        for name in ATTRIBUTES:
+            with open(os.path.join(path, name)) as f:
+                state[name] = f.read().strip()
+        return state
+
+    def _apply(self, chip, name, value):
+        chip_dir = self.chip_dir(chip)
+        if not value.isdigit() or int(value) >= self.chips[chip]:
+            return      # the kernel answers EINVAL; the writer sees the pwmN never appear
+        path = os.path.join(chip_dir, f"pwm{int(value)}")
+        if name == "export":
+            os.makedirs(path, exist_ok=True)
+            for attribute, default in ATTRIBUTES.items():
+                with open(os.path.join(path, attribute), "w") as f:
+                    f.write(f"{default}\n")
+        else:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _run(self):
+        while True:
+            ready, _, _ = select.select([*self._pipes, self._wake_r], [], [])
+            if self._wake_r in ready:
+                os.read(self._wake_r, 64)
+                return
+            for fd in ready:
+                chip, name = self._pipes[fd]
+                try:
+                    data = os.read(fd, 4096).decode()
+                except BlockingIOError:
+                    continue
+                for value in data.split():
+                    self._apply(chip, name, value)
+
+
+_shared = None
+
+
+def shared_sysfs():
+    """The process-wide fake tree used by the fake backend, started on first use"""
+    global _shared
+    if _shared is None:
+        _shared = FakePwmSysfs().start()
+        atexit.register(_shared.close)
+    return _shared
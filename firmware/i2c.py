@@ -0,0 +1,293 @@
+"""
+I2C bus scanner
+
+Opens /dev/i2c-N directly and probes each address with the same SMBus
+transactions i2cdetect uses in its default mode: a quick write, or a
+one-byte read on the EEPROM and 0x30-0x37 ranges where a quick write can
+do harm. Addresses bound to a kernel driver (EBUSY on I2C_SLAVE) are
+reported without being touched. Found devices are named from a table of
+common parts, confirmed by a chip-ID register where the part has one.
+
+All buses are scanned at once, one thread each. Results are cached per
+bus and reused while the bus's kernel clients are unchanged and every
+cached device still answers.
+"""
+
+import ctypes
+import errno
+import fcntl
+import glob
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# <linux/i2c-dev.h>, <linux/i2c.h>
+I2C_SLAVE = 0x0703
+I2C_FUNCS = 0x0705
+I2C_SMBUS = 0x0720
+I2C_SMBUS_READ = 1
+I2C_SMBUS_WRITE = 0
+I2C_SMBUS_QUICK = 0
+I2C_SMBUS_BYTE = 1
+I2C_SMBUS_BYTE_DATA = 2
+I2C_FUNC_SMBUS_QUICK = 0x00010000
+I2C_FUNC_SMBUS_READ_BYTE = 0x00020000
+
+FIRST_ADDRESS = 0x03
+LAST_ADDRESS = 0x77
+
+FOUND = "found"
+DRIVER = "driver"       # claimed by a kernel driver, not probed
+
+# (first address, last address, name, chip-ID register or None, expected ID)
+KNOWN_DEVICES = (
+    (0x1E, 0x1E, "HMC5883L compass", 0x0A, 0x48),
+    (0x20, 0x27, "PCF8574/MCP23017 I/O expander", None, None),
+    (0x23, 0x23, "BH1750 light sensor", None, None),
+    (0x29, 0x29, "VL53L0X distance sensor", 0xC0, 0xEE),
+    (0x36, 0x36, "MAX17048 fuel gauge", None, None),
+    (0x3C, 0x3D, "SSD1306 OLED", None, None),
+    (0x40, 0x40, "PCA9685 PWM / INA219 / HTU21D", None, None),
+    (0x44, 0x45, "SHT3x humidity sensor", None, None),
+    (0x48, 0x4B, "ADS1115 ADC", None, None),
+    (0x50, 0x57, "24Cxx EEPROM", None, None),
+    (0x53, 0x53, "ADXL345 accelerometer", 0x00, 0xE5),
+    (0x5A, 0x5B, "CCS811 air quality", 0x20, 0x81),
+    (0x68, 0x68, "MPU6050 IMU", 0x75, 0x68),
+    (0x68, 0x68, "DS3231 RTC", None, None),
+    (0x70, 0x70, "TCA9548A I2C mux", None, None),
+    (0x76, 0x77, "BME280", 0xD0, 0x60),
+    (0x76, 0x77, "BMP280", 0xD0, 0x58),
+    (0x76, 0x77, "BME680", 0xD0, 0x61),
+    (0x76, 0x77, "BMx280 pressure sensor", None, None),
+)
+
+
+class _SmbusData(ctypes.Union):
+    _fields_ = [("byte", ctypes.c_uint8), ("word", ctypes.c_uint16),
+                ("block", ctypes.c_uint8 * 34)]
+
+
+class _SmbusIoctlData(ctypes.Structure):
+    _fields_ = [("read_write", ctypes.c_uint8), ("command", ctypes.c_uint8),
+                ("size", ctypes.c_uint32), ("data", ctypes.POINTER(_SmbusData))]
+
+
+class I2CBus:
+    """/dev/i2c-N through I2C_SMBUS ioctls, with the smbus.SMBus method names"""
+
+    def __init__(self, bus, dev="/dev"):
+        self.bus = bus
+        self.path = os.path.join(dev, f"i2c-{bus}")
+        self.fd = os.open(self.path, os.O_RDWR)
+        self._address = None
+        self._data = _SmbusData()
+        self._args = _SmbusIoctlData(0, 0, 0, ctypes.pointer(self._data))
+
+    def functionality(self):
+        funcs = ctypes.c_ulong()
+        fcntl.ioctl(self.fd, I2C_FUNCS, funcs, True)
+        return funcs.value
+
+    def _select(self, addr):
+        if addr != self._address:
+            fcntl.ioctl(self.fd, I2C_SLAVE, addr)
+            self._address = addr
+
+    def _smbus(self, addr, read_write, command, size):
+        self._select(addr)
+        self._args.read_write = read_write
+        self._args.command = command
+        self._args.size = size
+        fcntl.ioctl(self.fd, I2C_SMBUS, self._args, True)
+
+    def write_quick(self, addr):
+        self._select(addr)
+        args = _SmbusIoctlData(I2C_SMBUS_WRITE, 0, I2C_SMBUS_QUICK, None)
+        fcntl.ioctl(self.fd, I2C_SMBUS, args, True)
+
+    def read_byte(self, addr):
+        self._smbus(addr, I2C_SMBUS_READ, 0, I2C_SMBUS_BYTE)
+        return self._data.byte
+
+    def read_byte_data(self, addr, register):
+        self._smbus(addr, I2C_SMBUS_READ, register, I2C_SMBUS_BYTE_DATA)
+        return self._data.byte
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def list_buses(dev="/dev"):
+    """Return the numbers of every /dev/i2c-N"""
+    buses = []
+    for path in glob.glob(os.path.join(dev, "i2c-*")):
+        match = re.fullmatch(r"i2c-(\d+)", os.path.basename(path))
+        if match:
+            buses.append(int(match.group(1)))
+    return sorted(buses)
+
+
+def bus_signature(bus, sysfs="/sys/bus/i2c/devices"):
+    """Kernel clients on the bus; a change means cached results are stale"""
+    return tuple(sorted(os.path.basename(path)
+                        for path in glob.glob(os.path.join(sysfs, f"{bus}-00*"))))
+
+
+class I2CDevice:
+    """One address that answered (or is held by a driver) on one bus"""
+
+    __slots__ = ("bus", "address", "state", "name", "chip_id")
+
+    def __init__(self, bus, address, state=FOUND, name="", chip_id=None):
+        self.bus = bus
+        self.address = address
+        self.state = state
+        self.name = name
+        self.chip_id = chip_id
+
+    def label(self):
+        text = f"i2c-{self.bus} 0x{self.address:02x}"
+        if self.state == DRIVER:
+            return f"{text} in use by a driver"
+        if self.chip_id is not None:
+            return f"{text} {self.name} (id 0x{self.chip_id:02x})"
+        return f"{text} {self.name}".rstrip()
+
+
+def _uses_read(address, funcs):
+    if not funcs & I2C_FUNC_SMBUS_QUICK:
+        return True
+    # i2cdetect's default: quick writes can corrupt EEPROMs (AT24RF08)
+    return 0x30 <= address <= 0x37 or 0x50 <= address <= 0x5F
+
+
+def probe(bus, address, funcs=I2C_FUNC_SMBUS_QUICK | I2C_FUNC_SMBUS_READ_BYTE):
+    """Return FOUND, DRIVER or None for one address"""
+    try:
+        if _uses_read(address, funcs):
+            bus.read_byte(address)
+        else:
+            bus.write_quick(address)
+        return FOUND
+    except OSError as e:
+        if e.errno == errno.EBUSY:
+            return DRIVER
+        if e.errno in (errno.EREMOTEIO, errno.ENXIO, errno.EIO, errno.ETIMEDOUT, errno.EAGAIN):
+            return None
+        raise
+
+
+def identify(bus, address, table=KNOWN_DEVICES, read_ids=True):
+    """Return (name, chip_id) for a found address, checking ID registers"""
+    fallback = ""
+    for first, last, name, register, expected in table:
+        if not first <= address <= last:
+            continue
+        if register is None:
+            fallback = fallback or name
+            continue
+        if not read_ids:
+            continue
+        try:
+            value = bus.read_byte_data(address, register)
+        except OSError:
+            continue
+        if value == expected:
+            return name, value
+    return fallback, None
+
+
+def load_table(path):
+    """Read extra "0x3c Name" lines (or "0x20-0x27 Name") in front of the built-in table"""
+    table = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            addresses, _, name = line.partition(" ")
+            first, _, last = addresses.partition("-")
+            table.append((int(first, 16), int(last or first, 16), name.strip(), None, None))
+    return tuple(table) + KNOWN_DEVICES
+
+
+def scan_bus(bus, bus_number, table=KNOWN_DEVICES, read_ids=True, should_stop=None):
+    """Probe FIRST_ADDRESS-LAST_ADDRESS on an open bus; returns [I2CDevice]"""
+    try:
+        funcs = bus.functionality()
+    except (AttributeError, OSError):
+        funcs = I2C_FUNC_SMBUS_QUICK | I2C_FUNC_SMBUS_READ_BYTE
+    devices = []
+    for address in range(FIRST_ADDRESS, LAST_ADDRESS + 1):
+        if should_stop is not None and should_stop():
+            break
+        state = probe(bus, address, funcs)
+        if state == FOUND:
+            name, chip_id = identify(bus, address, table, read_ids)
+            devices.append(I2CDevice(bus_number, address, FOUND, name, chip_id))
+        elif state == DRIVER:
+            devices.append(I2CDevice(bus_number, address, DRIVER))
+    return devices
+
+
+class ScanCache:
+    """Per-bus results kept between runs while the bus looks unchanged"""
+
+    def __init__(self, max_age=300.0):
+        self.max_age = max_age
+        self._entries = {}      # bus -> (signature, scanned_at, devices)
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def get(self, bus_number, bus, signature, now=None):
+        """Return cached devices if still valid, re-probing each one to be sure"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(bus_number)
+        if entry is None or entry[0] != signature or now - entry[1] > self.max_age:
+            return None
+        for device in entry[2]:
+            if device.state == FOUND and probe(bus, device.address) != FOUND:
+                return None
+        self.hits += 1
+        return entry[2]
+
+    def put(self, bus_number, signature, devices, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._entries[bus_number] = (signature, now, devices)
+
+
+def scan(buses, open_bus, cache=None, table=KNOWN_DEVICES, read_ids=True, should_stop=None):
+    """Scan every bus concurrently; returns ({bus: [I2CDevice]}, buses served from cache)
+
+    open_bus(n) returns an smbus.SMBus-compatible object (I2CBus on the Pi).
+    """
+    cached = set()
+
+    def one(bus_number):
+        bus = open_bus(bus_number)
+        try:
+            signature = bus_signature(bus_number)
+            if cache is not None:
+                devices = cache.get(bus_number, bus, signature)
+                if devices is not None:
+                    cached.add(bus_number)
+                    return devices
+            devices = scan_bus(bus, bus_number, table, read_ids, should_stop)
+            if cache is not None and not (should_stop is not None and should_stop()):
+                cache.put(bus_number, signature, devices)
+            return devices
+        finally:
+            bus.close()
+
+    if not buses:
+        return {}, cached
+    with ThreadPoolExecutor(max_workers=len(buses), thread_name_prefix="i2c-scan") as pool:
+        results = dict(zip(buses, pool.map(one, buses)))
+    return results, cached
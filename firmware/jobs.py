@@ -0,0 +1,242 @@
+"""
+Background executor for menu actions
+
+Tools run on a small worker pool instead of the input thread. Each run is a
+Job with a progress/status channel the UI draws as an overlay, a cancel flag
+wired to BTN_BACK, and an optional set of resources (e.g. "wlan0") that no
+other job may hold at the same time.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from firmware import metrics
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once it has been cancelled"""
+
+
+def current_job():
+    """Return the Job running on this thread, or None"""
+    return getattr(_local, "job", None)
+
+
+def sleep(seconds):
+    """time.sleep() that wakes up early and raises if the current job is cancelled"""
+    job = current_job()
+    if job is None:
+        time.sleep(seconds)
+    else:
+        job.wait(seconds)
+
+
+class Job:
+    """One run of a menu action"""
+
+    def __init__(self, job_id, name, resources=(), on_update=None):
+        self.id = job_id
+        self.name = name
+        self.resources = tuple(resources)
+        self.state = PENDING
+        self.progress = None
+        self.status = ""
+        self.level = "status"
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._cancel_callbacks = []
+        self._on_update = on_update
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def active(self):
+        return self.state in (PENDING, RUNNING)
+
+    def cancel(self):
+        """Ask the job to stop; tools notice at their next update()/wait()"""
+        if self._cancel.is_set():
+            return
+        self._cancel.set()
+        for callback in list(self._cancel_callbacks):
+            try:
+                callback()
+            except Exception:
+                pass
+        self.update(status="Cancelling...")
+
+    def on_cancel(self, callback):
+        """Register a callback run (on the cancelling thread) when cancelled"""
+        self._cancel_callbacks.append(callback)
+        if self._cancel.is_set():
+            callback()
+
+    def check(self):
+        """Raise JobCancelled if the job has been cancelled"""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def wait(self, seconds):
+        """Sleep for up to seconds, raising JobCancelled if cancelled meanwhile"""
+        if self._cancel.wait(seconds):
+            raise JobCancelled()
+
+    def update(self, progress=None, status=None, level=None):
+        """Publish progress (0-1) and/or a status line to the UI"""
+        if progress is not None:
+            self.progress = max(0.0, min(1.0, progress))
+        if status is not None:
+            self.status = status
+        if level is not None:
+            self.level = level
+        if self._on_update is not None:
+            self._on_update(self)
+
+
+class ActionExecutor:
+    """Runs actions on a bounded worker pool with exclusive resource claims"""
+
+    def __init__(self, max_workers=2, max_jobs=4, on_update=None, linger=2.0):
+        self.max_jobs = max_jobs
+        self.linger = linger
+        self.on_update = on_update
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix="blackhat-job")
+        self._lock = threading.Lock()
+        self._jobs = []
+        self._held = {}
+        self._next_id = 1
+
+    def busy_reason(self, resources=()):
+        """Return why a job with these resources can't start now, or None"""
+        with self._lock:
+            return self._busy_reason_locked(resources)
+
+    def _busy_reason_locked(self, resources):
+        if sum(1 for job in self._jobs if job.active) >= self.max_jobs:
+            return "Too many jobs running"
+        for resource in resources:
+            holder = self._held.get(resource)
+            if holder is not None:
+                return f"{resource} in use by {holder.name}"
+        return None
+
+    def claim(self, resources, holder):
+        """Hold resources for a non-job owner such as a background service
+
+        Returns None on success, otherwise the reason they are busy.
+        """
+        with self._lock:
+            for resource in resources:
+                owner = self._held.get(resource)
+                if owner is not None:
+                    return f"{resource} in use by {owner.name}"
+            for resource in resources:
+                self._held[resource] = holder
+        return None
+
+    def release(self, resources, holder):
+        """Release resources taken with claim()"""
+        with self._lock:
+            for resource in resources:
+                if self._held.get(resource) is holder:
+                    del self._held[resource]
+
+    def submit(self, name, func, resources=()):
+        """Start func() as a job; returns (job, None) or (None, reason)"""
+        with self._lock:
+            reason = self._busy_reason_locked(resources)
+            if reason is not None:
+                return None, reason
+            job = Job(self._next_id, name, resources, on_update=self._notify)
+            self._next_id += 1
+            for resource in job.resources:
+                self._held[resource] = job
+            self._jobs.append(job)
+            self._prune_locked()
+
+        self._pool.submit(self._run, job, func)
+        self._notify(job)
+        return job, None
+
+    def _run(self, job, func):
+        _local.job = job
+        job.state = RUNNING
+        job.started = time.monotonic()
+        self._notify(job)
+        try:
+            job.check()
+            job.result = func()
+            job.state = DONE
+            if job.level == "status":
+                # Still showing what it was doing (or "<name>..."): say it finished
+                job.status = f"{job.name} done"
+        except JobCancelled:
+            job.state = CANCELLED
+            job.status, job.level = "Cancelled", "warning"
+        except Exception as e:
+            job.state = FAILED
+            job.error = e
+            job.status, job.level = f"{job.name} failed: {e}", "error"
+        finally:
+            job.finished = time.monotonic()
+            _local.job = None
+            metrics.count(f"jobs.{job.state}")
+            with self._lock:
+                for resource in job.resources:
+                    if self._held.get(resource) is job:
+                        del self._held[resource]
+            self._notify(job)
+
+    def _notify(self, job):
+        if self.on_update is not None:
+            self.on_update(job)
+
+    def _prune_locked(self):
+        now = time.monotonic()
+        self._jobs = [job for job in self._jobs
+                      if job.active or now - job.finished < self.linger]
+
+    def active_jobs(self):
+        with self._lock:
+            return [job for job in self._jobs if job.active]
+
+    def foreground(self):
+        """Return the job the overlay should show: newest active, else a recent finish"""
+        with self._lock:
+            self._prune_locked()
+            if not self._jobs:
+                return None
+            for job in reversed(self._jobs):
+                if job.active:
+                    return job
+            return self._jobs[-1]
+
+    def cancel_foreground(self):
+        """Cancel the newest active job; returns it, or None if nothing was running"""
+        with self._lock:
+            active = [job for job in self._jobs if job.active]
+        if not active:
+            return None
+        job = active[-1]
+        job.cancel()
+        return job
+
+    def shutdown(self, wait=False):
+        for job in self.active_jobs():
+            job.cancel()
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,241 @@
+"""
+Partial-refresh front end for the ST7789 LCD
+
+Keeps the last frame sent to the panel, works out which rectangles changed
+and pushes only those windows using the controller's CASET/RASET address
+window, instead of a full 240x240 frame on every update.
+
+Pixels are converted to RGB565 with numpy into a persistent framebuffer and
+written to spidev in large chunks straight out of that buffer.
+"""
+
+import numpy as np
+from PIL import ImageChops
+
+from firmware import metrics
+
+# CASET + 4 bytes, RASET + 4 bytes, RAMWR
+WINDOW_OVERHEAD_BYTES = 11
+BYTES_PER_PIXEL = 2
+
+
+class FrameStats:
+    """Bytes and pixels pushed to the panel, per frame and in total"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.full_frames = 0
+        self.skipped_frames = 0
+        self.total_bytes = 0
+        self.total_pixels = 0
+        self.last_bytes = 0
+        self.last_pixels = 0
+        self.last_rects = []
+
+    def record(self, rects, full=False):
+        pixels = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects)
+        sent = pixels * BYTES_PER_PIXEL + len(rects) * WINDOW_OVERHEAD_BYTES
+        self.frames += 1
+        if full:
+            self.full_frames += 1
+        if not rects:
+            self.skipped_frames += 1
+        self.last_rects = list(rects)
+        self.last_pixels = pixels
+        self.last_bytes = sent
+        self.total_pixels += pixels
+        self.total_bytes += sent
+
+    def as_dict(self):
+        return {
+            "frames": self.frames,
+            "full_frames": self.full_frames,
+            "skipped_frames": self.skipped_frames,
+            "total_bytes": self.total_bytes,
+            "total_pixels": self.total_pixels,
+            "last_bytes": self.last_bytes,
+            "last_pixels": self.last_pixels,
+            "last_rects": self.last_rects,
+        }
+
+
+def dirty_rects(old, new, band_height=5, merge_gap=0):
+    """Return (x0, y0, x1, y1) boxes, end-exclusive, covering pixels that differ
+
+    The difference image is scanned in horizontal bands; consecutive dirty
+    bands are merged into one rectangle spanning their combined columns.
+    """
+    diff = ImageChops.difference(old, new)
+    if diff.getbbox() is None:
+        return []
+
+    width, height = new.size
+    rects = []
+    current = None
+    gap = 0
+    for top in range(0, height, band_height):
+        bottom = min(height, top + band_height)
+        bbox = diff.crop((0, top, width, bottom)).getbbox()
+        if bbox is None:
+            if current is not None:
+                gap += 1
+                if gap > merge_gap:
+                    rects.append(tuple(current))
+                    current = None
+            continue
+
+        x0, y0, x1, y1 = bbox[0], top + bbox[1], bbox[2], top + bbox[3]
+        if current is None:
+            current = [x0, y0, x1, y1]
+        else:
+            current[0] = min(current[0], x0)
+            current[2] = max(current[2], x1)
+            current[3] = y1
+        gap = 0
+
+    if current is not None:
+        rects.append(tuple(current))
+    return rects
+
+
+class Rgb565Framebuffer:
+    """Persistent big-endian RGB565 framebuffer backed by a reusable bytearray"""
+
+    def __init__(self, width=240, height=240):
+        self.width = width
+        self.height = height
+        self.buffer = bytearray(width * height * BYTES_PER_PIXEL)
+        self.view = memoryview(self.buffer)
+        # Wire order is big-endian, the panel takes the high byte first
+        self.pixels = np.frombuffer(self.buffer, dtype='>u2').reshape(height, width)
+        # Packed copy of the last window, so partial windows go out contiguous
+        self._stage = bytearray(len(self.buffer))
+        self._stage_pixels = np.frombuffer(self._stage, dtype='>u2')
+        self._stage_view = memoryview(self._stage)
+        self._scratch = np.empty((height, width), dtype=np.uint16)
+        self._channel = np.empty((height, width), dtype=np.uint16)
+
+    def update(self, image, box=None):
+        """Convert an RGB image into the framebuffer at box (defaults to full)"""
+        x0, y0, x1, y1 = box or (0, 0, self.width, self.height)
+        h, w = y1 - y0, x1 - x0
+        rgb = np.asarray(image)
+        out = self._scratch[:h, :w]
+        tmp = self._channel[:h, :w]
+
+        # ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3), without temporaries
+        np.bitwise_and(rgb[..., 0], 0xF8, out=out, casting='unsafe')
+        np.left_shift(out, 8, out=out)
+        np.bitwise_and(rgb[..., 1], 0xFC, out=tmp, casting='unsafe')
+        np.left_shift(tmp, 3, out=tmp)
+        np.bitwise_or(out, tmp, out=out)
+        np.right_shift(rgb[..., 2], 3, out=tmp, casting='unsafe')
+        np.bitwise_or(out, tmp, out=out)
+        self.pixels[y0:y1, x0:x1] = out
+
+    def window_bytes(self, box):
+        """Return a memoryview of the packed RGB565 data for a window"""
+        x0, y0, x1, y1 = box
+        if x0 == 0 and x1 == self.width:
+            # Full-width windows are already contiguous in the framebuffer
+            start = y0 * self.width * BYTES_PER_PIXEL
+            return self.view[start:y1 * self.width * BYTES_PER_PIXEL]
+
+        count = (x1 - x0) * (y1 - y0)
+        packed = self._stage_pixels[:count].reshape(y1 - y0, x1 - x0)
+        packed[...] = self.pixels[y0:y1, x0:x1]
+        return self._stage_view[:count * BYTES_PER_PIXEL]
+
+
+class PanelWriter:
+    """Window writes to an ST7789 straight through its spidev handle"""
+
+    def __init__(self, panel, chunk_size=4096):
+        self.panel = panel
+        # spidev's default bufsiz is 4096; raise both together if the
+        # kernel module is loaded with a larger spidev.bufsiz
+        self.chunk_size = chunk_size
+
+    def window(self, x0, y0, x1, y1):
+        """Set the panel address window (end-exclusive box)"""
+        self.panel.set_window(x0, y0, x1 - 1, y1 - 1)
+
+    def write(self, data):
+        """Write pixel data from a buffer in chunk_size pieces"""
+        # An empty data() call raises DC for the pixel stream
+        self.panel.data([])
+        spi = self.panel._spi
+        for i in range(0, len(data), self.chunk_size):
+            spi.writebytes2(data[i:i + self.chunk_size])
+
+
+class PartialDisplay:
+    """Wrap an ST7789 panel and only push the parts of a frame that changed"""
+
+    def __init__(self, panel, width=240, height=240, full_threshold=0.6, writer=None):
+        self.panel = panel
+        self.width = width
+        self.height = height
+        self.full_threshold = full_threshold
+        self.stats = FrameStats()
+        self.framebuffer = Rgb565Framebuffer(width, height)
+        self.writer = writer or PanelWriter(panel)
+        self._last = None
+        # Address windows are given in panel coordinates, so a rotated
+        # panel always gets full frames
+        self._partial_ok = getattr(panel, "_rotation", 0) == 0
+
+    def invalidate(self):
+        """Forget the last frame so the next one is pushed in full"""
+        self._last = None
+
+    def display(self, image):
+        """Push a frame, sending only the changed windows when possible"""
+        with metrics.timer("lcd.push"):
+            self._display(image)
+        metrics.count("lcd.bytes", self.stats.last_bytes)
+
+    def _display(self, image):
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        if image is self._last:
+            self.stats.record([])
+            return
+
+        if self._last is None or not self._partial_ok:
+            self._push_full(image)
+            return
+
+        rects = dirty_rects(self._last, image)
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects)
+        if area > self.full_threshold * self.width * self.height:
+            self._push_full(image)
+            return
+
+        for rect in rects:
+            self.framebuffer.update(image.crop(rect), rect)
+            self._push_window(rect)
+        self.stats.record(rects)
+        self._last = image
+
+    def _push_full(self, image):
+        box = (0, 0, self.width, self.height)
+        if self._partial_ok:
+            self.framebuffer.update(image)
+            self._push_window(box)
+        else:
+            self.panel.display(image)
+        self.stats.record([box], full=True)
+        self._last = image
+
+    def _push_window(self, box):
+        self.writer.window(*box)
+        self.writer.write(self.framebuffer.window_bytes(box))
+
+    def __getattr__(self, name):
+        # Backlight and other panel calls pass straight through
+        return getattr(self.panel, name)
@@ -0,0 +1,244 @@
+"""
+Hot-path instrumentation
+
+Counters and latency histograms for the UI loop, menu actions, tools,
+panel pushes and external commands. A histogram is a fixed list of
+log-linear microsecond buckets (four per power of two, so any estimate is
+within 25%), updated in place: observing a duration is a bit_length() and
+a few additions, with no allocation and no lock. An increment lost to a
+race between threads costs one sample, which field diagnostics can afford.
+
+There is one registry per process, held by this module. Instrumented
+modules call timer(), observe() and count() without passing it around;
+configure() switches it on from [metrics]. While it is off, timer()
+returns a shared no-op context manager and the other calls return at once.
+"""
+
+import threading
+import time
+
+# 0-3 us get a bucket each, then four buckets per doubling up to ~2 min
+BUCKETS = 104
+
+
+def bucket(us):
+    """Histogram bucket index for a duration in whole microseconds"""
+    if us < 4:
+        return max(0, us)
+    bits = us.bit_length()
+    index = (bits - 2) * 4 + (us >> (bits - 3)) - 4
+    return min(index, BUCKETS - 1)
+
+
+def bucket_bounds(index):
+    """[low, high) in microseconds of a bucket"""
+    if index < 4:
+        return index, index + 1
+    shift = index // 4 - 1
+    mantissa = index % 4 + 4
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class Histogram:
+    """Latency distribution of one hot path, in log-linear buckets"""
+
+    __slots__ = ("counts", "count", "total", "max", "last", "recent")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0        # seconds
+        self.max = 0.0
+        self.last = 0.0
+        self.recent = 0.0       # moving average, weighted towards the last few
+
+    def observe(self, seconds):
+        self.counts[bucket(int(seconds * 1e6))] += 1
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+        if self.count == 1:
+            self.recent = seconds
+        else:
+            self.recent += (seconds - self.recent) * 0.2
+
+    def percentile(self, p):
+        """Estimated p-th percentile in seconds, interpolated within its bucket"""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for index, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low, high = bucket_bounds(index)
+                value = (low + (high - low) * max(0.0, rank - seen) / n) / 1e6
+                return min(value, self.max)
+            seen += n
+        return self.max
+
+    def summary(self):
+        """count, sum and max plus p50/p90/p99, all times in milliseconds"""
+        return {
+            "count": self.count,
+            "sum_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "max_ms": self.max * 1000,
+            "p50_ms": self.percentile(50) * 1000,
+            "p90_ms": self.percentile(90) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+        }
+
+
+class _NullTimer:
+    """What timer() returns while metrics are off"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class FrameRate:
+    """Frames per second over the last window seconds"""
+
+    def __init__(self, window=1.0):
+        self.window = window
+        self._times = []
+
+    def tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._times.append(now)
+        self._trim(now)
+
+    def _trim(self, now):
+        cutoff = now - self.window
+        drop = 0
+        while drop < len(self._times) and self._times[drop] < cutoff:
+            drop += 1
+        if drop:
+            del self._times[:drop]
+
+    def rate(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._trim(now)
+        return len(self._times) / self.window
+
+
+class Metrics:
+    """Named counters, histograms and gauges; cheap no-ops while disabled"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}        # name -> callable returning a number
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def timer(self, name):
+        """Context manager timing its block into histogram name"""
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self.histogram(name))
+
+    def observe(self, name, seconds):
+        """Record a duration measured elsewhere"""
+        if self.enabled:
+            self.histogram(name).observe(seconds)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, func):
+        """Report func() under name whenever a snapshot is taken"""
+        self.gauges[name] = func
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+        self.started = time.monotonic()
+
+    def snapshot(self):
+        """Everything recorded so far as plain dicts, times in milliseconds"""
+        gauges = {}
+        for name, func in list(self.gauges.items()):
+            try:
+                gauges[name] = func()
+            except Exception:
+                gauges[name] = None     # the owner went away or is mid-shutdown
+        return {
+            "enabled": self.enabled,
+            "uptime": time.monotonic() - self.started,
+            "counters": dict(self.counters),
+            "histograms": {name: histogram.summary()
+                           for name, histogram in sorted(self.histograms.items())},
+            "gauges": gauges,
+        }
+
+    def prometheus(self, prefix="blackhat"):
+        """The snapshot in the Prometheus text exposition format"""
+        def metric(name):
+            return prefix + "_" + "".join(c if c.isalnum() else "_" for c in name)
+
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines += [f"# TYPE {metric(name)}_total counter", f"{metric(name)}_total {value}"]
+        for name, value in sorted(snapshot["gauges"].items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines += [f"# TYPE {metric(name)} gauge", f"{metric(name)} {value}"]
+        for name, histogram in sorted(self.histograms.items()):
+            base = metric(name) + "_seconds"
+            lines.append(f"# TYPE {base} summary")
+            for quantile in (0.5, 0.9, 0.99):
+                lines.append(f'{base}{{quantile="{quantile}"}} {histogram.percentile(quantile * 100):.6f}')
+            lines += [f"{base}_sum {histogram.total:.6f}", f"{base}_count {histogram.count}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Metrics()
+
+# Module-level shortcuts for instrumented code
+timer = registry.timer
+observe = registry.observe
+count = registry.count
+gauge = registry.gauge
+snapshot = registry.snapshot
+
+
+def configure(config):
+    """Switch the registry on or off from [metrics]; returns it"""
+    registry.enabled = config["metrics"].getboolean("enabled")
+    return registry
@@ -0,0 +1,119 @@
+"""
+Metrics endpoint
+
+Serves the metrics registry over HTTP on a loopback port or a Unix socket,
+on a thread of its own:
+
+    GET /metrics        Prometheus text format
+    GET /metrics.json   the full snapshot, with latency percentiles
+
+    curl -s localhost:9105/metrics.json
+    curl -s --unix-socket /run/blackhat/metrics.sock http://blackhat/metrics
+
+Only bind it to loopback: there is no authentication.
+"""
+
+import json
+import os
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from firmware import metrics
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    server_version = "blackhat-metrics"
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = metrics.registry.prometheus().encode()
+            content_type = "text/plain; version=0.0.4"
+        elif path == "/metrics.json":
+            body = json.dumps(metrics.registry.snapshot(), indent=2, sort_keys=True).encode()
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        pass    # scrapes every few seconds would flood the journal
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def parse_listen(listen):
+    """"127.0.0.1:9105", ":9105" or "unix:/path" -> (family, address)"""
+    if listen.startswith("unix:"):
+        return "unix", listen[5:]
+    host, sep, port = listen.rpartition(":")
+    if not sep or not port.isdigit():
+        raise ValueError(f"Invalid [metrics] listen {listen!r}, expected host:port or unix:/path")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+class MetricsServer:
+    """The metrics endpoint on a background thread"""
+
+    def __init__(self, listen):
+        self.family, self.address = parse_listen(listen)
+        self._server = None
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Build the server from [metrics], or return None when it is off"""
+        section = config["metrics"]
+        if not section.getboolean("enabled") or not section["listen"]:
+            return None
+        return cls(section["listen"])
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        if self.family == "unix":
+            directory = os.path.dirname(self.address)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(self.address):
+                os.unlink(self.address)     # left behind by an unclean exit
+            self._server = UnixHTTPServer(self.address, MetricsHandler)
+        else:
+            self._server = ThreadingHTTPServer(self.address, MetricsHandler)
+            self._server.daemon_threads = True
+            self.address = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 1.0},
+                                        name="blackhat-metrics", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
+        if self.family == "unix" and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def describe(self):
+        if self.family == "unix":
+            return f"unix:{self.address}"
+        host, port = self.address
+        return f"http://{host}:{port}"
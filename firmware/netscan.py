@@ -0,0 +1,252 @@
+"""
+Local subnet discovery
+
+Hosts come from two places: the kernel neighbor (ARP) table, read over
+rtnetlink with /proc/net/arp as a fallback, which answers instantly, and an
+async TCP probe sweep of the lab subnet. Any answer to a probe, even a
+refused connection, proves the host is up; the neighbor table is read again
+after the sweep to pick up hosts that answered ARP but filter every port.
+Everything is merged into one HostTable keyed by IP address.
+"""
+
+import asyncio
+import fcntl
+import ipaddress
+import socket
+import struct
+import time
+
+from firmware import portscan
+
+try:
+    import netifaces
+except ImportError:
+    netifaces = None
+
+# <linux/rtnetlink.h>, <linux/neighbour.h>
+RTM_NEWNEIGH = 28
+RTM_GETNEIGH = 30
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+NDA_DST = 1
+NDA_LLADDR = 2
+NUD_INCOMPLETE = 0x01
+NUD_FAILED = 0x20
+NUD_NOARP = 0x40
+
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891B
+
+PROBE_PORTS = (80, 443, 22, 445)
+
+
+class Host:
+    """One discovered host"""
+
+    __slots__ = ("ip", "mac", "interface", "sources", "ports", "first_seen", "last_seen")
+
+    def __init__(self, ip, now):
+        self.ip = ip
+        self.mac = None
+        self.interface = None
+        self.sources = set()    # "neighbor", "probe"
+        self.ports = set()      # ports that accepted a connection
+        self.first_seen = now
+        self.last_seen = now
+
+    def label(self):
+        mac = self.mac or "??:??:??:??:??:??"
+        ports = ",".join(str(p) for p in sorted(self.ports))
+        return f"{self.ip} {mac} {ports}".rstrip()
+
+
+class HostTable:
+    """Deduplicated hosts by IP; merge() reports whether anything changed"""
+
+    def __init__(self):
+        self.hosts = {}
+        self.version = 0
+
+    def merge(self, ip, mac=None, interface=None, source=None, port=None, now=None):
+        now = time.time() if now is None else now
+        ip = ipaddress.ip_address(ip)
+        host = self.hosts.get(ip)
+        changed = host is None
+        if host is None:
+            host = self.hosts[ip] = Host(ip, now)
+        host.last_seen = now
+        if mac and host.mac != mac:
+            host.mac = mac
+            changed = True
+        if interface:
+            host.interface = interface
+        if source and source not in host.sources:
+            host.sources.add(source)
+            changed = True
+        if port is not None and port not in host.ports:
+            host.ports.add(port)
+            changed = True
+        if changed:
+            self.version += 1
+        return changed
+
+    def sorted(self):
+        return [self.hosts[ip] for ip in sorted(self.hosts)]
+
+    def __len__(self):
+        return len(self.hosts)
+
+
+def _rtattrs(data, offset, end):
+    while offset + 4 <= end:
+        length, kind = struct.unpack_from("=HH", data, offset)
+        if length < 4:
+            break
+        yield kind, data[offset + 4:offset + length]
+        offset += (length + 3) & ~3
+
+
+def read_neighbors_netlink(family=socket.AF_INET):
+    """Yield (ip, mac, ifindex, state) from an RTM_GETNEIGH dump"""
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+    try:
+        sock.bind((0, 0))
+        ndmsg = struct.pack("=BBHiHBB", family, 0, 0, 0, 0, 0, 0)
+        header = struct.pack("=IHHII", 16 + len(ndmsg), RTM_GETNEIGH,
+                             NLM_F_REQUEST | NLM_F_DUMP, 1, 0)
+        sock.send(header + ndmsg)
+        while True:
+            data = sock.recv(65536)
+            offset = 0
+            while offset + 16 <= len(data):
+                length, kind = struct.unpack_from("=IH", data, offset)
+                if kind == NLMSG_DONE:
+                    return
+                if kind == NLMSG_ERROR:
+                    errno_ = -struct.unpack_from("=i", data, offset + 16)[0]
+                    raise OSError(errno_, "RTM_GETNEIGH failed")
+                if kind == RTM_NEWNEIGH:
+                    _, _, _, ifindex, state, _, _ = struct.unpack_from("=BBHiHBB", data, offset + 16)
+                    ip = mac = None
+                    for attr, value in _rtattrs(data, offset + 28, offset + length):
+                        if attr == NDA_DST:
+                            ip = socket.inet_ntop(family, value)
+                        elif attr == NDA_LLADDR:
+                            mac = ":".join(f"{b:02x}" for b in value)
+                    if ip is not None:
+                        yield ip, mac, ifindex, state
+                offset += (length + 3) & ~3
+    finally:
+        sock.close()
+
+
+def read_neighbors_proc(path="/proc/net/arp"):
+    """Yield (ip, mac, interface, complete) from /proc/net/arp"""
+    with open(path) as f:
+        next(f, None)
+        for line in f:
+            fields = line.split()
+            if len(fields) >= 6:
+                complete = int(fields[2], 16) & 0x2
+                yield fields[0], fields[3], fields[5], bool(complete)
+
+
+def read_neighbors(interface=None):
+    """Return [(ip, mac, interface)] of live neighbor entries, optionally for one interface"""
+    entries = []
+    try:
+        for ip, mac, ifindex, state in read_neighbors_netlink():
+            if state & (NUD_INCOMPLETE | NUD_FAILED | NUD_NOARP) or not mac:
+                continue
+            try:
+                name = socket.if_indextoname(ifindex)
+            except OSError:
+                name = None
+            entries.append((ip, mac, name))
+    except OSError:
+        entries = [(ip, mac, name) for ip, mac, name, complete in read_neighbors_proc()
+                   if complete]
+    if interface:
+        entries = [entry for entry in entries if entry[2] == interface]
+    return entries
+
+
+def interface_network(interface):
+    """Return the IPv4 ip_interface (address/prefix) configured on interface"""
+    if netifaces is not None:
+        addrs = netifaces.ifaddresses(interface).get(netifaces.AF_INET)
+        if not addrs:
+            raise OSError(f"{interface} has no IPv4 address")
+        return ipaddress.ip_interface(f"{addrs[0]['addr']}/{addrs[0]['netmask']}")
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        request = struct.pack("256s", interface.encode()[:15])
+        address = socket.inet_ntoa(fcntl.ioctl(sock, SIOCGIFADDR, request)[20:24])
+        netmask = socket.inet_ntoa(fcntl.ioctl(sock, SIOCGIFNETMASK, request)[20:24])
+    except OSError as e:
+        raise OSError(f"{interface} has no IPv4 address ({e.strerror})") from None
+    finally:
+        sock.close()
+    return ipaddress.ip_interface(f"{address}/{netmask}")
+
+
+def scan_network(interface, subnet="", max_hosts=1024):
+    """Return (own ip_interface, network to sweep) for the lab interface
+
+    subnet defaults to the interface's own network and must lie inside it,
+    so the sweep never leaves the configured lab segment.
+    """
+    own = interface_network(interface)
+    network = ipaddress.ip_network(subnet, strict=False) if subnet else own.network
+    if not network.subnet_of(own.network):
+        raise ValueError(f"{network} is not on {interface} ({own.network})")
+    if network.num_addresses > max_hosts + 2:
+        raise ValueError(f"{network} has more than {max_hosts} hosts")
+    return own, network
+
+
+async def sweep(addresses, table, ports=PROBE_PORTS, concurrency=128, timeout=0.5,
+                on_change=None, should_stop=None):
+    """Probe all ports of each address at once; merge hosts that answer into table"""
+    pending = iter(addresses)
+    family = socket.AF_INET
+
+    async def worker():
+        for address in pending:
+            if should_stop is not None and should_stop():
+                return
+            # All ports at once: a dead host costs one timeout, not one per port
+            host = str(address)
+            states = await asyncio.gather(*(portscan.connect_probe(family, (host, port), timeout)
+                                            for port in ports))
+            if all(state in (portscan.FILTERED, portscan.ERROR) for state in states):
+                continue
+            changed = table.merge(address, source="probe")
+            for port, state in zip(ports, states):
+                if state == portscan.OPEN:
+                    changed = table.merge(address, port=port) or changed
+            if changed and on_change is not None:
+                on_change(table)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+def discover(interface, table=None, subnet="", ports=PROBE_PORTS, concurrency=128,
+             timeout=0.5, on_change=None, should_stop=None):
+    """Neighbor table first, then a probe sweep, then the neighbor table again"""
+    table = HostTable() if table is None else table
+    own, network = scan_network(interface, subnet)
+
+    def from_neighbors():
+        for ip, mac, name in read_neighbors(interface):
+            if ipaddress.ip_address(ip) in network:
+                if table.merge(ip, mac=mac, interface=name, source="neighbor") and on_change:
+                    on_change(table)
+
+    from_neighbors()
+    targets = [address for address in network.hosts() if address != own.ip]
+    asyncio.run(sweep(targets, table, ports, concurrency, timeout, on_change, should_stop))
+    from_neighbors()
+    return table
@@ -0,0 +1,198 @@
+"""
+Asyncio TCP connect scanner
+
+Many connects are in flight at once (bounded by a worker count) and a
+token bucket caps how many are started per second. Targets must be
+loopback addresses or inside the configured allowlist of lab hosts;
+anything else is refused before a single packet is sent.
+"""
+
+import asyncio
+import errno
+import ipaddress
+import socket
+import time
+
+OPEN = "open"
+CLOSED = "closed"
+FILTERED = "filtered"
+ERROR = "error"         # the probe failed locally (EPERM, EADDRNOTAVAIL, ENOBUFS, ...)
+
+
+def parse_ports(spec):
+    """Parse "22,80,8000-8100" into a sorted list of unique ports"""
+    ports = set()
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        low = int(first)
+        high = int(last) if sep else low
+        if not 1 <= low <= high <= 65535:
+            raise ValueError(f"Bad port range {part!r}")
+        ports.update(range(low, high + 1))
+    return sorted(ports)
+
+
+def parse_allowlist(spec):
+    """Parse "10.0.0.5, 192.168.50.0/24" into ip_network objects"""
+    return [ipaddress.ip_network(item.strip(), strict=False)
+            for item in spec.split(",") if item.strip()]
+
+
+def resolve_targets(spec, allowlist=()):
+    """Resolve comma-separated targets to addresses, refusing any not allowed
+
+    Loopback is always allowed; other addresses must fall inside one of the
+    allowlist networks. Names are checked after resolution.
+    """
+    addresses = []
+    for target in (item.strip() for item in spec.split(",")):
+        if not target:
+            continue
+        infos = socket.getaddrinfo(target, None, type=socket.SOCK_STREAM)
+        for address in dict.fromkeys(ipaddress.ip_address(info[4][0]) for info in infos):
+            if not (address.is_loopback or any(address in net for net in allowlist)):
+                raise ValueError(f"{target} ({address}) is not localhost or in the allowlist")
+            if address not in addresses:
+                addresses.append(address)
+    return addresses
+
+
+def service_name(port):
+    try:
+        return socket.getservbyport(port, "tcp")
+    except OSError:
+        return ""
+
+
+class TokenBucket:
+    """Async token bucket: rate tokens per second, at most burst at once"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate / 20)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ScanStats:
+    """Probe counts and throughput of one scan"""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.open = 0
+        self.closed = 0
+        self.filtered = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def ports_per_s(self):
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        return (f"{self.done} ports in {self.elapsed:.1f}s ({self.ports_per_s:.0f}/s): "
+                f"{self.open} open, {self.closed} closed, {self.filtered} filtered"
+                + (f", {self.errors} errors" if self.errors else ""))
+
+
+def _state(err):
+    if err == 0:
+        return OPEN
+    if err == errno.ECONNREFUSED:
+        return CLOSED
+    if err in (errno.ETIMEDOUT, errno.EHOSTUNREACH, errno.ENETUNREACH):
+        return FILTERED
+    # Anything else is this port's problem, not a reason to abort the scan
+    return ERROR
+
+
+def _settle(future, value):
+    if not future.done():
+        future.set_result(value)
+
+
+async def connect_probe(family, sockaddr, timeout):
+    """Return OPEN, CLOSED, FILTERED or ERROR for a TCP connect to sockaddr
+
+    The non-blocking connect() usually answers at once on loopback and the
+    LAN (RST or an immediate accept); only in-progress connects wait on the
+    event loop, without a task or wait_for() per probe.
+    """
+    try:
+        sock = socket.socket(family, socket.SOCK_STREAM)
+    except OSError:
+        return ERROR    # out of file descriptors or buffers
+    sock.setblocking(False)
+    try:
+        err = sock.connect_ex(sockaddr)
+        if err != errno.EINPROGRESS:
+            return _state(err)
+        loop = asyncio.get_running_loop()
+        writable = loop.create_future()
+        fd = sock.fileno()
+        loop.add_writer(fd, _settle, writable, True)
+        timer = loop.call_later(timeout, _settle, writable, False)
+        try:
+            if not await writable:
+                return FILTERED
+        finally:
+            loop.remove_writer(fd)
+            timer.cancel()
+        return _state(sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR))
+    finally:
+        sock.close()
+
+
+async def scan(addresses, ports, concurrency=64, rate=500.0, timeout=1.0,
+               on_result=None, should_stop=None):
+    """Connect-scan every (address, port); returns ScanStats
+
+    on_result(address, port, state) is called as each probe completes.
+    Scanning stops early once should_stop() returns true.
+    """
+    probes = iter([(address, str(address), socket.AF_INET6 if address.version == 6 else socket.AF_INET, port)
+                   for address in addresses for port in ports])
+    stats = ScanStats(len(addresses) * len(ports))
+    bucket = TokenBucket(rate)
+
+    async def worker():
+        for address, host, family, port in probes:
+            if should_stop is not None and should_stop():
+                return
+            await bucket.acquire()
+            state = await connect_probe(family, (host, port), timeout)
+            stats.done += 1
+            if state == OPEN:
+                stats.open += 1
+            elif state == CLOSED:
+                stats.closed += 1
+            elif state == FILTERED:
+                stats.filtered += 1
+            else:
+                stats.errors += 1
+            if on_result is not None:
+                on_result(address, port, state)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, stats.total)))))
+    stats.finished = time.monotonic()
+    return stats
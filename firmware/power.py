@@ -0,0 +1,193 @@
+"""
+Idle power scheduler
+
+The backlight is most of what the LCD HAT draws, and the firmware used to
+keep it at full for as long as it ran. After dim_after seconds without a
+button press the backlight drops to dim_level percent; after blank_after
+it is switched off, frames stop being drawn and the /proc sampler is
+paused. The next press wakes everything up again. On a blank screen that
+press does nothing else, so it never triggers a menu action nobody could
+see; on a dimmed one it acts as usual.
+
+The backlight (GPIO13 on the Waveshare HAT) is dimmed with the SoC's PWM
+block through /sys/class/pwm when the pwm overlay routes a channel to the
+pin. Without it the backlight can only be switched on and off: software
+PWM would wake a thread on every edge, which costs more than it saves.
+
+The scheduler has no thread of its own: the UI loop calls tick() from a
+timer set to next_deadline().
+"""
+
+import os
+import time
+
+from firmware import metrics
+from firmware.pwm import PWM_CHANNELS
+
+ACTIVE = "active"
+DIM = "dim"
+BLANK = "blank"
+
+
+class Backlight:
+    """The LCD backlight pin: dimmable on a hardware PWM channel, otherwise on/off"""
+
+    def __init__(self, gpio, pin, pwm=None, frequency=1000.0):
+        self.gpio = gpio
+        self.pin = pin
+        self.pwm = pwm
+        self.frequency = frequency
+        self.level = None
+        if pwm is None:
+            gpio.setup(pin, gpio.OUT)
+
+    @classmethod
+    def open(cls, backend, pin, chip=0, frequency=1000.0):
+        """Use hardware PWM on pin when available, else plain on/off"""
+        engine = None
+        if pin in PWM_CHANNELS:
+            try:
+                engine = backend.pwm_factory(pin, chip, fallback=False)
+            except OSError as e:
+                print(f"Backlight on GPIO{pin} is on/off only: {e}")
+        return cls(backend.gpio, pin, engine, frequency)
+
+    @property
+    def dimmable(self):
+        return self.pwm is not None
+
+    def set(self, level):
+        """Brightness in percent; 0 switches the backlight off"""
+        level = max(0.0, min(100.0, level))
+        if level == self.level:
+            return
+        if self.pwm is not None:
+            if level > 0:
+                self.pwm.set(self.frequency, level)
+            else:
+                self.pwm.stop()
+        else:
+            self.gpio.output(self.pin, self.gpio.HIGH if level > 0 else self.gpio.LOW)
+        self.level = level
+
+    def close(self):
+        if self.pwm is not None:
+            self.pwm.close()
+            self.pwm = None
+
+
+class IdleScheduler:
+    """Dims, then blanks the backlight after periods without input"""
+
+    def __init__(self, backlight, dim_after=60.0, blank_after=300.0, brightness=100.0,
+                 dim_level=10.0, on_blank=None, on_wake=None):
+        self.backlight = backlight
+        self.dim_after = dim_after          # seconds, 0 = never
+        self.blank_after = blank_after      # seconds, 0 = never
+        self.brightness = brightness
+        self.dim_level = dim_level
+        self.on_blank = on_blank
+        self.on_wake = on_wake
+        self.state = ACTIVE
+        self.last_input = time.monotonic()
+        self.changed_at = self.last_input
+        self.time_in = {ACTIVE: 0.0, DIM: 0.0, BLANK: 0.0}
+        self.wakes = 0
+        backlight.set(brightness)
+
+    @classmethod
+    def from_config(cls, config, backlight, on_blank=None, on_wake=None):
+        """Build the scheduler from [power], or return None when it is disabled"""
+        section = config["power"]
+        if not section.getboolean("enabled"):
+            return None
+        return cls(backlight,
+                   dim_after=section.getfloat("dim_after"),
+                   blank_after=section.getfloat("blank_after"),
+                   brightness=section.getfloat("brightness"),
+                   dim_level=section.getfloat("dim_level"),
+                   on_blank=on_blank, on_wake=on_wake)
+
+    @property
+    def blanked(self):
+        return self.state == BLANK
+
+    def due_state(self, now):
+        """The state idle time alone calls for at now"""
+        idle = now - self.last_input
+        if self.blank_after > 0 and idle >= self.blank_after:
+            return BLANK
+        # Dimming only when the backlight can be dimmed and before blanking
+        if self.dim_after > 0 and idle >= self.dim_after and self.backlight.dimmable:
+            return DIM
+        return ACTIVE
+
+    def next_deadline(self):
+        """Monotonic time of the next transition, or None"""
+        deadlines = []
+        if self.state == ACTIVE and self.dim_after > 0 and self.backlight.dimmable:
+            deadlines.append(self.last_input + self.dim_after)
+        if self.state != BLANK and self.blank_after > 0:
+            deadlines.append(self.last_input + self.blank_after)
+        return min(deadlines) if deadlines else None
+
+    def tick(self, now=None):
+        """Apply a transition that has come due; returns True if the state changed"""
+        now = time.monotonic() if now is None else now
+        state = self.due_state(now)
+        if state == self.state or state == ACTIVE:
+            return False    # only input() brightens the screen
+        self._enter(state, now)
+        return True
+
+    def input(self, now=None):
+        """Note a button press; returns True if it only woke a blanked display"""
+        now = time.monotonic() if now is None else now
+        self.last_input = now
+        woke = self.state == BLANK
+        if self.state != ACTIVE:
+            self._enter(ACTIVE, now)
+        return woke
+
+    def _enter(self, state, now):
+        previous = self.state
+        self.time_in[previous] += now - self.changed_at
+        self.changed_at = now
+        self.state = state
+        self.backlight.set({ACTIVE: self.brightness, DIM: self.dim_level, BLANK: 0.0}[state])
+        metrics.count(f"power.{state}")
+        if state == BLANK and self.on_blank is not None:
+            self.on_blank()
+        if previous == BLANK:
+            self.wakes += 1
+            if self.on_wake is not None:
+                self.on_wake()
+
+    def shares(self, now=None):
+        """Fraction of the time spent in each state so far"""
+        now = time.monotonic() if now is None else now
+        time_in = dict(self.time_in)
+        time_in[self.state] += now - self.changed_at
+        total = sum(time_in.values()) or 1.0
+        return {state: seconds / total for state, seconds in time_in.items()}
+
+
+def context_switches(task_dir="/proc/self/task", threads=None):
+    """Voluntary + involuntary context switches of this process's threads
+
+    Each time a sleeping thread is woken counts one, so the rate is the
+    process's wakeups per second. threads limits the sum to those native
+    thread ids.
+    """
+    total = 0
+    for tid in os.listdir(task_dir):
+        if threads is not None and int(tid) not in threads:
+            continue
+        try:
+            with open(os.path.join(task_dir, tid, "status"), "rb") as f:
+                for line in f:
+                    if line.startswith((b"voluntary_ctxt_switches", b"nonvoluntary_ctxt_switches")):
+                        total += int(line.split()[1])
+        except OSError:
+            continue    # the thread exited
+    return total
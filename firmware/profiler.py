@@ -0,0 +1,120 @@
+"""
+Sampling profiler
+
+cProfile only sees the thread that enables it, and the firmware's time is
+spread over the UI thread, the job workers, the edge thread and the
+background services. This profiler instead wakes every interval seconds,
+takes every thread's current stack from sys._current_frames() and counts
+identical stacks. Nothing is hooked into the profiled code, so the cost is
+one stack walk per thread per sample and nothing at all when idle.
+
+Captures are written in the folded-stack format ("thread;module:func;...
+count" per line) that flamegraph.pl and speedscope load directly.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def frame_name(frame):
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+def fold(frame, thread):
+    """thread;outermost:call;...;innermost:call for one stack"""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    names.append(thread)
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples all threads' stacks on a thread of its own for a fixed time"""
+
+    def __init__(self, directory, interval=0.01, on_done=None):
+        self.directory = directory
+        self.interval = interval
+        self.on_done = on_done      # (path or None, error or None), on the profiler thread
+        self.stacks = Counter()
+        self.samples = 0
+        self.cpu_time = 0.0
+        self.path = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds):
+        """Sample for seconds (or until stop()); returns False if already running"""
+        if self.running:
+            return False
+        self.stacks = Counter()
+        self.samples = 0
+        self.cpu_time = 0.0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(seconds,),
+                                        name="blackhat-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """End the capture early; it is still written out"""
+        self._stop.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, seconds):
+        deadline = time.monotonic() + seconds
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            started = time.thread_time()
+            self.sample()
+            self.cpu_time += time.thread_time() - started
+            self._stop.wait(self.interval)
+        try:
+            self.path = self.write()
+            error = None
+        except OSError as e:
+            self.path, error = None, str(e)
+        print(f"[profile] {self.samples} samples, {self.cpu_time * 1000:.0f} ms CPU, "
+              f"{self.path or error}")
+        for line in self.top():
+            print(f"[profile] {line}")
+        if self.on_done is not None:
+            self.on_done(self.path, error)
+
+    def sample(self):
+        """Count the current stack of every thread but this one"""
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != own:
+                self.stacks[fold(frame, names.get(ident, str(ident)))] += 1
+        self.samples += 1
+
+    def top(self, limit=10):
+        """The functions most often on top of a stack, as "share% module:func" lines"""
+        leaves = Counter()
+        for stack, n in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += n
+        total = sum(leaves.values()) or 1
+        return [f"{100 * n / total:5.1f}% {name}" for name, n in leaves.most_common(limit)]
+
+    def write(self):
+        """Write the folded stacks to a timestamped file; returns its path"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, time.strftime("profile-%Y%m%d-%H%M%S.folded"))
+        with open(path, "w") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        return path
@@ -0,0 +1,224 @@
+"""
+PWM engine
+
+GPIO12/13/18/19 can be driven by the SoC's PWM block through the kernel's
+/sys/class/pwm interface (the pwm or pwm-2chan overlay routes a channel to
+the pin), so edges are timed in hardware. Other pins, or a Pi without the
+overlay, fall back to RPi.GPIO's software PWM.
+
+Sweeps and presets are precomputed (seconds, frequency, duty) steps. Only
+the step changes go through Python, at absolute deadlines; the waveform
+in between runs in hardware.
+"""
+
+import math
+import os
+import time
+
+PWM_ROOT = "/sys/class/pwm"
+
+# BCM pin -> channel of the PWM block on pwmchip0 (PWM0_0 on 12/18, PWM0_1 on 13/19)
+PWM_CHANNELS = {12: 0, 13: 1, 18: 0, 19: 1}
+
+
+class SysfsPwm:
+    """One hardware channel under /sys/class/pwm/pwmchipN"""
+
+    hardware = True
+
+    def __init__(self, root=PWM_ROOT, chip=0, channel=0, export_timeout=1.0):
+        self.export_timeout = export_timeout
+        self.chip_dir = os.path.join(root, f"pwmchip{chip}")
+        self.channel = channel
+        self.path = os.path.join(self.chip_dir, f"pwm{channel}")
+        self.period = None
+        self.duty_cycle = None
+        self.enabled = False
+        self.exported = False
+        if not os.path.isdir(self.chip_dir):
+            raise OSError(f"No {self.chip_dir} (is the pwm overlay enabled?)")
+        if not os.path.isdir(self.path):
+            self._write_file(os.path.join(self.chip_dir, "export"), channel)
+            self.exported = True
+            # udev fixes up permissions after the directory appears
+            self._wait(lambda: os.access(os.path.join(self.path, "period"), os.W_OK),
+                       "did not appear after export")
+
+    def _wait(self, ready, failure):
+        deadline = time.monotonic() + self.export_timeout
+        while not ready():
+            if time.monotonic() > deadline:
+                raise OSError(f"{self.path} {failure}")
+            time.sleep(0.01)
+
+    @staticmethod
+    def _write_file(path, value):
+        fd = os.open(path, os.O_WRONLY | os.O_TRUNC)
+        try:
+            os.write(fd, f"{value}\n".encode())
+        finally:
+            os.close(fd)
+
+    def _write(self, name, value):
+        self._write_file(os.path.join(self.path, name), value)
+
+    def set(self, frequency, duty):
+        """Output frequency Hz at duty percent, enabling the channel if needed"""
+        period = int(round(1e9 / frequency))
+        duty_cycle = int(round(period * max(0.0, min(100.0, duty)) / 100))
+        # The kernel rejects a duty cycle longer than the period at every step
+        if self.duty_cycle is not None and duty_cycle != self.duty_cycle and period < self.duty_cycle:
+            self._write("duty_cycle", duty_cycle)
+            self.duty_cycle = duty_cycle
+        if period != self.period:
+            self._write("period", period)
+            self.period = period
+        if duty_cycle != self.duty_cycle:
+            self._write("duty_cycle", duty_cycle)
+            self.duty_cycle = duty_cycle
+        if not self.enabled:
+            self._write("enable", 1)
+            self.enabled = True
+
+    def stop(self):
+        if self.enabled:
+            self._write("enable", 0)
+            self.enabled = False
+
+    def close(self):
+        try:
+            self.stop()
+        finally:
+            if self.exported:
+                self._write_file(os.path.join(self.chip_dir, "unexport"), self.channel)
+                self.exported = False
+                self._wait(lambda: not os.path.isdir(self.path), "still there after unexport")
+
+
+class SoftwarePwm:
+    """RPi.GPIO software PWM behind the SysfsPwm interface"""
+
+    hardware = False
+
+    def __init__(self, gpio, pin):
+        self.gpio = gpio
+        self.pin = pin
+        self.frequency = None
+        self.duty = None
+        self._pwm = None
+
+    def set(self, frequency, duty):
+        duty = max(0.0, min(100.0, duty))
+        if self._pwm is None:
+            self.gpio.setup(self.pin, self.gpio.OUT)
+            self._pwm = self.gpio.PWM(self.pin, frequency)
+            self._pwm.start(duty)
+        else:
+            if frequency != self.frequency:
+                self._pwm.ChangeFrequency(frequency)
+            if duty != self.duty:
+                self._pwm.ChangeDutyCycle(duty)
+        self.frequency = frequency
+        self.duty = duty
+
+    def stop(self):
+        if self._pwm is not None:
+            self._pwm.stop()
+            self._pwm = None
+            self.frequency = self.duty = None
+
+    def close(self):
+        self.stop()
+
+
+def open_pwm(pin, gpio, root=PWM_ROOT, chip=0, fallback=True):
+    """Return a SysfsPwm for pin when it has a hardware channel, else a SoftwarePwm
+
+    With fallback off, OSError is raised instead of falling back.
+    """
+    channel = PWM_CHANNELS.get(pin)
+    if channel is None and not fallback:
+        raise OSError(f"GPIO{pin} has no hardware PWM channel")
+    if channel is not None:
+        try:
+            return SysfsPwm(root, chip, channel)
+        except OSError as e:
+            if not fallback:
+                raise
+            print(f"Hardware PWM unavailable on GPIO{pin}, using software PWM: {e}")
+    return SoftwarePwm(gpio, pin)
+
+
+def ramp(frequency=1000.0):
+    """The old demo: duty 0-100% in 10% steps of 0.1s"""
+    return [(0.1, frequency, duty) for duty in range(0, 101, 10)]
+
+
+def breathe(frequency=1000.0, period=2.0, rate=50):
+    """Duty follows a raised cosine, 0-100-0% every period seconds"""
+    count = int(period * rate)
+    return [(1.0 / rate, frequency, 50.0 - 50.0 * math.cos(2 * math.pi * i / count))
+            for i in range(count)]
+
+
+def sweep(low=100.0, high=10000.0, seconds=5.0, rate=50, duty=50.0):
+    """Logarithmic frequency sweep from low to high Hz at a fixed duty"""
+    count = int(seconds * rate)
+    return [(1.0 / rate, low * (high / low) ** (i / (count - 1)), duty) for i in range(count)]
+
+
+def servo(seconds=4.0, rate=50):
+    """50 Hz hobby-servo pulses swinging 1.0-2.0-1.0 ms"""
+    count = int(seconds * rate)
+    return [(1.0 / rate, 50.0, 5.0 + 2.5 * (1 - math.cos(2 * math.pi * i / count)))
+            for i in range(count)]
+
+
+def scale(note=0.3):
+    """C major scale C4-C5 at 50% duty, for a piezo buzzer"""
+    return [(note, 261.63 * 2 ** (semitone / 12), 50.0)
+            for semitone in (0, 2, 4, 5, 7, 9, 11, 12)]
+
+
+# name -> steps(frequency)
+PRESETS = {
+    "ramp": ramp,
+    "breathe": breathe,
+    "sweep": lambda frequency: sweep(),
+    "servo": lambda frequency: servo(),
+    "scale": lambda frequency: scale(),
+}
+
+
+def preset_steps(name, frequency=1000.0):
+    """Return the (seconds, frequency, duty) steps of a preset"""
+    try:
+        return PRESETS[name](frequency)
+    except KeyError:
+        raise ValueError(f"Unknown PWM preset {name!r}, expected one of {', '.join(PRESETS)}") from None
+
+
+def play(engine, steps, duration=None, sleep=time.sleep, on_step=None):
+    """Apply steps at absolute deadlines, repeating them until duration runs out
+
+    Without a duration the steps are played once. Returns the number of
+    steps applied; on_step(elapsed) is called after each one.
+    """
+    if not steps:
+        return 0
+    started = deadline = time.monotonic()
+    applied = 0
+    while True:
+        for seconds, frequency, duty in steps:
+            if duration is not None and deadline - started >= duration:
+                return applied
+            engine.set(frequency, duty)
+            applied += 1
+            if on_step is not None:
+                on_step(time.monotonic() - started)
+            deadline += seconds
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                sleep(delay)
+        if duration is None:
+            return applied
@@ -0,0 +1,376 @@
+"""
+Render cache for the BlackHat LCD UI
+
+Fonts are loaded once per process, menu lines are kept as pre-rendered
+strips and complete frames are cached with LRU eviction, so redrawing a
+screen that has been seen before is a dictionary lookup.
+"""
+
+from collections import OrderedDict
+from PIL import Image, ImageDraw, ImageFont
+
+FONT_BOLD = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+FONT_REGULAR = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+
+# Menu layout (pixels)
+MENU_START_Y = 50
+MENU_ROW_HEIGHT = 25
+STATUS_BAR_Y = 220
+
+# Sparkline screens
+SPARK_TOP = 30
+SPARK_LEFT = 48
+SPARK_VALUE_WIDTH = 76
+
+# Results viewer
+RESULTS_TOP = 32
+RESULTS_ROW_HEIGHT = 17
+RESULTS_MARGIN = 4
+RESULTS_INDENT = 12
+
+# Metrics overlay: one line in the top-right corner
+METRICS_BAND_HEIGHT = 16
+
+COLOR_BG = (0, 0, 0)
+COLOR_TITLE = (0, 255, 255)
+COLOR_ITEM = (255, 255, 255)
+COLOR_SELECTED = (255, 255, 0)
+COLOR_HIGHLIGHT = (64, 64, 64)
+COLOR_DIM = (128, 128, 128)
+COLOR_TRACE = (0, 255, 0)
+
+MESSAGE_COLORS = {
+    "status": (255, 255, 0),
+    "success": (0, 255, 0),
+    "error": (255, 0, 0),
+    "warning": (255, 165, 0),
+}
+
+_fonts = {}
+
+
+def load_font(path, size):
+    """Load a TrueType font, once per process"""
+    key = (path, size)
+    font = _fonts.get(key)
+    if font is None:
+        try:
+            font = ImageFont.truetype(path, size)
+        except (OSError, IOError):
+            font = ImageFont.load_default()
+        _fonts[key] = font
+    return font
+
+
+class RenderCache:
+    """Pre-rendered glyph strips and LRU cache of complete frames"""
+
+    def __init__(self, width=240, height=240, max_frames=24, max_rows=512, max_wrapped=4096):
+        self.width = width
+        self.height = height
+        self.max_frames = max_frames
+        self.max_rows = max_rows
+        self.max_wrapped = max_wrapped
+        self.font_title = load_font(FONT_BOLD, 18)
+        self.font_item = load_font(FONT_REGULAR, 14)
+        self.font_large = load_font(FONT_BOLD, 24)
+        self.font_small = load_font(FONT_REGULAR, 16)
+        self._frames = OrderedDict()
+        self._strips = {}
+        self._chrome = {}
+        self._rows = OrderedDict()
+        self._wrapped = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        """Drop every cached strip and frame"""
+        self._frames.clear()
+        self._strips.clear()
+        self._chrome.clear()
+        self._rows.clear()
+        self._wrapped.clear()
+
+    def _get_frame(self, key):
+        frame = self._frames.get(key)
+        if frame is not None:
+            self._frames.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+        return frame
+
+    def _put_frame(self, key, frame):
+        self._frames[key] = frame
+        self._frames.move_to_end(key)
+        while len(self._frames) > self.max_frames:
+            self._frames.popitem(last=False)
+        return frame
+
+    def blank(self):
+        """Return a new black frame"""
+        return Image.new('RGB', (self.width, self.height), color=COLOR_BG)
+
+    def menu_strip(self, text, selected):
+        """Return the rendered strip for one menu line"""
+        key = (text, selected)
+        strip = self._strips.get(key)
+        if strip is None:
+            strip = Image.new('RGB', (self.width, MENU_ROW_HEIGHT), color=COLOR_BG)
+            draw = ImageDraw.Draw(strip)
+            if selected:
+                draw.rectangle([(10, 0), (230, 20)], fill=COLOR_HIGHLIGHT)
+                draw.text((20, 10), f"> {text}", fill=COLOR_SELECTED,
+                          font=self.font_item, anchor="lm")
+            else:
+                draw.text((20, 10), f"  {text}", fill=COLOR_ITEM,
+                          font=self.font_item, anchor="lm")
+            self._strips[key] = strip
+        return strip
+
+    def menu_chrome(self, name, title):
+        """Return the title and status bar background for a menu"""
+        chrome = self._chrome.get(name)
+        if chrome is None:
+            chrome = self.blank()
+            draw = ImageDraw.Draw(chrome)
+            draw.text((self.width // 2, 20), title, fill=COLOR_TITLE,
+                      font=self.font_title, anchor="mm")
+            draw.line([(0, STATUS_BAR_Y), (self.width, STATUS_BAR_Y)], fill=COLOR_DIM)
+            draw.text((self.width // 2, 230), "Select: Enter | Back: ESC",
+                      fill=COLOR_DIM, font=self.font_item, anchor="mm")
+            self._chrome[name] = chrome
+        return chrome
+
+    def menu_row_box(self, row):
+        """Return the (x0, y0, x1, y1) box covered by a menu row"""
+        y0 = MENU_START_Y + row * MENU_ROW_HEIGHT - 10
+        return (0, y0, self.width, y0 + MENU_ROW_HEIGHT)
+
+    def menu_frame(self, name, index, menu):
+        """Return the full frame for a menu with the given item selected"""
+        key = ("menu", name, index)
+        frame = self._get_frame(key)
+        if frame is not None:
+            return frame
+
+        frame = self.menu_chrome(name, menu["title"]).copy()
+        for i, (item_text, _) in enumerate(menu["items"]):
+            box = self.menu_row_box(i)
+            frame.paste(self.menu_strip(item_text, i == index), box[:2])
+        return self._put_frame(key, frame)
+
+    def status_overlay(self, frame, text, progress=None, kind="status"):
+        """Return a copy of frame with a job status band over the status bar"""
+        color = MESSAGE_COLORS[kind]
+        frame = frame.copy()
+        draw = ImageDraw.Draw(frame)
+        draw.rectangle([(0, STATUS_BAR_Y), (self.width, self.height)], fill=COLOR_BG)
+        draw.line([(0, STATUS_BAR_Y), (self.width, STATUS_BAR_Y)], fill=color)
+        if progress is not None:
+            draw.rectangle([(0, self.height - 3), (int(self.width * progress), self.height)],
+                           fill=color)
+        draw.text((self.width // 2, 230), text, fill=color, font=self.font_item, anchor="mm")
+        return frame
+
+    def metrics_overlay(self, frame, text):
+        """Return a copy of frame with a one-line FPS/latency readout in the top-right corner"""
+        frame = frame.copy()
+        draw = ImageDraw.Draw(frame)
+        left = self.width - int(self.font_item.getlength(text)) - 2 * RESULTS_MARGIN
+        draw.rectangle([(left, 0), (self.width, METRICS_BAND_HEIGHT)], fill=COLOR_BG)
+        draw.text((self.width - RESULTS_MARGIN, 1), text, fill=COLOR_TRACE, font=self.font_item, anchor="ra")
+        return frame
+
+    def sparkline_frame(self, title, rows, footer=""):
+        """Return a frame with one labelled sparkline per row
+
+        rows are (label, value_text, values, low, high, color); values are
+        drawn oldest to newest, scaled between low and high.
+        """
+        frame = self.blank()
+        draw = ImageDraw.Draw(frame)
+        draw.text((self.width // 2, 15), title, fill=COLOR_TITLE,
+                  font=self.font_title, anchor="mm")
+        top = SPARK_TOP
+        height = (STATUS_BAR_Y - SPARK_TOP) // max(1, len(rows))
+        for label, text, values, low, high, color in rows:
+            draw.text((4, top + 2), label, fill=COLOR_DIM, font=self.font_item, anchor="la")
+            draw.text((self.width - 4, top + 2), text, fill=color, font=self.font_item, anchor="ra")
+            self._sparkline(draw, (SPARK_LEFT, top + 2, self.width - SPARK_VALUE_WIDTH, top + height - 4),
+                            values, low, high, color)
+            top += height
+        draw.line([(0, STATUS_BAR_Y), (self.width, STATUS_BAR_Y)], fill=COLOR_DIM)
+        if footer:
+            draw.text((self.width // 2, 230), footer, fill=COLOR_DIM, font=self.font_item, anchor="mm")
+        return frame
+
+    @staticmethod
+    def _sparkline(draw, box, values, low, high, color):
+        x0, y0, x1, y1 = box
+        draw.line([(x0, y1), (x1, y1)], fill=COLOR_HIGHLIGHT)
+        values = values[-(x1 - x0):]
+        if not values:
+            return
+        high = max(high, max(values))
+        span = (high - low) or 1.0
+        step = (x1 - x0) / max(1, len(values) - 1)
+        points = [(x0 + i * step, y1 - (min(max(v, low), high) - low) / span * (y1 - y0))
+                  for i, v in enumerate(values)]
+        if len(points) == 1:
+            draw.point(points, fill=color)
+        else:
+            draw.line(points, fill=color)
+
+    @property
+    def timing_width(self):
+        """Pixel columns per lane of a timing_frame()"""
+        return self.width - SPARK_LEFT - 4
+
+    def timing_frame(self, title, lanes, footer=""):
+        """Return a logic-analyzer timing diagram, one lane per line
+
+        lanes are (label, low, high) with one value per pixel column, newest
+        on the right; a column where low != high is drawn as an edge.
+        """
+        frame = self.blank()
+        draw = ImageDraw.Draw(frame)
+        draw.text((self.width // 2, 15), title, fill=COLOR_TITLE,
+                  font=self.font_title, anchor="mm")
+        top = SPARK_TOP
+        height = (STATUS_BAR_Y - SPARK_TOP) // max(1, len(lanes))
+        right = self.width - 4
+        for label, low, high in lanes:
+            draw.text((4, top + height // 2), label, fill=COLOR_DIM, font=self.font_item, anchor="lm")
+            levels = (top + height - 6, top + 4)
+            x = right - len(low) + 1
+            points = []
+            for lo, hi in zip(low.tolist(), high.tolist()):
+                if lo == hi:
+                    points.append((x, levels[lo]))
+                else:
+                    first = points[-1][1] if points else levels[0]
+                    points += [(x, first), (x, levels[1] if first == levels[0] else levels[0])]
+                x += 1
+            if len(points) > 1:
+                draw.line(points, fill=COLOR_TRACE)
+            top += height
+        draw.line([(0, STATUS_BAR_Y), (self.width, STATUS_BAR_Y)], fill=COLOR_DIM)
+        if footer:
+            draw.text((self.width // 2, 230), footer, fill=COLOR_DIM, font=self.font_item, anchor="mm")
+        return frame
+
+    @property
+    def results_rows(self):
+        """Text lines that fit on one results_frame()"""
+        return (STATUS_BAR_Y - RESULTS_TOP) // RESULTS_ROW_HEIGHT
+
+    def wrap(self, text):
+        """Split text into lines that fit the panel, measured once per text
+
+        Returns a tuple; lines after the first are drawn indented by
+        RESULTS_INDENT.
+        """
+        lines = self._wrapped.get(text)
+        if lines is not None:
+            self._wrapped.move_to_end(text)
+            return lines
+
+        font = self.font_item
+        width = self.width - 2 * RESULTS_MARGIN
+        space = font.getlength(" ")
+        lines = []
+        current, used = [], 0.0
+        for word in text.split(" "):
+            size = font.getlength(word)
+            room = width - (RESULTS_INDENT if lines else 0)
+            if current and used + space + size <= room:
+                current.append(word)
+                used += space + size
+                continue
+            if current:
+                lines.append(" ".join(current))
+                room = width - RESULTS_INDENT
+            # A word wider than a whole line is cut where it stops fitting
+            while size > room:
+                cut = self._fit(word, room)
+                lines.append(word[:cut])
+                word = word[cut:]
+                size = font.getlength(word)
+                room = width - RESULTS_INDENT
+            current, used = [word], size
+        lines.append(" ".join(current))
+
+        lines = tuple(lines)
+        self._wrapped[text] = lines
+        while len(self._wrapped) > self.max_wrapped:
+            self._wrapped.popitem(last=False)
+        return lines
+
+    def _fit(self, word, room):
+        # Longest prefix of word (at least one character) no wider than room
+        low, high = 1, len(word)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.font_item.getlength(word[:middle]) <= room:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def results_strip(self, text, continued=False):
+        """Return the rendered strip for one line of a results list"""
+        key = (text, continued)
+        strip = self._rows.get(key)
+        if strip is not None:
+            self._rows.move_to_end(key)
+            return strip
+
+        strip = Image.new('RGB', (self.width, RESULTS_ROW_HEIGHT), color=COLOR_BG)
+        draw = ImageDraw.Draw(strip)
+        x = RESULTS_MARGIN + (RESULTS_INDENT if continued else 0)
+        draw.text((x, RESULTS_ROW_HEIGHT // 2), text, fill=COLOR_ITEM,
+                  font=self.font_item, anchor="lm")
+        self._rows[key] = strip
+        while len(self._rows) > self.max_rows:
+            self._rows.popitem(last=False)
+        return strip
+
+    def results_frame(self, title, lines, footer=""):
+        """Return a results page; lines are (text, continued) from the top"""
+        chrome = self._chrome.get(("results", title))
+        if chrome is None:
+            chrome = self.blank()
+            draw = ImageDraw.Draw(chrome)
+            draw.text((self.width // 2, 15), title, fill=COLOR_TITLE,
+                      font=self.font_title, anchor="mm")
+            draw.line([(0, STATUS_BAR_Y), (self.width, STATUS_BAR_Y)], fill=COLOR_DIM)
+            self._chrome[("results", title)] = chrome
+
+        frame = chrome.copy()
+        for row, (text, continued) in enumerate(lines):
+            frame.paste(self.results_strip(text, continued),
+                        (0, RESULTS_TOP + row * RESULTS_ROW_HEIGHT))
+        if footer:
+            draw = ImageDraw.Draw(frame)
+            draw.text((self.width // 2, 230), footer, fill=COLOR_DIM, font=self.font_item, anchor="mm")
+        return frame
+
+    def splash_frame(self, progress=0.5):
+        """Return the boot splash with the loading bar at progress (0-1)"""
+        filled = int(round(max(0.0, min(1.0, progress)) * 20))
+        key = ("splash", filled)
+        frame = self._get_frame(key)
+        if frame is not None:
+            return frame
+
+        frame = self.blank()
+        draw = ImageDraw.Draw(frame)
+        draw.text((120, 80), "BlackHat", fill=(0, 255, 0), font=self.font_large, anchor="mm")
+        draw.text((120, 110), "Educational Firmware", fill=(255, 255, 255),
+                  font=self.font_small, anchor="mm")
+        draw.text((120, 130), "v1.0", fill=COLOR_DIM, font=self.font_small, anchor="mm")
+        for i in range(20):
+            draw.rectangle([(60 + i*6, 160), (60 + i*6 + 4, 170)],
+                           fill=(0, 255, 0) if i < filled else COLOR_DIM)
+        return self._put_frame(key, frame)
@@ -0,0 +1,225 @@
+"""
+Streaming runner for external tools (iwlist, hcitool, i2cdetect, ...)
+
+Commands run in their own process group with a timeout. Output is yielded
+line by line as it arrives so parsers can show results before the tool
+exits, and the whole group is killed on timeout or when the job that
+started it is cancelled. The tail of stderr is kept, so a tool that exits
+non-zero raises CommandFailed with its last words instead of looking like
+a run with no results.
+"""
+
+import os
+import selectors
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+
+from firmware import jobs
+from firmware import metrics
+
+READ_SIZE = 4096
+# Bytes of stderr kept for error messages
+STDERR_TAIL = 1024
+
+
+class CommandTimeout(Exception):
+    """The command ran past its timeout and was killed"""
+
+    def __init__(self, argv, timeout):
+        super().__init__(f"{argv[0]} timed out after {timeout:g}s")
+        self.argv = argv
+        self.timeout = timeout
+
+
+class CommandFailed(subprocess.CalledProcessError):
+    """The command exited non-zero; stderr holds the tail of what it printed there"""
+
+    def __init__(self, argv, returncode, stderr=""):
+        super().__init__(returncode, argv, stderr=stderr)
+        self.argv = argv
+
+    def __str__(self):
+        lines = self.stderr.strip().splitlines()
+        reason = f": {lines[-1]}" if lines else ""
+        return f"{os.path.basename(self.argv[0])} exited with {self.returncode}{reason}"
+
+
+class CommandStream:
+    """One command invocation; iterate it to get stdout lines as they arrive"""
+
+    def __init__(self, argv, timeout, job=None, on_finish=None, check=True):
+        self.argv = list(argv)
+        self.timeout = timeout
+        self.job = job
+        self.check = check
+        self.returncode = None
+        self.wall_time = 0.0
+        self.bytes_read = 0
+        self.lines_read = 0
+        self.timed_out = False
+        self.cancelled = False
+        self.stderr_tail = b""
+        self._on_finish = on_finish
+        self._proc = None
+        self._wake = None
+        self._wake_lock = threading.Lock()
+
+    def __iter__(self):
+        start = time.monotonic()
+        deadline = start + self.timeout if self.timeout else None
+        self._proc = subprocess.Popen(self.argv, stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE, stdin=subprocess.DEVNULL,
+                                      start_new_session=True)
+        # Written by _cancel() so a cancel wakes the select below
+        wake_read, self._wake = os.pipe()
+        if self.job is not None:
+            self.job.on_cancel(self._cancel)
+
+        out = self._proc.stdout.fileno()
+        err = self._proc.stderr.fileno()
+        selector = selectors.DefaultSelector()
+        for fd in (out, err, wake_read):
+            selector.register(fd, selectors.EVENT_READ)
+        pending = b""
+        try:
+            while len(selector.get_map()) > 1:
+                wait = None
+                if deadline is not None:
+                    wait = deadline - time.monotonic()
+                    if wait <= 0:
+                        self.timed_out = True
+                        self.kill()
+                        raise CommandTimeout(self.argv, self.timeout)
+                for key, _ in selector.select(wait):
+                    fd = key.fd
+                    if fd == wake_read:
+                        # Cancelled: the signal went out already, the waiting happens here
+                        self.kill()
+                        selector.unregister(out)
+                        selector.unregister(err)
+                        break
+                    chunk = os.read(fd, READ_SIZE)
+                    if not chunk:
+                        selector.unregister(fd)
+                    elif fd == err:
+                        self.stderr_tail = (self.stderr_tail + chunk)[-STDERR_TAIL:]
+                    else:
+                        self.bytes_read += len(chunk)
+                        pending += chunk
+                        *lines, pending = pending.split(b"\n")
+                        for line in lines:
+                            self.lines_read += 1
+                            yield line.decode("utf-8", errors="replace")
+            if pending and not self.cancelled:
+                self.lines_read += 1
+                yield pending.decode("utf-8", errors="replace")
+            if not self.cancelled:
+                self.returncode = self._wait(deadline)
+        finally:
+            selector.close()
+            if self._proc.poll() is None:
+                self.kill()
+            self._proc.stdout.close()
+            self._proc.stderr.close()
+            with self._wake_lock:
+                os.close(self._wake)
+                self._wake = None
+            os.close(wake_read)
+            self.wall_time = time.monotonic() - start
+            if self.returncode is None:
+                self.returncode = self._proc.returncode
+            if self._on_finish is not None:
+                self._on_finish(self)
+
+        if self.cancelled and self.job is not None:
+            self.job.check()
+        if self.check and self.returncode != 0:
+            raise CommandFailed(self.argv, self.returncode, self.stderr)
+
+    @property
+    def stderr(self):
+        """The tail of the command's stderr as text"""
+        return self.stderr_tail.decode("utf-8", errors="replace")
+
+    def _wait(self, deadline):
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return self._proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.timed_out = True
+            self.kill()
+            raise CommandTimeout(self.argv, self.timeout)
+
+    def _cancel(self):
+        """Job cancelled, usually on the UI thread: signal the group without waiting"""
+        self.cancelled = True
+        proc = self._proc
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        with self._wake_lock:
+            if self._wake is not None:
+                os.write(self._wake, b"\0")
+
+    def kill(self, grace=0.5):
+        """Terminate the command's whole process group, waiting up to grace before SIGKILL"""
+        proc = self._proc
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+            proc.wait(grace)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+        except ProcessLookupError:
+            pass
+
+    def summary(self):
+        state = "timeout" if self.timed_out else "cancelled" if self.cancelled else f"rc={self.returncode}"
+        summary = (f"{' '.join(self.argv)}: {self.wall_time:.2f}s, "
+                   f"{self.bytes_read} bytes, {self.lines_read} lines, {state}")
+        if self.returncode and self.stderr.strip():
+            summary += f" ({self.stderr.strip().splitlines()[-1]})"
+        return summary
+
+
+class CommandRunner:
+    """Shared entry point for running external tools"""
+
+    def __init__(self, default_timeout=30.0, history=32, verbose=True):
+        self.default_timeout = default_timeout
+        self.history = deque(maxlen=history)
+        self.verbose = verbose
+
+    def stream(self, argv, timeout=None, check=True):
+        """Return a CommandStream yielding stdout lines of argv
+
+        The command is tied to the current job, if any, so cancelling the
+        job kills it. With check, a non-zero exit raises CommandFailed once
+        the output has been read.
+        """
+        if timeout is None:
+            timeout = self.default_timeout
+        return CommandStream(argv, timeout, job=jobs.current_job(), on_finish=self._record,
+                             check=check)
+
+    def run(self, argv, timeout=None, check=True):
+        """Run argv to completion and return (stdout lines, CommandStream)"""
+        stream = self.stream(argv, timeout, check)
+        return list(stream), stream
+
+    def _record(self, stream):
+        self.history.append(stream)
+        name = os.path.basename(stream.argv[0])
+        metrics.observe(f"command.{name}", stream.wall_time)
+        if stream.timed_out:
+            metrics.count(f"command.{name}.timeouts")
+        if self.verbose:
+            print(f"[cmd] {stream.summary()}")
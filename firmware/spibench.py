@@ -0,0 +1,122 @@
+"""
+SPI loopback benchmark
+
+Sweeps clock speeds and transfer sizes on a spidev device. Each point is
+measured twice from preallocated buffers: write-only with writebytes2()
+for raw throughput, then full-duplex with xfer3() for per-transfer latency
+and, with MOSI jumpered to MISO, data integrity. The fastest clock at
+which every slower point was also error-free is the safe maximum.
+"""
+
+import os
+import time
+
+import numpy as np
+
+
+def parse_list(spec):
+    """Parse "8000000,16000000" or "64, 4096" into a list of ints"""
+    return [int(float(item)) for item in spec.replace(" ", "").split(",") if item]
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    """Nearest-rank percentiles of samples, plus mean and max"""
+    if not len(samples):
+        return {}
+    ordered = np.sort(np.asarray(samples, dtype=np.float64))
+    result = {f"p{p}": float(ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))])
+              for p in points}
+    result["mean"] = float(ordered.mean())
+    result["max"] = float(ordered[-1])
+    return result
+
+
+def has_loopback(spi, size=64):
+    """True when a random pattern comes back on MISO unchanged"""
+    pattern = os.urandom(size)
+    return bytes(spi.xfer3(pattern)) == pattern
+
+
+def measure(spi, speed, size, duration=0.25, min_transfers=10, check=True):
+    """Measure one (speed, size) point; returns a result dict"""
+    spi.max_speed_hz = speed
+    tx = bytearray(os.urandom(size))
+    expected = np.frombuffer(tx, dtype=np.uint8)
+
+    transfers = 0
+    started = time.perf_counter()
+    while transfers < min_transfers or time.perf_counter() - started < duration / 2:
+        spi.writebytes2(tx)
+        transfers += 1
+    write_seconds = time.perf_counter() - started
+
+    latencies = np.zeros(max(min_transfers, 1024), dtype=np.int64)
+    count = errors = failed = 0
+    clock = time.perf_counter_ns
+    started = time.perf_counter()
+    while count < min_transfers or time.perf_counter() - started < duration / 2:
+        begin = clock()
+        rx = spi.xfer3(tx)
+        end = clock()
+        if count == len(latencies):
+            latencies = np.resize(latencies, count * 2)
+        latencies[count] = end - begin
+        count += 1
+        if check:
+            received = bytes(rx)
+            if received != tx:
+                failed += 1
+                errors += int(np.count_nonzero(np.frombuffer(received, dtype=np.uint8) != expected))
+    duplex_seconds = time.perf_counter() - started
+
+    latency = percentiles(latencies[:count] / 1000.0)
+    return {
+        "speed_hz": speed,
+        "size": size,
+        "write_mb_s": transfers * size / write_seconds / 1e6,
+        "duplex_mb_s": count * size / duplex_seconds / 1e6,
+        "transfers": count,
+        "latency_us": latency,
+        "failed_transfers": failed if check else None,
+        "error_rate": errors / (count * size) if check else None,
+    }
+
+
+def safe_max_speed(points):
+    """Fastest speed with no errors at it or any slower speed, or None"""
+    safe = None
+    for speed in sorted({point["speed_hz"] for point in points}):
+        at_speed = [point for point in points if point["speed_hz"] == speed]
+        if any(point["error_rate"] for point in at_speed):
+            break
+        safe = speed
+    return safe
+
+
+def sweep(spi, speeds, sizes, duration=0.25, on_point=None, should_stop=None):
+    """Run measure() over every speed and size; returns the report dict"""
+    spi.max_speed_hz = min(speeds)
+    loopback = has_loopback(spi)
+    grid = [(speed, size) for speed in speeds for size in sizes]
+    points = []
+    for speed, size in grid:
+        if should_stop is not None and should_stop():
+            break
+        point = measure(spi, speed, size, duration, check=loopback)
+        points.append(point)
+        if on_point is not None:
+            on_point(point, len(points) / len(grid))
+    return {
+        "loopback": loopback,
+        "safe_max_hz": safe_max_speed(points) if loopback else None,
+        "points": points,
+    }
+
+
+def point_label(point):
+    """One line per point for the results screen"""
+    text = (f"{point['speed_hz'] / 1e6:g} MHz {point['size']}B: "
+            f"{point['write_mb_s']:.2f} MB/s, p99 {point['latency_us'].get('p99', 0):.0f}us")
+    if point["error_rate"] is not None:
+        text += f", {point['error_rate'] * 100:.2g}% err" if point["error_rate"] else ", ok"
+    return text
@@ -0,0 +1,355 @@
+"""
+Result store
+
+Scan results (Wi-Fi networks, Bluetooth devices, hosts, open ports, I2C
+devices) and capture-file metadata are kept in a SQLite database in WAL
+mode. record() only appends to an in-memory batch; a writer thread inserts
+the batch in one transaction flush_interval seconds after its first row,
+or sooner once flush_rows rows are waiting, so the SD card sees a few
+large writes instead of one fsync per row and no tool ever waits on the
+disk. With nothing pending the writer sleeps until the next prune.
+
+Alongside the raw rows, a sightings table keeps first seen, last seen and
+a count per (kind, identifier), upserted with each batch. lookup() answers
+"seen before?" from that table by primary key, merged with rows still in
+the batch, so scan views can show it inline.
+
+Retention is bounded twice: rows older than retention_days are deleted
+and the results table is capped at max_rows, so the file stops growing
+once freed pages are being reused.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    identifier TEXT NOT NULL,
+    label TEXT NOT NULL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS results_ts ON results (ts);
+CREATE INDEX IF NOT EXISTS results_identifier ON results (kind, identifier, ts);
+CREATE TABLE IF NOT EXISTS sightings (
+    kind TEXT NOT NULL,
+    identifier TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (kind, identifier)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sightings_last_seen ON sightings (last_seen);
+"""
+
+UPSERT_SIGHTING = """
+INSERT INTO sightings (kind, identifier, first_seen, last_seen, count) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (kind, identifier) DO UPDATE SET
+    first_seen = min(first_seen, excluded.first_seen),
+    last_seen = max(last_seen, excluded.last_seen),
+    count = count + excluded.count
+"""
+
+# SQLite limits host parameters per statement (999 before 3.32)
+LOOKUP_CHUNK = 500
+PRUNE_INTERVAL = 3600.0
+
+
+class Sighting:
+    """When an identifier was first and last recorded, and how often"""
+
+    __slots__ = ("first_seen", "last_seen", "count")
+
+    def __init__(self, first_seen, last_seen, count):
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.count = count
+
+    def merge(self, first_seen, last_seen, count):
+        self.first_seen = min(self.first_seen, first_seen)
+        self.last_seen = max(self.last_seen, last_seen)
+        self.count += count
+
+
+def ago(seconds):
+    """45 -> "45s", 7200 -> "2h" """
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{seconds // size:.0f}{unit}"
+    return f"{max(0, seconds):.0f}s"
+
+
+def seen_text(sighting, now=None):
+    """Short inline text for a scan row: "new" or "seen 4x, 2h ago" """
+    if sighting is None:
+        return "new"
+    now = time.time() if now is None else now
+    return f"seen {sighting.count}x, {ago(now - sighting.last_seen)} ago"
+
+
+def annotate(store, kind, rows, now=None):
+    """Record (identifier, label, data) rows; return the labels with seen-before text
+
+    The lookup runs before the rows are queued, so "new" means never
+    recorded before this scan. Without a store the labels come back as is.
+    """
+    if store is None:
+        return [label for _, label, _ in rows]
+    now = time.time() if now is None else now
+    seen = store.lookup(kind, [identifier for identifier, _, _ in rows])
+    store.record_many(kind, rows, now)
+    return [f"{label} ({seen_text(seen.get(identifier), now)})" for identifier, label, _ in rows]
+
+
+class ResultStore:
+    """Batched, indexed SQLite log of scan results with seen-before lookups"""
+
+    def __init__(self, path, flush_interval=5.0, flush_rows=500, retention_days=30.0,
+                 max_rows=200000, max_pending=20000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.retention = retention_days * 86400
+        self.max_rows = max_rows
+        self.max_pending = max_pending
+        self.rows_written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.last_error = None
+        self._pending = []
+        self._pending_since = None  # monotonic time the oldest pending row was queued
+        self._pending_seen = {}     # (kind, identifier) -> Sighting, not yet written
+        self._inflight_seen = {}    # the batch being written, still visible to lookup()
+        self._generation = 0        # batches finished (written or dropped)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._writer = None
+        self._reader = None
+        self._pruned_at = None
+        self._wake = threading.Event()
+        self._closing = False
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Build the store from [storage], or return None when it is disabled"""
+        section = config["storage"]
+        if not section.getboolean("enabled"):
+            return None
+        return cls(section["path"],
+                   flush_interval=section.getfloat("flush_interval"),
+                   flush_rows=section.getint("flush_rows"),
+                   retention_days=section.getfloat("retention_days"),
+                   max_rows=section.getint("max_rows"))
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="blackhat-store", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Write what is pending and close the database"""
+        self._closing = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(10.0)
+            self._thread = None
+        else:
+            self.flush()
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def record(self, kind, identifier, label="", data=None, now=None):
+        """Queue one result; never touches the disk"""
+        self.record_many(kind, [(identifier, label, data)], now)
+
+    def record_many(self, kind, rows, now=None):
+        """Queue (identifier, label, data) rows of one kind"""
+        now = time.time() if now is None else now
+        with self._lock:
+            for identifier, label, data in rows:
+                if len(self._pending) >= self.max_pending:
+                    self.dropped += 1
+                    continue
+                self._pending.append((now, kind, identifier, label,
+                                      json.dumps(data, separators=(",", ":")) if data else None))
+                seen = self._pending_seen.get((kind, identifier))
+                if seen is None:
+                    self._pending_seen[(kind, identifier)] = Sighting(now, now, 1)
+                else:
+                    seen.merge(now, now, 1)
+            started = self._pending_since is None and bool(self._pending)
+            if started:
+                self._pending_since = time.monotonic()
+            full = len(self._pending) >= self.flush_rows
+        if full or started:
+            # A new batch starts the flush clock; the writer may be asleep until the next prune
+            self._wake.set()
+
+    def lookup(self, kind, identifiers):
+        """Return {identifier: Sighting} for the identifiers recorded before"""
+        identifiers = list(dict.fromkeys(identifiers))
+        while True:
+            with self._lock:
+                generation = self._generation
+                unwritten = [(identifier, s.first_seen, s.last_seen, s.count)
+                             for batch in (self._inflight_seen, self._pending_seen)
+                             for identifier in identifiers
+                             for s in (batch.get((kind, identifier)),) if s is not None]
+            found = self._select(kind, identifiers)
+            with self._lock:
+                # A batch committed meanwhile would be counted twice or not at all
+                if self._generation == generation:
+                    break
+        for identifier, first_seen, last_seen, count in unwritten:
+            if identifier in found:
+                found[identifier].merge(first_seen, last_seen, count)
+            else:
+                found[identifier] = Sighting(first_seen, last_seen, count)
+        return found
+
+    def _select(self, kind, identifiers):
+        found = {}
+        try:
+            with self._read_lock:
+                reader = self._open_reader()
+                for start in range(0, len(identifiers), LOOKUP_CHUNK):
+                    chunk = identifiers[start:start + LOOKUP_CHUNK]
+                    query = ("SELECT identifier, first_seen, last_seen, count FROM sightings "
+                             f"WHERE kind = ? AND identifier IN ({','.join('?' * len(chunk))})")
+                    for identifier, first_seen, last_seen, count in reader.execute(query, [kind] + chunk):
+                        found[identifier] = Sighting(first_seen, last_seen, count)
+        except sqlite3.Error:
+            pass    # no database yet: only unwritten rows count
+        return found
+
+    def seen(self, kind, identifier):
+        """Return the Sighting of one identifier, or None"""
+        return self.lookup(kind, [identifier]).get(identifier)
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Commits append to the WAL; only checkpoints fsync
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA journal_size_limit=4194304")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _open_writer(self):
+        if self._writer is None:
+            self._writer = self._connect()
+            self._writer.executescript(SCHEMA)
+        return self._writer
+
+    def _open_reader(self):
+        if self._reader is None:
+            if not os.path.exists(self.path):
+                raise sqlite3.OperationalError(f"{self.path} does not exist yet")
+            self._reader = self._connect()
+            self._reader.execute("PRAGMA query_only=ON")
+        return self._reader
+
+    def flush(self):
+        """Write the pending batch in one transaction; returns rows written"""
+        with self._write_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+                self._pending_since = None
+                seen, self._pending_seen = self._pending_seen, {}
+                self._inflight_seen = seen
+            if not rows:
+                return 0
+            try:
+                conn = self._open_writer()
+                with conn:
+                    conn.executemany("INSERT INTO results (ts, kind, identifier, label, data) "
+                                     "VALUES (?, ?, ?, ?, ?)", rows)
+                    conn.executemany(UPSERT_SIGHTING, [
+                        (kind, identifier, s.first_seen, s.last_seen, s.count)
+                        for (kind, identifier), s in seen.items()])
+            except (sqlite3.Error, OSError) as e:
+                # A full or read-only card must not take the tools down with it
+                self.dropped += len(rows)
+                if str(e) != self.last_error:
+                    print(f"Result store: dropped {len(rows)} rows: {e}")
+                self.last_error = str(e)
+                return 0
+            finally:
+                with self._lock:
+                    self._inflight_seen = {}
+                    self._generation += 1
+        self.rows_written += len(rows)
+        self.batches += 1
+        return len(rows)
+
+    def prune(self, now=None):
+        """Apply the retention policy; returns rows deleted"""
+        now = time.time() if now is None else now
+        cutoff = now - self.retention
+        self._pruned_at = time.monotonic()
+        with self._write_lock:
+            try:
+                conn = self._open_writer()
+                with conn:
+                    deleted = conn.execute("DELETE FROM results WHERE ts < ?", (cutoff,)).rowcount
+                    deleted += conn.execute(
+                        "DELETE FROM results WHERE id <= (SELECT id FROM results "
+                        "ORDER BY id DESC LIMIT 1 OFFSET ?)", (self.max_rows,)).rowcount
+                    conn.execute("DELETE FROM sightings WHERE last_seen < ?", (cutoff,))
+                    conn.execute(
+                        "DELETE FROM sightings WHERE last_seen <= (SELECT last_seen FROM sightings "
+                        "ORDER BY last_seen DESC LIMIT 1 OFFSET ?)", (self.max_rows,))
+            except (sqlite3.Error, OSError) as e:
+                self.last_error = str(e)
+                print(f"Result store: prune failed: {e}")
+                return 0
+        return deleted
+
+    def _run(self):
+        self.prune()
+        while True:
+            with self._lock:
+                since = self._pending_since
+            if since is None:
+                deadline = self._pruned_at + PRUNE_INTERVAL
+            else:
+                deadline = since + self.flush_interval
+            self._wake.wait(max(0.0, deadline - time.monotonic()))
+            self._wake.clear()
+            with self._lock:
+                since = self._pending_since
+                full = len(self._pending) >= self.flush_rows
+            if self._closing or full or (since is not None and time.monotonic() - since >= self.flush_interval):
+                self.flush()
+            if self._closing:
+                return
+            if time.monotonic() - self._pruned_at >= PRUNE_INTERVAL:
+                self.prune()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {"pending": pending, "rows_written": self.rows_written, "batches": self.batches,
+                "dropped": self.dropped, "last_error": self.last_error}
@@ -0,0 +1,206 @@
+"""
+Background Wi-Fi/Bluetooth survey
+
+An optional worker that re-scans on a fixed interval and keeps the results
+in TTL caches keyed by BSSID / device address, so the scan menus can show
+the latest snapshot immediately while a refresh runs behind them.
+
+Bluetooth is heard the way the scanners hear it: a short BlueZ discovery
+window per refresh (see firmware.bluez), caching BtDevice records.
+"""
+
+import threading
+import time
+
+from firmware import jobs
+from firmware import wifi
+from firmware.runner import CommandFailed, CommandTimeout
+
+
+class SurveyEntry:
+    """A cached record with first/last seen times (time.time())"""
+
+    __slots__ = ("record", "first_seen", "last_seen")
+
+    def __init__(self, record, now):
+        self.record = record
+        self.first_seen = now
+        self.last_seen = now
+
+
+class SurveyCache:
+    """Thread-safe map of key -> SurveyEntry with TTL eviction"""
+
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+        self.updated = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def update(self, records, key, now=None):
+        """Merge freshly seen records; key(record) gives the cache key"""
+        now = time.time() if now is None else now
+        with self._lock:
+            for record in records:
+                k = key(record)
+                entry = self._entries.get(k)
+                if entry is None:
+                    self._entries[k] = SurveyEntry(record, now)
+                else:
+                    entry.record = record
+                    entry.last_seen = now
+            self.updated = now
+            self._evict_locked(now)
+
+    def _evict_locked(self, now):
+        expired = [k for k, entry in self._entries.items() if now - entry.last_seen > self.ttl]
+        for k in expired:
+            del self._entries[k]
+
+    def snapshot(self, now=None):
+        """Return the live entries, most recently seen first"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._evict_locked(now)
+            entries = list(self._entries.values())
+        entries.sort(key=lambda entry: entry.last_seen, reverse=True)
+        return entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SurveyService:
+    """Periodic Wi-Fi/Bluetooth scans into SurveyCaches"""
+
+    name = "Survey"
+
+    def __init__(self, commands, executor=None, interval=60.0, ttl=300.0,
+                 wifi_interface="wlan0", bluetooth=True, use_scan_dump=False,
+                 bluez_factory=None, adapter="hci0", transport="auto",
+                 bluetooth_seconds=10.0, max_devices=256):
+        self.commands = commands
+        self.executor = executor
+        self.interval = interval
+        self.wifi_interface = wifi_interface
+        self.bluetooth_enabled = bluetooth and bluez_factory is not None
+        self.use_scan_dump = use_scan_dump
+        self.bluez_factory = bluez_factory      # () -> jeepney DBusConnection, see firmware.hw
+        self.adapter = adapter
+        self.transport = transport
+        self.bluetooth_seconds = bluetooth_seconds
+        self.max_devices = max_devices
+        self.ttl = ttl
+        self._devices = None    # bluez.DeviceTable, made by the first Bluetooth scan
+        self.wifi = SurveyCache(ttl)
+        self.bluetooth = SurveyCache(ttl)
+        self.generation = 0
+        self.last_error = None
+        self._trigger = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config, commands, executor=None, bluez_factory=None):
+        """Build a service from the [survey] section, or None if disabled"""
+        section = config["survey"]
+        if not section.getboolean("enabled"):
+            return None
+        return cls(commands, executor,
+                   interval=section.getfloat("interval"),
+                   ttl=section.getfloat("ttl"),
+                   wifi_interface=config["network"]["default_interface"],
+                   bluetooth=section.getboolean("bluetooth"),
+                   use_scan_dump=config["network"].getboolean("scan_dump"),
+                   bluez_factory=bluez_factory,
+                   adapter=config["bluetooth"]["adapter"],
+                   transport=config["bluetooth"]["transport"],
+                   bluetooth_seconds=section.getfloat("bluetooth_seconds"),
+                   max_devices=config["bluetooth"].getint("max_devices"))
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="blackhat-survey", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._trigger.set()
+
+    def refresh(self):
+        """Start a refresh now instead of waiting for the next interval"""
+        self._trigger.set()
+
+    def snapshot(self, cache, timeout=30, on_wait=None):
+        """Return a cache's entries, kicking off a refresh behind them
+
+        If nothing is cached yet, waits (cancellably, inside a job) for the
+        refresh to finish first.
+        """
+        generation = self.generation
+        self.refresh()
+        if len(cache) == 0:
+            if on_wait is not None:
+                on_wait("Survey running, waiting for results...")
+            deadline = time.monotonic() + timeout
+            while self.generation == generation and time.monotonic() < deadline:
+                jobs.sleep(0.25)
+        return cache.snapshot()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh_once()
+            self._trigger.wait(self.interval)
+            self._trigger.clear()
+
+    def refresh_once(self):
+        """Run one Wi-Fi (and Bluetooth) scan into the caches"""
+        self._scan(("wlan0",), self._scan_wifi)
+        if self.bluetooth_enabled and not self._stop.is_set():
+            # D-Bus is only imported once there is Bluetooth to survey
+            from jeepney import DBusErrorResponse
+            self._scan((self.adapter,), self._scan_bluetooth, (DBusErrorResponse,))
+        self.generation += 1
+
+    def _scan(self, resources, scan, errors=()):
+        # Skip this round rather than fight a foreground tool for the radio
+        if self.executor is not None and self.executor.claim(resources, self) is not None:
+            return
+        try:
+            scan()
+            self.last_error = None
+        except (OSError, CommandTimeout, CommandFailed) + errors as e:
+            self.last_error = e
+        finally:
+            if self.executor is not None:
+                self.executor.release(resources, self)
+
+    def _scan_wifi(self):
+        argv, parse = wifi.scan_command(self.wifi_interface, self.use_scan_dump)
+        networks = list(parse(self.commands.stream(argv, timeout=20)))
+        self.wifi.update(networks, key=lambda n: n.bssid)
+
+    def _scan_bluetooth(self):
+        from firmware import bluez
+        if self._devices is None:
+            # Ages out with the cache rather than on its own
+            self._devices = bluez.DeviceTable(self.max_devices, max_age=self.ttl)
+        started = time.time()
+        with self.bluez_factory() as conn, \
+                bluez.Discovery(conn, self._devices, self.adapter, self.transport) as discovery:
+            deadline = time.monotonic() + self.bluetooth_seconds
+            while not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Short slices so stop() isn't held up by the window
+                discovery.poll(min(remaining, 0.5))
+        self._devices.expire()
+        heard = [device for device in self._devices.sorted() if device.last_seen >= started]
+        self.bluetooth.update(heard, key=lambda device: device.address)
@@ -0,0 +1,274 @@
+"""
+System sampler
+
+A background thread re-reads a fixed set of /proc and /sys files with
+os.pread() on descriptors opened once, parses only the fields it needs and
+appends the values to array-backed ring buffers. System Info draws the
+buffers as sparklines. The thread's own CPU time is tracked so its cost
+can be shown next to the numbers it produces.
+"""
+
+import array
+import glob
+import os
+import threading
+import time
+
+THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+POWER_SUPPLIES = "/sys/class/power_supply/*"
+
+
+class ProcFile:
+    """A /proc or /sys file kept open and re-read from offset 0"""
+
+    def __init__(self, path, size=4096):
+        self.path = path
+        self.size = size
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def read(self):
+        data = os.pread(self.fd, self.size, 0)
+        while len(data) == self.size:
+            # The file outgrew the buffer (e.g. many interfaces in net/dev)
+            self.size *= 2
+            data = os.pread(self.fd, self.size, 0)
+        return data
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def open_optional(path):
+    try:
+        return ProcFile(path)
+    except OSError:
+        return None
+
+
+class RingSeries:
+    """Fixed-size time series in an array.array, oldest value overwritten first"""
+
+    def __init__(self, capacity=120, typecode="f"):
+        self.capacity = capacity
+        self._data = array.array(typecode, bytes(array.array(typecode).itemsize * capacity))
+        self._next = 0
+        self.count = 0
+
+    def append(self, value):
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    @property
+    def last(self):
+        return self._data[self._next - 1] if self.count else None
+
+    def values(self, limit=None):
+        """Return up to limit of the newest values, oldest first"""
+        count = self.count if limit is None else min(limit, self.count)
+        start = (self._next - count) % self.capacity
+        if start + count <= self.capacity:
+            return self._data[start:start + count].tolist()
+        return (self._data[start:] + self._data[:self._next]).tolist()
+
+    def __len__(self):
+        return self.count
+
+
+def parse_cpu(data):
+    """Return (busy, total) jiffies from the first line of /proc/stat"""
+    fields = data[:data.index(b"\n")].split()[1:]
+    values = [int(v) for v in fields[:8]]
+    idle = values[3] + values[4]        # idle + iowait
+    total = sum(values)
+    return total - idle, total
+
+
+def parse_meminfo(data):
+    """Return the percentage of memory in use from /proc/meminfo"""
+    def field(name):
+        start = data.index(name) + len(name)
+        return int(data[start:data.index(b"kB", start)])
+    total = field(b"MemTotal:")
+    try:
+        available = field(b"MemAvailable:")
+    except ValueError:
+        available = field(b"MemFree:")
+    return 100.0 * (total - available) / total
+
+
+def parse_net_dev(data, skip=(b"lo",)):
+    """Return total (rx_bytes, tx_bytes) over all interfaces except skip"""
+    rx = tx = 0
+    for line in data.split(b"\n")[2:]:
+        name, sep, counters = line.partition(b":")
+        if not sep or name.strip() in skip:
+            continue
+        fields = counters.split()
+        rx += int(fields[0])
+        tx += int(fields[8])
+    return rx, tx
+
+
+def find_battery():
+    """Return the capacity file of the first battery power supply, or None"""
+    for supply in sorted(glob.glob(POWER_SUPPLIES)):
+        try:
+            with open(os.path.join(supply, "type")) as f:
+                if f.read().strip() != "Battery":
+                    continue
+        except OSError:
+            continue
+        capacity = os.path.join(supply, "capacity")
+        if os.path.exists(capacity):
+            return capacity
+    return None
+
+
+class SystemSampler:
+    """Samples CPU, memory, load, temperature, network and battery into ring buffers"""
+
+    name = "Sampler"
+
+    def __init__(self, interval=1.0, history=120, proc="/proc"):
+        self.interval = interval
+        self.history = history
+        self.series = {
+            "cpu": RingSeries(history),         # % busy
+            "mem": RingSeries(history),         # % used
+            "load": RingSeries(history),        # 1-minute load average
+            "rx": RingSeries(history),          # bytes/s received
+            "tx": RingSeries(history),          # bytes/s sent
+        }
+        self._files = {
+            "stat": ProcFile(os.path.join(proc, "stat")),
+            "meminfo": ProcFile(os.path.join(proc, "meminfo")),
+            "loadavg": ProcFile(os.path.join(proc, "loadavg")),
+            "net": ProcFile(os.path.join(proc, "net/dev")),
+        }
+        thermal = open_optional(THERMAL_ZONE)
+        if thermal is not None:
+            self._files["temp"] = thermal
+            self.series["temp"] = RingSeries(history)       # degrees C
+        battery = find_battery()
+        battery = open_optional(battery) if battery else None
+        if battery is not None:
+            self._files["battery"] = battery
+            self.series["battery"] = RingSeries(history)    # % charge
+        self.samples = 0
+        self.cpu_time = 0.0
+        self._last_cpu = None
+        self._last_net = None
+        self._started = None
+        self._lock = threading.Lock()
+        self._sampled = threading.Condition()   # notified after each sample
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Build the sampler from [sysmon], or return None when it is disabled"""
+        section = config["sysmon"]
+        if not section.getboolean("enabled"):
+            return None
+        return cls(interval=section.getfloat("interval"), history=section.getint("history"))
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def cost(self):
+        """Fraction of one CPU spent sampling since start()"""
+        if self._started is None:
+            return 0.0
+        elapsed = time.monotonic() - self._started
+        return self.cpu_time / elapsed if elapsed > 0 else 0.0
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._started = time.monotonic()
+        self.cpu_time = 0.0
+        self._thread = threading.Thread(target=self._run, name="blackhat-sysmon", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        for f in self._files.values():
+            f.close()
+
+    def _run(self):
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            started = time.thread_time()
+            try:
+                self.sample()
+            except (OSError, ValueError, IndexError) as e:
+                print(f"[sysmon] sample failed: {e}")
+            self.cpu_time += time.thread_time() - started
+            next_at += self.interval
+            self._stop.wait(max(0.0, next_at - time.monotonic()))
+
+    def sample(self, now=None):
+        """Read every file once and append to the series"""
+        now = time.monotonic() if now is None else now
+        files = self._files
+        busy, total = parse_cpu(files["stat"].read())
+        mem = parse_meminfo(files["meminfo"].read())
+        load = float(files["loadavg"].read().split(None, 1)[0])
+        rx, tx = parse_net_dev(files["net"].read())
+
+        with self._lock:
+            if self._last_cpu is not None:
+                last_busy, last_total = self._last_cpu
+                if total > last_total:
+                    self.series["cpu"].append(100.0 * (busy - last_busy) / (total - last_total))
+            self._last_cpu = (busy, total)
+            if self._last_net is not None:
+                last_rx, last_tx, last_now = self._last_net
+                elapsed = now - last_now
+                if elapsed > 0:
+                    self.series["rx"].append(max(0, rx - last_rx) / elapsed)
+                    self.series["tx"].append(max(0, tx - last_tx) / elapsed)
+            self._last_net = (rx, tx, now)
+            self.series["mem"].append(mem)
+            self.series["load"].append(load)
+            if "temp" in files:
+                self.series["temp"].append(int(files["temp"].read()) / 1000.0)
+            if "battery" in files:
+                self.series["battery"].append(float(files["battery"].read()))
+            self.samples += 1
+        with self._sampled:
+            self._sampled.notify_all()
+
+    def wait_sample(self, seen, timeout=None, interrupted=None):
+        """Block until more than seen samples exist; returns the sample count
+
+        interrupted() ends the wait early; call wake() after it turns true
+        (e.g. from Job.on_cancel) so a waiting thread rechecks it.
+        """
+        with self._sampled:
+            self._sampled.wait_for(
+                lambda: self.samples > seen or (interrupted is not None and interrupted()), timeout)
+            return self.samples
+
+    def wake(self):
+        """Make wait_sample() callers recheck their interrupted()"""
+        with self._sampled:
+            self._sampled.notify_all()
+
+    def snapshot(self, limit=None):
+        """Return {name: [values, oldest first]} for every series"""
+        with self._lock:
+            return {name: series.values(limit) for name, series in self.series.items()}
@@ -0,0 +1,53 @@
+"""
+Menu tool registry
+
+Tool implementations live in the modules of this package and are imported
+the first time one of their actions is selected, keeping them off the boot
+path. Each entry also lists the resources the tool holds exclusively.
+"""
+
+import importlib
+
+# action -> (module, function, resources held exclusively while it runs)
+ACTIONS = {
+    "wifi_scan": ("wifi", "wifi_scan", ("wlan0",)),
+    "wifi_monitor": ("wifi", "wifi_monitor", ("wlan0",)),
+    "wifi_deauth": ("wifi", "wifi_deauth", ("wlan0",)),
+    "create_ap": ("wifi", "create_access_point", ("wlan0",)),
+    "bt_scan": ("bluetooth", "bluetooth_scan", ("hci0",)),
+    "ble_scan": ("bluetooth", "ble_scan", ("hci0",)),
+    "bt_info": ("bluetooth", "bluetooth_info", ()),
+    "port_scan": ("network", "port_scanner", ()),
+    "network_scan": ("network", "network_scanner", ()),
+    "packet_capture": ("network", "packet_capture", ()),
+    "dns_lookup": ("network", "dns_lookup", ()),
+    "gpio_state": ("gpio", "gpio_state", ("gpio",)),
+    "gpio_pwm": ("gpio", "gpio_pwm", ("gpio",)),
+    "logic_analyzer": ("gpio", "logic_analyzer", ("gpio",)),
+    "i2c_scan": ("gpio", "i2c_scanner", ("i2c",)),
+    "spi_test": ("gpio", "spi_test", ("spi",)),
+    "system_info": ("system", "show_system_info", ()),
+    "about": ("system", "show_about", ()),
+    "survey_toggle": ("system", "toggle_survey", ()),
+    "shutdown": ("system", "shutdown_device", ("system",)),
+}
+
+# Actions answered from the survey cache while the survey is running
+SURVEY_ACTIONS = ("wifi_scan", "bt_scan")
+
+_loaded = {}
+
+
+def resources(action):
+    """Return the resources an action holds while it runs"""
+    return ACTIONS[action][2]
+
+
+def load(action):
+    """Return the function implementing action, importing its module on first use"""
+    func = _loaded.get(action)
+    if func is None:
+        module_name, func_name, _ = ACTIONS[action]
+        module = importlib.import_module(f"{__name__}.{module_name}")
+        func = _loaded[action] = getattr(module, func_name)
+    return func
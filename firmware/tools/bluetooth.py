@@ -0,0 +1,114 @@
+"""
+Bluetooth tools
+"""
+
+import time
+
+from firmware import bluez
+from firmware import jobs
+from firmware.store import seen_text
+
+# Devices heard by the scanners, kept between runs until they age out
+_devices = None
+
+# Result store kind per BtDevice.kind
+STORE_KINDS = {"LE": "ble", "BR/EDR": "bt"}
+
+
+def bluetooth_scan(device):
+    """Scan for Bluetooth devices"""
+    survey = device.survey
+    if survey is not None and survey.running and survey.bluetooth_enabled:
+        entries = survey.snapshot(survey.bluetooth, on_wait=device.show_status)
+        now = time.time()
+        device.display_results("Bluetooth Devices", [
+            f"{e.record.label()} {now - e.last_seen:.0f}s" for e in entries
+        ])
+        return
+    
+    _discover(device, "Bluetooth Devices", device.config["bluetooth"]["transport"])
+
+
+def ble_scan(device):
+    """Scan for BLE devices"""
+    _discover(device, "BLE Devices", "le")
+
+
+def _discover(device, title, transport):
+    """BlueZ discovery, listing devices as their advertisements arrive"""
+    global _devices
+    settings = device.config["bluetooth"]
+    duration = settings.getfloat("duration")
+    job = jobs.current_job()
+    if _devices is None:
+        _devices = bluez.DeviceTable(settings.getint("max_devices"), settings.getfloat("max_age"))
+    kinds = {"le": ("LE",), "bredr": ("BR/EDR",)}.get(transport, ("LE", "BR/EDR"))
+    store = device.store
+    seen = {}       # address -> store.Sighting or None, looked up once per run
+    
+    def labels():
+        shown = [d for d in _devices.sorted() if d.kind in kinds]
+        if store is None:
+            return [d.label() for d in shown]
+        new = [d for d in shown if d.address not in seen]
+        for kind in ("LE", "BR/EDR"):
+            addresses = [d.address for d in new if d.kind == kind]
+            if addresses:
+                found = store.lookup(STORE_KINDS[kind], addresses)
+                seen.update((address, found.get(address)) for address in addresses)
+        return [f"{d.label()} ({seen_text(seen[d.address])})" for d in shown]
+    
+    # The LCD list is redrawn in place as RSSI and names change
+    results = device.stream_results(title) if device.lcd_available else None
+    device.show_status(f"Scanning Bluetooth ({transport})...")
+    started = time.monotonic()
+    started_at = time.time()
+    try:
+        conn = device.backend.bluez_factory()
+        with conn, bluez.Discovery(conn, _devices, settings["adapter"], transport) as discovery:
+            shown = None
+            # BACK ends discovery early; the devices heard so far are kept
+            while not (job is not None and job.cancelled):
+                elapsed = time.monotonic() - started
+                if duration and elapsed >= duration:
+                    break
+                discovery.poll(0.2)
+                _devices.expire()
+                if _devices.version != shown:
+                    shown = _devices.version
+                    if results is not None:
+                        results.replace(labels())
+                if job is not None:
+                    job.update(progress=elapsed / duration if duration else None,
+                               status=f"{len(_devices)} devices, {discovery.signals} signals")
+    except jobs.JobCancelled:
+        raise
+    except Exception as e:
+        device.show_error(f"Bluetooth scan failed: {str(e)}")
+        return
+    
+    found = labels() or ["No devices found"]
+    if store is not None:
+        heard = [d for d in _devices.sorted() if d.kind in kinds and d.last_seen >= started_at]
+        for kind in ("LE", "BR/EDR"):
+            store.record_many(STORE_KINDS[kind], [
+                (d.address, d.label(), {"name": d.name, "rssi": d.rssi, "adverts": d.adverts})
+                for d in heard if d.kind == kind])
+    found.append(f"{discovery.signals} signals in {time.monotonic() - started:.0f}s"
+                 + (f", {_devices.evicted} evicted" if _devices.evicted else ""))
+    if results is not None:
+        results.replace(found)
+        device.finish_results(results)
+    else:
+        device.display_results(title, found)
+
+
+def bluetooth_info(device):
+    """Show Bluetooth adapter info"""
+    try:
+        lines, _ = device.commands.run(['hciconfig'], timeout=5)
+        device.display_text("Bluetooth Info", "\n".join(lines))
+    except jobs.JobCancelled:
+        raise
+    except Exception as e:
+        device.show_error(f"Failed to get BT info: {str(e)}")
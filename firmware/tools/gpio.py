@@ -0,0 +1,267 @@
+"""
+GPIO tools
+"""
+
+import json
+import os
+import time
+
+from firmware import gpiochip, i2c, jobs, pwm, spibench
+from firmware.store import annotate
+
+# Samples per LineRequest.sample() call between screen updates
+LOGIC_CHUNK = 8192
+
+# The LCD HAT's SPI bus, DC and reset; [display] backlight is the other LCD pin
+LCD_LINES = (7, 8, 9, 10, 11, 22)
+
+_i2c_cache = None
+
+
+def gpio_state(device):
+    """Show GPIO levels and functions without changing any pin's mode"""
+    settings = device.config["gpio"]
+    try:
+        lines = gpiochip.parse_lines(settings["lines"])
+        reserved = set(gpiochip.parse_lines(settings["reserved"]))
+        with device.backend.gpiochip_factory(settings["chip"]) as chip:
+            try:
+                gpiomem = device.backend.gpiomem_factory(chip)
+            except OSError as e:
+                print(f"Pin State without /dev/gpiomem, outputs not read: {e}")
+                gpiomem = None
+            try:
+                levels = gpiochip.snapshot(chip, [line for line in lines if line not in reserved],
+                                           gpiomem)
+            finally:
+                if gpiomem is not None:
+                    gpiomem.close()
+    except (OSError, ValueError) as e:
+        device.show_error(f"GPIO read failed: {e}")
+        return
+    
+    buttons = {pin: f"button {event}" for pin, event in device.button_events.items()}
+    states = {line: "reserved, not read" for line in lines if line in reserved}
+    for info, level in levels:
+        if level is None:
+            if info.used:
+                states[info.offset] = f"used by {info.consumer or 'kernel'}"
+            else:
+                states[info.offset] = f"{info.mode()}, not read"
+        else:
+            states[info.offset] = f"{'HIGH' if level else 'LOW'} {info.mode()}"
+            if info.used:
+                states[info.offset] += f", {info.consumer or 'kernel'}"
+        role = buttons.get(info.offset)
+        if role:
+            states[info.offset] += f" ({role})"
+    gpio_info = [f"GPIO{line}: {states[line]}" for line in sorted(states)]
+    
+    device.display_results("GPIO States", gpio_info)
+
+
+def logic_analyzer(device):
+    """Sample lines at full speed with a scrolling timing diagram, then save a VCD"""
+    settings = device.config["logic"]
+    duration = settings.getfloat("duration") or None
+    window = settings.getint("window")
+    job = jobs.current_job()
+    try:
+        lines = gpiochip.parse_lines(settings["lines"])
+        reserved = set(gpiochip.parse_lines(device.config["gpio"]["reserved"]))
+        if not lines or len(lines) > gpiochip.GPIO_MAX_LINES:
+            raise ValueError(f"1 to {gpiochip.GPIO_MAX_LINES} lines")
+        for line in lines:
+            if line in reserved:
+                raise ValueError(f"GPIO{line} is reserved")
+        chip = device.backend.gpiochip_factory(device.config["gpio"]["chip"])
+    except (OSError, ValueError) as e:
+        device.show_error(f"Logic analyzer: {e}")
+        return
+    
+    names = [f"GPIO{line}" for line in lines]
+    buffer = gpiochip.SampleBuffer(settings.getint("samples"), lines)
+    view = [None]      # (bits, times) copied by the sampling thread for the screen
+    
+    def screen(render):
+        if view[0] is None:
+            return render.timing_frame("Logic Analyzer", [])
+        bits = view[0][0]
+        return render.timing_frame("Logic Analyzer", [
+            (name[4:], *gpiochip.columns(bits, i, render.timing_width))
+            for i, name in enumerate(names)])
+    
+    try:
+        with chip, chip.request(lines, consumer="blackhat-logic") as request:
+            device.show_status(f"Sampling {', '.join(names)}...")
+            if device.lcd_available:
+                device.show_screen(screen)
+            started = last = time.monotonic()
+            try:
+                # BACK stops sampling; the buffer is still saved
+                while not (job is not None and job.cancelled):
+                    request.sample(buffer, LOGIC_CHUNK,
+                                   should_stop=lambda: job is not None and job.cancelled)
+                    now = time.monotonic()
+                    if duration and now - started >= duration:
+                        break
+                    if now - last >= 0.1:
+                        last = now
+                        bits, times = buffer.ordered(window)
+                        view[0] = (bits.copy(), times.copy())
+                        if job is not None:
+                            span = (times[-1] - times[0]) / 1e6 if len(times) > 1 else 0.0
+                            job.update(progress=(now - started) / duration if duration else None,
+                                       status=f"{buffer.rate() / 1000:.0f} kS/s, {span:.1f} ms/screen")
+            finally:
+                device.close_screen()
+        
+        bits, times = buffer.ordered()
+        os.makedirs(settings["directory"], exist_ok=True)
+        path = os.path.join(settings["directory"], f"logic-{time.strftime('%Y%m%d-%H%M%S')}.vcd")
+        gpiochip.write_vcd(path, names, bits, times)
+    except OSError as e:
+        device.show_error(f"Logic analyzer failed: {e}")
+        return
+    
+    span = (times[-1] - times[0]) / 1e9 if len(times) > 1 else 0.0
+    results = [f"{len(bits)} samples, {span * 1000:.1f} ms at {buffer.rate() / 1000:.0f} kS/s"]
+    for i, name in enumerate(names):
+        levels = gpiochip.line_levels(bits, i)
+        edges = int((levels[1:] != levels[:-1]).sum())
+        results.append(f"{name}: {edges} edges, {100.0 * levels.mean():.0f}% high"
+                       if len(levels) else f"{name}: no samples")
+    results.append(os.path.basename(path))
+    device.display_results("Logic Analyzer", results)
+
+
+def gpio_pwm(device):
+    """Play a PWM preset, on a hardware channel when the pin has one"""
+    settings = device.config["pwm"]
+    pin = settings.getint("pin")
+    preset = settings["preset"]
+    duration = settings.getfloat("duration") or None
+    job = jobs.current_job()
+    try:
+        if pin in LCD_LINES or pin == device.config["display"].getint("backlight"):
+            raise ValueError(f"GPIO{pin} is used by the LCD")
+        steps = pwm.preset_steps(preset, settings.getfloat("frequency"))
+        engine = device.backend.pwm_factory(pin, settings.getint("chip"))
+    except (OSError, ValueError) as e:
+        device.show_error(f"PWM: {e}")
+        return
+    
+    kind = "hardware" if engine.hardware else "software"
+    device.show_status(f"PWM {preset} on GPIO{pin} ({kind})...")
+    total = duration or sum(seconds for seconds, _, _ in steps)
+    shown = {"at": 0.0}
+    
+    def on_step(elapsed):
+        if job is not None and elapsed - shown["at"] >= 0.1:
+            shown["at"] = elapsed
+            job.update(progress=elapsed / total)
+    
+    try:
+        try:
+            applied = pwm.play(engine, steps, duration, sleep=jobs.sleep, on_step=on_step)
+        finally:
+            engine.close()
+        device.show_success(f"PWM {preset} done: {applied} steps, {kind} PWM")
+    except jobs.JobCancelled:
+        raise
+    except Exception as e:
+        device.show_error(f"PWM failed: {str(e)}")
+
+
+def i2c_scanner(device):
+    """Scan every I2C bus in-process and name the devices that answer"""
+    global _i2c_cache
+    settings = device.config["i2c"]
+    job = jobs.current_job()
+    try:
+        buses = [int(bus) for bus in settings["buses"].replace(",", " ").split()]
+        buses = buses or device.backend.i2c_buses()
+        table = i2c.KNOWN_DEVICES
+        if settings["device_table"] and os.path.exists(settings["device_table"]):
+            table = i2c.load_table(settings["device_table"])
+    except (OSError, ValueError) as e:
+        device.show_error(f"I2C scan: {e}")
+        return
+    if not buses:
+        device.show_warning("No I2C buses (enable I2C in raspi-config)")
+        return
+    if _i2c_cache is None:
+        _i2c_cache = i2c.ScanCache(settings.getfloat("cache_seconds"))
+    
+    device.show_status(f"Scanning {len(buses)} I2C buses...")
+    started = time.monotonic()
+    try:
+        results, cached = i2c.scan(buses, device.backend.i2c_factory, _i2c_cache, table,
+                                   read_ids=settings.getboolean("identify"),
+                                   should_stop=lambda: job is not None and job.cancelled)
+    except jobs.JobCancelled:
+        raise
+    except Exception as e:
+        device.show_error(f"I2C scan failed: {str(e)}")
+        return
+    elapsed = time.monotonic() - started
+    
+    found = annotate(device.store, "i2c", [
+        (f"{dev.bus}-0x{dev.address:02x}", dev.label(), {"name": dev.name, "state": dev.state,
+                                                       "chip_id": dev.chip_id})
+        for bus in buses for dev in results[bus]])
+    names = ", ".join(f"i2c-{bus}" for bus in buses)
+    summary = f"{len(found)} devices on {names} in {elapsed * 1000:.0f} ms"
+    if cached:
+        summary += f" ({len(cached)} cached)"
+    device.display_results("I2C Devices", [summary] + (found or ["No devices found"]))
+
+
+def spi_test(device):
+    """SPI loopback sweep: throughput, latency and errors per clock and size"""
+    settings = device.config["spi"]
+    bus, chip_select = settings.getint("bus"), settings.getint("device")
+    job = jobs.current_job()
+    try:
+        speeds = spibench.parse_list(settings["speeds"])
+        sizes = spibench.parse_list(settings["sizes"])
+        spi = device.backend.spi_factory()
+        spi.open(bus, chip_select)
+        spi.mode = 0
+    except (OSError, ValueError) as e:
+        device.show_error(f"SPI test: {e}")
+        return
+    
+    def on_point(point, progress):
+        device.show_status(spibench.point_label(point))
+        if job is not None:
+            job.update(progress=progress)
+    
+    device.show_status(f"SPI sweep on spidev{bus}.{chip_select}...")
+    try:
+        try:
+            report = spibench.sweep(spi, speeds, sizes, settings.getfloat("duration"), on_point,
+                                    should_stop=lambda: job is not None and job.cancelled)
+        finally:
+            spi.close()
+        report["device"] = f"spidev{bus}.{chip_select}"
+        report["time"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        os.makedirs(settings["directory"], exist_ok=True)
+        path = os.path.join(settings["directory"], f"spi-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    except jobs.JobCancelled:
+        raise
+    except Exception as e:
+        device.show_error(f"SPI test failed: {str(e)}")
+        return
+    
+    if not report["loopback"]:
+        results = ["No loopback (jumper MOSI-MISO): errors not checked"]
+    elif report["safe_max_hz"]:
+        results = [f"Safe max clock: {report['safe_max_hz'] / 1e6:g} MHz"]
+    else:
+        results = ["Errors at every clock speed"]
+    results += [spibench.point_label(point) for point in report["points"]]
+    results.append(os.path.basename(path))
+    device.display_results("SPI Test", results)
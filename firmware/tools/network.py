@@ -0,0 +1,229 @@
+"""
+Network tools
+"""
+
+import asyncio
+import os
+import socket
+import time
+
+from firmware import capture
+from firmware import dns
+from firmware import jobs
+from firmware import netscan
+from firmware import portscan
+from firmware.store import annotate
+
+# Hosts found by network_scanner and DNS answers, kept between runs
+_hosts = None
+_dns_cache = None
+
+
+def port_scanner(device):
+    """Concurrent TCP connect scan of the configured lab targets"""
+    settings = device.config["portscan"]
+    job = jobs.current_job()
+    try:
+        allowlist = portscan.parse_allowlist(settings["allowlist"])
+        addresses = portscan.resolve_targets(settings["targets"], allowlist)
+        ports = portscan.parse_ports(settings["ports"])
+    except (ValueError, OSError) as e:
+        device.show_error(f"Port scan: {e}")
+        return
+    
+    total = len(addresses) * len(ports)
+    progress = {"done": 0, "shown": 0.0}
+    # Open ports are listed as they are found
+    found = device.stream_results("Open Ports")
+    
+    def on_result(address, port, state):
+        progress["done"] += 1
+        if state == portscan.OPEN:
+            label = f"{address}:{port} open {portscan.service_name(port)}".rstrip()
+            found.extend(annotate(device.store, "port", [(f"{address}:{port}", label, None)]))
+            device.show_status(label)
+        now = time.monotonic()
+        if job is not None and now - progress["shown"] >= 0.1:
+            # Throttled: a fast scan would otherwise queue a redraw per port
+            progress["shown"] = now
+            job.update(progress=progress["done"] / total)
+    
+    device.show_status(f"Scanning {total} ports...")
+    try:
+        stats = asyncio.run(portscan.scan(
+            addresses, ports,
+            concurrency=settings.getint("concurrency"),
+            rate=settings.getfloat("rate"),
+            timeout=settings.getfloat("timeout"),
+            on_result=on_result,
+            should_stop=lambda: job is not None and job.cancelled))
+    except Exception as e:
+        device.show_error(f"Port scan failed: {str(e)}")
+        return
+    
+    if not found.items:
+        found.append("No open ports found")
+    found.append(stats.summary())
+    device.finish_results(found)
+
+
+def network_scanner(device):
+    """Discover hosts on the lab subnet from the neighbor table and a probe sweep"""
+    global _hosts
+    settings = device.config["netscan"]
+    interface = settings["interface"] or device.wifi_interface
+    job = jobs.current_job()
+    if _hosts is None:
+        _hosts = netscan.HostTable()
+    known = len(_hosts)
+    shown = {"at": 0.0}
+    # The LCD host list fills in during the sweep
+    results = device.stream_results("Network Hosts") if device.lcd_available else None
+    
+    def on_change(table):
+        now = time.monotonic()
+        if now - shown["at"] >= 0.1:
+            shown["at"] = now
+            if results is not None:
+                results.replace([host.label() for host in table.sorted()])
+            device.show_status(f"{len(table)} hosts on {interface}")
+    
+    device.show_status(f"Scanning {interface} subnet...")
+    started = time.monotonic()
+    started_at = time.time()
+    try:
+        netscan.discover(interface, _hosts, subnet=settings["subnet"],
+                         ports=portscan.parse_ports(settings["ports"]),
+                         concurrency=settings.getint("concurrency"),
+                         timeout=settings.getfloat("timeout"),
+                         on_change=on_change,
+                         should_stop=lambda: job is not None and job.cancelled)
+    except jobs.JobCancelled:
+        raise
+    except Exception as e:
+        device.show_error(f"Network scan failed: {str(e)}")
+        return
+    
+    # Hosts only remembered from an earlier run are listed but not recorded again
+    hosts = _hosts.sorted()
+    labels = dict(zip((host.ip for host in hosts), (host.label() for host in hosts)))
+    fresh = [host for host in hosts if host.last_seen >= started_at]
+    labels.update(zip((host.ip for host in fresh), annotate(device.store, "host", [
+        (str(host.ip), host.label(), {"mac": host.mac, "ports": sorted(host.ports)})
+        for host in fresh])))
+    found = [labels[host.ip] for host in hosts] + [
+        f"{len(_hosts)} hosts ({len(_hosts) - known} new) in {time.monotonic() - started:.1f}s"
+    ]
+    if results is not None:
+        results.replace(found)
+        device.finish_results(results)
+    else:
+        device.display_results("Network Hosts", found)
+
+
+def packet_capture(device):
+    """Capture packets to rotating pcap files until BACK or the duration ends"""
+    settings = device.config["capture"]
+    interface = settings["interface"] or device.wifi_interface
+    duration = settings.getfloat("duration") or None
+    job = jobs.current_job()
+    
+    try:
+        program = None
+        expression = settings["filter"].strip()
+        if expression:
+            device.show_status("Compiling capture filter...")
+            lines, _ = device.commands.run(capture.bpf_command(expression, interface),
+                                           timeout=10, check=True)
+            program = capture.parse_bpf(lines)
+        
+        files = capture.CaptureFiles(settings["directory"], prefix=interface,
+                                     fmt=settings["format"],
+                                     rotate_bytes=int(settings.getfloat("rotate_mb") * 1024 * 1024),
+                                     rotate_seconds=settings.getfloat("rotate_seconds"))
+        ring = capture.PacketRing(interface, block_count=settings.getint("ring_blocks"),
+                                  bpf=program, promiscuous=settings.getboolean("promiscuous"))
+        
+        def on_stats(stats):
+            if job is not None and duration:
+                job.update(progress=stats.elapsed / duration)
+            device.show_status(stats.line())
+        
+        device.show_status(f"Capturing on {interface}...")
+        try:
+            with ring:
+                # BACK ends the capture early; what was captured is kept
+                stats = capture.capture(ring, files, duration=duration, on_stats=on_stats,
+                                        should_stop=lambda: job is not None and job.cancelled)
+        finally:
+            files.close()
+        
+        if device.store is not None and device.config["security"].getboolean("log_captures"):
+            device.store.record_many("capture", [
+                (path, os.path.basename(path), {"interface": interface, "filter": expression,
+                                                "packets": stats.packets, "bytes": stats.bytes,
+                                                "drops": stats.drops})
+                for path in files.paths])
+        
+        device.display_results("Packet Capture", [
+            f"{stats.packets} packets, {stats.bytes / 1024:.0f} kB",
+            f"{stats.drops} dropped by kernel",
+        ] + [os.path.basename(path) for path in files.paths])
+    except jobs.JobCancelled:
+        raise
+    except PermissionError:
+        device.show_error("Packet capture needs root")
+    except Exception as e:
+        device.show_error(f"Packet capture failed: {str(e)}")
+
+
+def dns_lookup(device):
+    """Resolve the configured names (or batch file) concurrently"""
+    global _dns_cache
+    settings = device.config["dns"]
+    types = [t for t in settings["types"].split(",") if t.strip()]
+    job = jobs.current_job()
+    try:
+        batch = settings["batch_file"]
+        if batch and os.path.exists(batch):
+            queries = dns.load_batch(batch, types)
+        else:
+            queries = [q for name in settings["names"].split(",")
+                       for q in dns.parse_query(name, types)]
+        nameservers = [ns for ns in settings["nameservers"].replace(",", " ").split()] or None
+    except (OSError, ValueError, KeyError) as e:
+        device.show_error(f"DNS lookup: {e}")
+        return
+    if not queries:
+        device.show_warning("No names to look up")
+        return
+    if _dns_cache is None:
+        _dns_cache = dns.DnsCache()
+    
+    results = []
+    # Answers are listed as they arrive
+    found = device.stream_results("DNS Lookup")
+    
+    def on_answer(answer):
+        results.append(answer)
+        found.append(answer.label())
+        if job is not None:
+            job.update(progress=len(results) / len(queries))
+    
+    async def lookup():
+        async with dns.Resolver(nameservers, timeout=settings.getfloat("timeout"),
+                                cache=_dns_cache) as resolver:
+            return await resolver.resolve_many(
+                queries, on_answer, should_stop=lambda: job is not None and job.cancelled)
+    
+    device.show_status(f"Resolving {len(queries)} names...")
+    started = time.monotonic()
+    try:
+        asyncio.run(lookup())
+    except Exception as e:
+        device.show_error(f"DNS lookup failed: {str(e)}")
+        return
+    
+    cached = sum(1 for answer in results if answer.cached)
+    found.append(f"{len(results)} lookups in {time.monotonic() - started:.2f}s, {cached} cached")
+    device.finish_results(found)
@@ -0,0 +1,176 @@
+"""
+System tools
+"""
+
+import os
+import socket
+from datetime import datetime
+
+from firmware import jobs
+from firmware.survey import SurveyService
+from firmware.sysmon import SystemSampler
+
+
+# (series, label, low, high, color, format)
+SPARKLINES = (
+    ("cpu", "CPU", 0, 100, (0, 255, 0), "{:.0f}%"),
+    ("mem", "MEM", 0, 100, (0, 200, 255), "{:.0f}%"),
+    ("load", "LOAD", 0, 4, (255, 255, 255), "{:.2f}"),
+    ("temp", "TEMP", 30, 85, (255, 165, 0), "{:.1f}C"),
+    ("rx", "RX", 0, 1024, (255, 255, 0), None),
+    ("tx", "TX", 0, 1024, (255, 0, 255), None),
+    ("battery", "BAT", 0, 100, (0, 255, 128), "{:.0f}%"),
+)
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+def _rate(value):
+    if value >= 1024 * 1024:
+        return f"{value / 1024 / 1024:.1f}MB/s"
+    return f"{value / 1024:.1f}kB/s"
+
+
+def _format(fmt, value):
+    if value is None:
+        return "-"
+    return fmt.format(value) if fmt else _rate(value)
+
+
+def _text_sparkline(values, low, high, width=30):
+    values = values[-width:]
+    if not values:
+        return ""
+    high = max(high, max(values))
+    span = (high - low) or 1.0
+    top = len(SPARK_CHARS) - 1
+    return "".join(SPARK_CHARS[int(round((min(max(v, low), high) - low) / span * top))]
+                   for v in values)
+
+
+def show_system_info(device):
+    """Live CPU/memory/temperature/network sparklines from the /proc sampler"""
+    sampler = device.sysmon
+    owned = sampler is None
+    if owned:
+        # Disabled at boot: sample only while someone is looking
+        section = device.config["sysmon"]
+        sampler = SystemSampler(interval=section.getfloat("interval"),
+                                history=section.getint("history"))
+    started = not sampler.running
+    if started:
+        sampler.start()
+    try:
+        _system_info(device, sampler)
+    finally:
+        if owned:
+            sampler.close()
+        elif started:
+            sampler.stop()
+
+
+def _system_info(device, sampler):
+    job = jobs.current_job()
+    cancelled = None
+    if job is not None:
+        # BACK wakes the waits below instead of them polling for it
+        job.on_cancel(sampler.wake)
+        cancelled = lambda: job.cancelled
+    while sampler.samples < 2:
+        sampler.wait_sample(1, interrupted=cancelled)     # rates need two samples
+        if job is not None:
+            job.check()
+    
+    rows_for = [spec for spec in SPARKLINES if spec[0] in sampler.series]
+    
+    if not device.lcd_available:
+        series = sampler.snapshot()
+        info = [f"Hostname: {socket.gethostname()}",
+                f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"]
+        for name, label, low, high, _, fmt in rows_for:
+            values = series[name]
+            last = values[-1] if values else None
+            info.append(f"{label:<5}{_format(fmt, last):>10} {_text_sparkline(values, low, high)}")
+        info.append(f"Sampler cost: {sampler.cost * 100:.2f}% CPU")
+        device.display_results("System Info", info)
+        return
+    
+    hostname = socket.gethostname()
+    
+    def screen(render):
+        series = sampler.snapshot(render.width)
+        rows = []
+        for name, label, low, high, color, fmt in rows_for:
+            values = series[name]
+            rows.append((label, _format(fmt, values[-1] if values else None),
+                         values, low, high, color))
+        return render.sparkline_frame("System Info", rows)
+    
+    device.show_screen(screen)
+    try:
+        # The job status line doubles as the footer; BACK cancels the job
+        seen = 0
+        while True:
+            # Sleeps until the sampler has a new sample, or BACK
+            samples = sampler.wait_sample(seen, interrupted=cancelled)
+            if job is not None:
+                job.check()
+            if samples != seen:
+                seen = samples
+                status = f"{hostname} | sampler {sampler.cost * 100:.1f}% CPU"
+                if job is not None:
+                    job.update(status=status)    # redraws the screen too
+                else:
+                    device.ui.request_render()
+    except jobs.JobCancelled:
+        device.show_status("System Info closed")
+    finally:
+        device.close_screen()
+
+
+def show_about(device):
+    """Show about information"""
+    about_text = """BlackHat Educational Firmware v1.0
+
+Created for Raspberry Pi Zero 2 W
+Hardware: Waveshare Package F
+OS: Raspberry Pi OS 32-bit
+
+WARNING: Educational use only!
+Only test on owned devices.
+
+Inspired by:
+- M5StickC Bruce Firmware
+- Flipper Zero
+
+Features:
+- WiFi penetration testing
+- Bluetooth scanning
+- Network analysis
+- GPIO control
+- System monitoring"""
+    
+    device.display_text("About", about_text)
+
+
+def toggle_survey(device):
+    """Turn the background survey on or off"""
+    if device.survey is None:
+        device.config["survey"]["enabled"] = "true"
+        device.survey = SurveyService.from_config(device.config, device.commands, device.executor,
+                                                  bluez_factory=device.backend.bluez_factory)
+    if device.survey.running:
+        device.survey.stop()
+        device.show_success("Background survey off")
+    else:
+        device.survey.start()
+        device.show_success(f"Background survey on ({device.survey.interval:g}s)")
+
+
+def shutdown_device(device):
+    """Shutdown the device"""
+    device.show_status("Shutting down...")
+    jobs.sleep(2)
+    device.running = False
+    device.gpio.cleanup()
+    os.system('sudo shutdown -h now')
@@ -0,0 +1,67 @@
+"""
+WiFi tools
+"""
+
+import time
+
+from firmware import jobs
+from firmware.store import annotate
+from firmware.wifi import scan_command
+
+
+def wifi_scan(device):
+    """Scan for WiFi networks"""
+    survey = device.survey
+    if survey is not None and survey.running:
+        entries = survey.snapshot(survey.wifi, on_wait=device.show_status)
+        now = time.time()
+        device.display_results("WiFi Networks", [
+            f"{e.record.label()} {now - e.last_seen:.0f}s"
+            for e in sorted(entries, key=lambda e: e.record.signal or -999, reverse=True)
+        ])
+        return
+    
+    device.show_status("Scanning WiFi networks...")
+    try:
+        argv, parse = scan_command(device.wifi_interface, device.wifi_use_scan_dump)
+        networks = []
+        for network in parse(device.commands.stream(argv, timeout=20)):
+            networks.append(network)
+            device.show_status(f"Scanning WiFi... {len(networks)} found")
+        networks.sort(key=lambda n: n.signal if n.signal is not None else -999, reverse=True)
+        device.display_results("WiFi Networks", annotate(device.store, "wifi", [
+            (n.bssid, n.label(), {"ssid": n.ssid, "channel": n.channel, "signal": n.signal,
+                                  "security": n.security})
+            for n in networks]))
+    except jobs.JobCancelled:
+        raise
+    except Exception as e:
+        device.show_error(f"WiFi scan failed: {str(e)}")
+
+
+def wifi_monitor(device):
+    """Enable monitor mode"""
+    device.show_status("Enabling monitor mode...")
+    try:
+        device.commands.run(['sudo', 'airmon-ng', 'start', 'wlan0'], timeout=30, check=True)
+        device.show_success("Monitor mode enabled")
+    except jobs.JobCancelled:
+        raise
+    except Exception as e:
+        device.show_error(f"Monitor mode failed: {str(e)}")
+
+
+def wifi_deauth(device):
+    """Perform deauth attack (educational only)"""
+    device.show_warning("EDUCATIONAL ONLY - Own networks!")
+    # Implementation would go here
+    jobs.sleep(2)
+    device.show_status("Deauth demo completed")
+
+
+def create_access_point(device):
+    """Create access point"""
+    device.show_status("Creating access point...")
+    # Implementation for creating AP
+    jobs.sleep(2)
+    device.show_success("AP created: BlackHat-Demo")
@@ -0,0 +1,216 @@
+"""
+UI thread for the BlackHat firmware
+
+Input sources (GPIO edge callbacks, the keyboard thread) only post events
+to a bounded queue. A single UI thread applies them to the menu state and
+renders at most once per frame interval, so a burst of presses becomes one
+frame showing the final state.
+
+Redraw requests (job updates, streamed results) are not events: they set a
+flag, so any number of them between two frames costs one frame and never
+takes a queue slot a button press needs.
+
+The thread sleeps with no timeout unless a timer is pending: it wakes for
+an input event, a redraw request or the next timer, never to poll. Timers
+are keyed callbacks run on the UI thread, such as clearing a lingering
+status overlay or dimming the backlight.
+
+Each event carries the time it was posted, so with metrics on the loop
+records press-to-frame latency as ui.latency.
+"""
+
+import collections
+import threading
+import time
+
+from firmware import metrics
+
+# Input events
+UP = "up"
+DOWN = "down"
+LEFT = "left"
+RIGHT = "right"
+SELECT = "select"
+BACK = "back"
+ESCAPE = "escape"      # Back, or quit from the main menu (keyboard 'q')
+PROFILE = "profile"    # Button chord: start or stop a profiler capture
+OVERLAY = "overlay"    # Button chord: toggle the FPS/latency overlay
+
+RENDER_TIMER = "render"
+
+
+def _redraw():
+    return True
+
+
+class UiLoop:
+    """Single consumer of input events that owns state changes and rendering"""
+
+    def __init__(self, handle_event, render, max_fps=30, max_events=64):
+        self.handle_event = handle_event
+        self.render = render
+        self.frame_interval = 1.0 / max_fps
+        self.max_events = max_events
+        self.dropped = 0
+        self.frames = 0
+        self.handled = 0            # input events, not redraws or wakes
+        self._thread = None
+        self._running = False
+        self.wakeups = 0
+        self._last_render = 0.0
+        # Guards the event queue, the wake-up flags and the timers
+        self._cond = threading.Condition()
+        self._events = collections.deque()
+        self._render_pending = False
+        self._woken = False         # a sooner timer was set
+        self._timers = {}           # key -> (monotonic deadline, callback)
+        self._input_since = None    # when the oldest input not yet drawn was posted
+
+    @property
+    def queued(self):
+        """Input events posted but not yet applied"""
+        return len(self._events)
+
+    def post(self, event):
+        """Queue an input event; safe to call from any thread, never blocks"""
+        with self._cond:
+            if len(self._events) >= self.max_events:
+                # The UI is far behind; losing a press beats stalling the GPIO thread
+                self.dropped += 1
+                return
+            self._events.append((event, time.monotonic()))
+            self._cond.notify()
+
+    def request_render(self):
+        """Ask for the current screen to be drawn again (any thread)"""
+        with self._cond:
+            if not self._render_pending:
+                self._render_pending = True
+                self._cond.notify()
+
+    def render_after(self, delay):
+        """Redraw once delay seconds from now, e.g. to clear a lingering overlay"""
+        when = time.monotonic() + delay
+        with self._cond:
+            pending = self._timers.get(RENDER_TIMER)
+            if pending is None or when < pending[0]:
+                self.call_at(RENDER_TIMER, when, _redraw)
+
+    def call_at(self, key, when, callback):
+        """Run callback() on the UI thread at monotonic time when
+
+        A pending timer with the same key is replaced. The callback returns
+        True if the screen needs redrawing.
+        """
+        with self._cond:
+            sooner = all(when < deadline for deadline, _ in self._timers.values())
+            self._timers[key] = (when, callback)
+            if sooner:
+                # The UI thread may be asleep on a longer timeout, or none
+                self._woken = True
+                self._cond.notify()
+
+    def cancel(self, key):
+        """Drop a pending timer, if any"""
+        with self._cond:
+            self._timers.pop(key, None)
+
+    def _next_timeout(self):
+        with self._cond:
+            if not self._timers:
+                return None
+            deadline = min(when for when, _ in self._timers.values())
+        return max(0.0, deadline - time.monotonic())
+
+    def _run_timers(self):
+        """Run the timers that are due; returns True if one asked for a redraw"""
+        now = time.monotonic()
+        with self._cond:
+            due = [(key, callback) for key, (when, callback) in self._timers.items() if when <= now]
+            for key, _ in due:
+                del self._timers[key]
+        dirty = False
+        for key, callback in due:
+            try:
+                dirty = bool(callback()) or dirty
+            except Exception as e:
+                print(f"UI timer {key!r} failed: {e}")
+        return dirty
+
+    def _take(self, timeout, wake=True):
+        """Wait up to timeout (None = forever) for the next input event
+
+        Returns the event, or None when the wait ended without one. With
+        wake, a redraw request or a sooner timer also ends the wait.
+        """
+        with self._cond:
+            if not self._events and self._running and not (
+                    wake and (self._render_pending or self._woken)):
+                self._cond.wait(timeout)
+            if wake:
+                self._woken = False
+            return self._events.popleft() if self._events else None
+
+    def _take_render(self):
+        with self._cond:
+            pending = self._render_pending
+            self._render_pending = False
+            return pending
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="blackhat-ui", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._running
+
+    def _apply(self, item):
+        """Apply one queued event; returns True if the screen needs redrawing"""
+        event, posted = item
+        self.handled += 1
+        if self._input_since is None:
+            self._input_since = posted
+        try:
+            with metrics.timer("ui.handle"):
+                return bool(self.handle_event(event))
+        except Exception as e:
+            print(f"UI event {event!r} failed: {e}")
+            return True
+
+    def _run(self):
+        while self._running:
+            # Sleep until an event arrives, a redraw is asked for or the next timer is due
+            item = self._take(self._next_timeout())
+            self.wakeups += 1
+            dirty = self._apply(item) if item is not None else False
+            dirty = self._run_timers() or dirty
+
+            # Keep absorbing events until the next frame slot is due
+            slot = self._last_render + self.frame_interval
+            while self._running:
+                item = self._take(max(0.0, slot - time.monotonic()), wake=False)
+                if item is not None:
+                    dirty = self._apply(item) or dirty
+                elif time.monotonic() >= slot:
+                    break
+            dirty = self._take_render() or dirty
+
+            if dirty and self._running:
+                try:
+                    self.render()
+                    self.frames += 1
+                except Exception as e:
+                    print(f"UI render failed: {e}")
+                self._last_render = time.monotonic()
+                if self._input_since is not None:
+                    metrics.observe("ui.latency", self._last_render - self._input_since)
+            self._input_since = None
@@ -0,0 +1,156 @@
+"""
+Results viewer
+
+Tool output on the LCD as a scrollable list: UP/DOWN move a line,
+LEFT/RIGHT a page. Only the rows on screen are ever looked at; each item
+is wrapped to the panel width the first time it scrolls into view and the
+wrapped lines are cached by the render cache, so a list of thousands of
+results costs the same per frame as a list of ten.
+
+Items can be appended by a running tool while the list is shown, or the
+whole list replaced by one that updates rows in place. Either only asks
+for a redraw, once per frame however many items arrive in between; the
+panel gets the rows that changed and the footer count.
+"""
+
+from firmware import ui
+
+
+class ResultsViewer:
+    """Scrollable list of result items, drawn as a device screen"""
+
+    def __init__(self, render, title, items=(), on_change=None):
+        self.render = render
+        self.title = title
+        self.items = []
+        self.rows = render.results_rows
+        self.on_change = on_change
+        self.top = (0, 0)       # (item index, wrapped line of that item)
+        self.version = 0
+        self._frame_key = None
+        self._frame = None
+        self._change_pending = False
+        self.extend(items)
+
+    def append(self, item):
+        """Add one item (any thread)"""
+        # list.append is atomic; wrapping waits until the item is on screen
+        self.items.append(str(item))
+        self._changed()
+
+    def extend(self, items):
+        """Add items; a generator is drained one item at a time, each shown as it arrives"""
+        if isinstance(items, (list, tuple)):
+            self.items.extend(str(item) for item in items)
+            if items:
+                self._changed()
+        else:
+            for item in items:
+                self.append(item)
+
+    def replace(self, items):
+        """Show a new item list in place of the old one, keeping the scroll position (any thread)"""
+        items = [str(item) for item in items]
+        if self.top[0] >= len(items):
+            self.top = (max(0, len(items) - 1), 0)
+        self.items = items
+        self._changed()
+
+    def _changed(self):
+        self.version += 1
+        # One redraw request until the next frame picks the changes up
+        if self.on_change is not None and not self._change_pending:
+            self._change_pending = True
+            self.on_change()
+
+    def _lines(self, index):
+        items = self.items
+        if index >= len(items):
+            return ("",)    # replace() shortened the list under the UI thread
+        return self.render.wrap(items[index])
+
+    def visible(self, top=None, count=None):
+        """Return [(item index, text, continued)] for count lines from top"""
+        index, line = self.top if top is None else top
+        count = self.rows if count is None else count
+        total = len(self.items)
+        rows = []
+        while index < total and len(rows) < count:
+            lines = self._lines(index)
+            for i in range(line, min(len(lines), line + count - len(rows))):
+                rows.append((index, lines[i], i > 0))
+            index, line = index + 1, 0
+        return rows
+
+    def _previous(self, position):
+        index, line = position
+        if line > 0:
+            return index, line - 1
+        if index == 0:
+            return None
+        return index - 1, len(self._lines(index - 1)) - 1
+
+    def _next(self, position):
+        index, line = position
+        if line + 1 < len(self._lines(index)):
+            return index, line + 1
+        return index + 1, 0
+
+    def scroll(self, lines):
+        """Move the view by lines (negative is up); returns True if it moved"""
+        moved = False
+        for _ in range(abs(lines)):
+            if lines < 0:
+                position = self._previous(self.top)
+                if position is None:
+                    break
+            elif len(self.visible(count=self.rows + 1)) <= self.rows:
+                break       # the last line is already on screen
+            else:
+                position = self._next(self.top)
+            self.top = position
+            moved = True
+        return moved
+
+    def handle_input(self, event):
+        """Scroll for UP/DOWN/LEFT/RIGHT; returns True if the event was used"""
+        steps = {ui.UP: -1, ui.DOWN: 1, ui.LEFT: -self.rows, ui.RIGHT: self.rows}.get(event)
+        if steps is None:
+            return False
+        self.scroll(steps)
+        return True
+
+    def footer(self, rows):
+        if not self.items:
+            return "No results"
+        return f"{rows[0][0] + 1}-{rows[-1][0] + 1} of {len(self.items)}"
+
+    def __call__(self, render):
+        # Cleared before reading version: a later append asks for another frame
+        self._change_pending = False
+        # Appends past the bottom only change the footer count
+        key = (self.top, self.version)
+        if key != self._frame_key:
+            rows = self.visible()
+            self._frame = render.results_frame(self.title, [(text, continued) for _, text, continued in rows],
+                                               self.footer(rows))
+            self._frame_key = key
+        return self._frame
+
+
+class ConsoleResults:
+    """The ResultsViewer interface on stdout: items are printed as they arrive"""
+
+    def __init__(self, title, items=()):
+        self.title = title
+        self.items = []
+        print(f"\n=== {title} ===")
+        self.extend(items)
+
+    def append(self, item):
+        self.items.append(str(item))
+        print(f"  {item}")
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
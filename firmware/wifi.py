@@ -0,0 +1,203 @@
+"""
+Wi-Fi scan parsing
+
+Single-pass parsers turning `iwlist <if> scan` and `iw dev <if> scan [dump]`
+output into WifiNetwork records, hidden networks included.
+"""
+
+
+class WifiNetwork:
+    """One BSS from a scan"""
+
+    __slots__ = ("bssid", "ssid", "channel", "frequency", "signal", "quality", "security")
+
+    def __init__(self, bssid, ssid="", channel=None, frequency=None, signal=None,
+                 quality=None, security="Open"):
+        self.bssid = bssid
+        self.ssid = ssid
+        self.channel = channel
+        self.frequency = frequency      # MHz
+        self.signal = signal            # dBm
+        self.quality = quality          # e.g. "70/70", iwlist only
+        self.security = security
+
+    def label(self):
+        """One-line summary for the results list"""
+        ssid = self.ssid or "<hidden>"
+        signal = f"{self.signal:.0f}dBm" if self.signal is not None else "?dBm"
+        channel = f"ch{self.channel}" if self.channel is not None else "ch?"
+        return f"{ssid} {signal} {channel} {self.security}"
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"WifiNetwork({self.bssid!r}, {self.ssid!r}, ch={self.channel}, {self.signal} dBm, {self.security})"
+
+
+def frequency_to_channel(mhz):
+    """Map a centre frequency in MHz to its 802.11 channel number"""
+    if mhz is None:
+        return None
+    mhz = int(mhz)
+    if mhz == 2484:
+        return 14
+    if 2412 <= mhz < 2484:
+        return (mhz - 2407) // 5
+    if 5000 <= mhz < 5925:
+        return (mhz - 5000) // 5
+    if 5955 <= mhz <= 7115:
+        return (mhz - 5950) // 5
+    return None
+
+
+def _leading_number(text):
+    """Parse the number at the start of text ("-40.00 dBm" -> -40.0)"""
+    end = 0
+    for ch in text:
+        if ch in "+-.0123456789":
+            end += 1
+        else:
+            break
+    try:
+        return float(text[:end])
+    except ValueError:
+        return None
+
+
+def _security(privacy, wpa, wpa2, sae):
+    if sae:
+        return "WPA3"
+    if wpa2 and wpa:
+        return "WPA/WPA2"
+    if wpa2:
+        return "WPA2"
+    if wpa:
+        return "WPA"
+    return "WEP" if privacy else "Open"
+
+
+# First characters of the iwlist lines parse_iwlist looks at
+_IWLIST_HEADS = frozenset("CFQEIA")
+
+
+def parse_iwlist(lines):
+    """Yield a WifiNetwork for every cell in `iwlist <if> scan` output"""
+    net = None
+    privacy = wpa = wpa2 = sae = False
+
+    for raw in lines:
+        line = raw.lstrip()
+        if not line or line[0] not in _IWLIST_HEADS:
+            continue
+        line = line.rstrip()
+        head = line[0]
+
+        if head == "C":
+            if line.startswith("Cell "):
+                if net is not None:
+                    net.security = _security(privacy, wpa, wpa2, sae)
+                    yield net
+                _, _, bssid = line.partition("Address:")
+                net = WifiNetwork(bssid.strip().lower())
+                privacy = wpa = wpa2 = sae = False
+            elif net is not None and line.startswith("Channel:"):
+                channel = line[8:]
+                if channel.isdigit():
+                    net.channel = int(channel)
+        elif net is None:
+            continue
+        elif head == "F":
+            if line.startswith("Frequency:"):
+                ghz = _leading_number(line[10:])
+                if ghz is not None:
+                    net.frequency = int(round(ghz * 1000))
+                    if net.channel is None:
+                        net.channel = frequency_to_channel(net.frequency)
+        elif head == "Q":
+            if line.startswith("Quality="):
+                quality, _, rest = line[8:].partition(" ")
+                net.quality = quality
+                _, _, level = rest.partition("Signal level=")
+                if level:
+                    net.signal = _leading_number(level)
+        elif head == "E":
+            if line.startswith("Encryption key:"):
+                privacy = line.endswith(":on")
+            elif line.startswith("ESSID:"):
+                net.ssid = line[6:].strip('"')
+        elif head == "I":
+            if "WPA2" in line or "802.11i" in line:
+                wpa2 = True
+            elif "WPA Version" in line:
+                wpa = True
+        elif head == "A":
+            if line.startswith("Authentication Suites") and "SAE" in line:
+                sae = True
+
+    if net is not None:
+        net.security = _security(privacy, wpa, wpa2, sae)
+        yield net
+
+
+def parse_iw_scan(lines):
+    """Yield a WifiNetwork for every BSS in `iw dev <if> scan [dump]` output"""
+    net = None
+    privacy = wpa = rsn = sae = False
+
+    for raw in lines:
+        if raw.startswith("BSS "):
+            if net is not None:
+                net.security = _security(privacy, wpa, rsn, sae)
+                yield net
+            net = WifiNetwork(raw[4:21].lower())
+            privacy = wpa = rsn = sae = False
+            continue
+        if net is None:
+            continue
+
+        line = raw.strip()
+        key, sep, value = line.partition(":")
+        if not sep:
+            continue
+        if key == "freq":
+            mhz = _leading_number(value.strip())
+            if mhz is not None:
+                net.frequency = int(mhz)
+                if net.channel is None:
+                    net.channel = frequency_to_channel(net.frequency)
+        elif key == "signal":
+            net.signal = _leading_number(value.strip())
+        elif key == "SSID":
+            net.ssid = value[1:] if value.startswith(" ") else value
+        elif key == "capability":
+            privacy = "Privacy" in value
+        elif key == "DS Parameter set":
+            channel = value.rsplit(" ", 1)[-1]
+            if channel.isdigit():
+                net.channel = int(channel)
+        elif key == "* primary channel":
+            channel = value.strip()
+            if channel.isdigit():
+                net.channel = int(channel)
+        elif key == "RSN":
+            rsn = True
+        elif key == "WPA":
+            wpa = True
+        elif key == "* Authentication suites" and "SAE" in value:
+            sae = True
+
+    if net is not None:
+        net.security = _security(privacy, wpa, rsn, sae)
+        yield net
+
+
+def scan_command(interface="wlan0", use_dump=False):
+    """Return (argv, parser) for a scan of interface
+
+    With use_dump the kernel's cached results from the last scan are read
+    back (`iw ... scan dump`) instead of triggering a new scan.
+    """
+    if use_dump:
+        return ["iw", "dev", interface, "scan", "dump"], parse_iw_scan
+    return ["iwlist", interface, "scan"], parse_iwlist
@@ -87,7 +87,8 @@ pip3 install \
 pip3 install \
     scapy \
     wifi \
-    bluetooth-utils
+    bluetooth-utils \
+    jeepney
 
 # Create project directory
 PROJECT_DIR="/opt/blackhat"
@@ -101,6 +102,7 @@ mkdir -p $PROJECT_DIR/configs
 if [ -f "blackhat.py" ]; then
     cp blackhat.py $PROJECT_DIR/
     chmod +x $PROJECT_DIR/blackhat.py
+    cp -r firmware $PROJECT_DIR/
 else
     echo "Warning: blackhat.py not found in current directory"
     echo "Please ensure the main system file is named 'blackhat.py'"
@@ -147,10 +149,17 @@ btn_left = 16
 btn_right = 24
 btn_select = 12
 btn_back = 20
+# Pin State reads levels through /dev/gpiomem and falls back to requesting
+# free input lines from the gpiochip. Reserved lines (I2C1, the LCD, the
+# UART, PWM0, and any pins on an alternate function you add) are never read
+chip = /dev/gpiochip0
+lines = 2-27
+reserved = 2,3,7-11,13-15,18,22
 
 [network]
 default_interface = wlan0
 monitor_interface = wlan0mon
+scan_dump = false
 ap_ssid = BlackHat-Educational
 ap_password = educational123
 
@@ -159,11 +168,131 @@ enable_deauth = false
 enable_jamming = false
 log_captures = true
 
+[portscan]
+# Only localhost and hosts/networks in the allowlist are ever scanned
+targets = 127.0.0.1
+allowlist =
+ports = 21-23,25,53,80,110,139,143,443,445,3306,3389,5900,8000-8100
+concurrency = 64
+rate = 500
+timeout = 1.0
+
+[netscan]
+# Network Scan menu: only this interface's own subnet (or a part of it)
+interface =
+subnet =
+ports = 80,443,22,445
+concurrency = 128
+timeout = 0.5
+
+[dns]
+# DNS Lookup menu: names below, or one name/IP per line in batch_file
+names = google.com
+types = A,AAAA
+batch_file = /opt/blackhat/configs/dns_batch.txt
+nameservers =
+timeout = 1.5
+
+[capture]
+# Packet Capture menu: rotating pcap files, optional tcpdump-style filter
+interface =
+directory = /opt/blackhat/captures
+format = pcap
+filter =
+duration = 60
+rotate_mb = 16
+rotate_seconds = 300
+
+[i2c]
+# I2C Scanner: probes every /dev/i2c-N in-process; optional extra names in
+# device_table, one "0x3c Name" or "0x20-0x27 Name" per line
+buses =
+identify = true
+device_table = /opt/blackhat/configs/i2c_devices.txt
+cache_seconds = 300
+
+[spi]
+# SPI Test: loopback sweep on spidev<bus>.<device>; jumper MOSI to MISO
+# for integrity checks. Reports are saved as JSON in directory
+bus = 0
+device = 0
+speeds = 4000000,8000000,16000000,32000000,48000000,62500000
+sizes = 64,512,4096
+duration = 0.25
+directory = /opt/blackhat/captures
+
+[pwm]
+# PWM Control: GPIO12/13/18/19 use /sys/class/pwm when dtoverlay=pwm (or
+# pwm-2chan) routes a channel to the pin; other pins use software PWM
+pin = 18
+chip = 0
+preset = breathe
+frequency = 1000
+duration = 10
+
+[logic]
+# Logic Analyzer: sample these lines, save the newest samples as a VCD
+lines = 4,17,27
+samples = 262144
+window = 4096
+duration = 30
+directory = /opt/blackhat/captures
+
+[bluetooth]
+# Device and BLE Scanner: BlueZ discovery over D-Bus
+adapter = hci0
+transport = auto
+duration = 15
+max_devices = 256
+max_age = 60
+
+[sysmon]
+# Background /proc sampler behind System Info sparklines
+enabled = true
+interval = 1.0
+history = 120
+
+[storage]
+# Scan history in SQLite, written in batches
+enabled = true
+path = /opt/blackhat/logs/results.db
+flush_interval = 5
+flush_rows = 500
+retention_days = 30
+max_rows = 200000
+
+[power]
+# Dim after a minute idle, blank after five; dimming needs dtoverlay=pwm,pin=13,func=4
+enabled = true
+dim_after = 60
+blank_after = 300
+brightness = 100
+dim_level = 10
+pwm_chip = 0
+pause_samplers = true
+
+[metrics]
+# Counters and latency histograms, served on loopback; UP+DOWN profiles
+enabled = false
+listen = 127.0.0.1:9105
+overlay = false
+profile_seconds = 10
+directory = /opt/blackhat/logs
+
+[survey]
+# Background Wi-Fi/Bluetooth survey; scan menus open instantly from its cache
+enabled = false
+interval = 60
+ttl = 300
+bluetooth = true
+bluetooth_seconds = 10
+
 [system]
 auto_start = true
 boot_splash = true
 splash_duration = 3
 arch = armv7l
+backend = auto
 EOF
 
 # Create boot splash image directory